@@ -1,79 +1,352 @@
 """
-Redis cache layer with real hit/miss counters and logging.
-Used for: menu fetch, meal plan generation.
+Two-tier cache: an in-process LRU/TTL tier (L1) in front of Redis (L2), with hit/miss counters.
+Used for: menu fetch, meal plan generation, user profiles.
+Async (redis.asyncio) so cache I/O never holds a threadpool slot in the request path.
+
+L1 entries never outlive the L2 TTL they were read or written with, and are dropped in every
+worker when any worker calls cache_invalidate (Redis pub/sub on INVALIDATE_CHANNEL). While Redis
+is unreachable the cache keeps working L1-only and reconnects every REDIS_RETRY_S; a Redis error
+on a connected client (drop_redis) switches to L1-only the same way instead of failing the call.
+
+An L2 lookup is one round-trip (GET + PTTL pipelined). Hit/miss counters, overall and per key
+prefix, accumulate in-process and are flushed with one pipelined INCRBY batch every
+cache_stats_flush_s (and before cache_stats() reads them). With cache_exact_stats the lookup
+and its counter increments run as one server-side script instead, still one round-trip.
+Values are encoded with app.json_codec (orjson when installed).
+Get and set latency is recorded per key prefix in app.metrics (cache_operation_duration_seconds).
 """
+import asyncio
 import json
 import logging
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Callable
 from typing import Any, Optional
 
-import redis
+import redis.asyncio as redis
 
 from app.config import settings
+from app.json_codec import dumps, loads
+from app.metrics import CACHE_OP
 
 logger = logging.getLogger(__name__)
 
 _redis: Optional[redis.Redis] = None
+_redis_retry_at = 0.0
+REDIS_RETRY_S = 5.0
 
 # Keys for metrics (counters)
 CACHE_HITS = "cache:hits"
 CACHE_MISSES = "cache:misses"
+INVALIDATE_CHANNEL = "cache:invalidate"
+# Per-prefix counters live at f"{CACHE_HITS}:{prefix}"; other keys are counted as "other".
+STATS_PREFIXES = ("menu", "plan", "profile")
+
+# GET + PTTL and the matching counter increments in one atomic round-trip (cache_exact_stats).
+_GET_COUNTED = """
+local v = redis.call("GET", KEYS[1])
+local t = redis.call("PTTL", KEYS[1])
+local hit = v and 1 or 0
+redis.call("INCR", hit == 1 and KEYS[2] or KEYS[4])
+redis.call("INCR", hit == 1 and KEYS[3] or KEYS[5])
+return {v, t}
+"""
+
+
+class LocalCache:
+    """Bounded in-process LRU with a per-entry expiry (monotonic seconds)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        if self.max_entries <= 0 or ttl_seconds <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl_seconds, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: str, prefix: bool = False) -> None:
+        keys = [k for k in self._data if k.startswith(key)] if prefix else [key]
+        for k in keys:
+            if self._data.pop(k, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": _hit_rate(self.hits, self.misses),
+            "size": len(self._data),
+            "max_size": self.max_entries,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+l1 = LocalCache(settings.cache_l1_max_entries)
+
+# Called with (key, prefix) for every invalidation received over pub/sub, e.g. to drop
+# in-process state derived from the invalidated keys.
+_invalidation_hooks: list[Callable[[str, bool], None]] = []
+
+# Redis counter key -> increments not yet flushed.
+_pending: Counter[str] = Counter()
+
+
+def _stats_prefix(key: str) -> str:
+    prefix = key.split(":", 1)[0]
+    return prefix if prefix in STATS_PREFIXES else "other"
+
+
+def _counter_keys(key: str) -> tuple[str, str, str, str]:
+    """(hits, prefix hits, misses, prefix misses) counter keys for a lookup of key."""
+    prefix = _stats_prefix(key)
+    return CACHE_HITS, f"{CACHE_HITS}:{prefix}", CACHE_MISSES, f"{CACHE_MISSES}:{prefix}"
+
+
+async def flush_cache_stats() -> None:
+    """Push locally accumulated hit/miss counts to Redis in one pipelined round-trip."""
+    if not _pending:
+        return
+    r = await get_redis()
+    if r is None:
+        return
+    batch = dict(_pending)
+    _pending.clear()
+    try:
+        async with r.pipeline(transaction=False) as pipe:
+            for name, n in batch.items():
+                pipe.incrby(name, n)
+            await pipe.execute()
+    except Exception as e:
+        _pending.update(batch)  # keep them for the next flush
+        logger.warning("cache stats flush failed: %s", e)
+        if isinstance(e, redis.RedisError):
+            await drop_redis(r, e)
 
 
-def get_redis() -> Optional[redis.Redis]:
-    global _redis
+async def run_stats_flusher() -> None:
+    """Flush counters every cache_stats_flush_s until cancelled, then once more."""
+    try:
+        while True:
+            await asyncio.sleep(settings.cache_stats_flush_s)
+            await flush_cache_stats()
+    finally:
+        await flush_cache_stats()
+
+
+async def get_redis() -> Optional[redis.Redis]:
+    global _redis, _redis_retry_at
     if _redis is not None:
         return _redis
+    if time.monotonic() < _redis_retry_at:
+        return None
+    client = redis.from_url(settings.redis_url, decode_responses=True)
     try:
-        _redis = redis.from_url(settings.redis_url, decode_responses=True)
-        _redis.ping()
-        return _redis
+        await client.ping()
     except Exception as e:
-        logger.warning("Redis unavailable: %s", e)
-        _redis = None
+        logger.warning("Redis unavailable (L1-only for %ss): %s", REDIS_RETRY_S, e)
+        _redis_retry_at = time.monotonic() + REDIS_RETRY_S
+        await client.aclose()
         return None
+    _redis = client
+    return _redis
+
+
+async def drop_redis(client: redis.Redis, error: Exception) -> None:
+    """Give up on client after a failed call: L1-only until the next reconnect attempt."""
+    global _redis, _redis_retry_at
+    if _redis is not client:
+        return  # already dropped by a concurrent failure (or replaced)
+    logger.warning("Redis error (L1-only for %ss): %s", REDIS_RETRY_S, error)
+    _redis, _redis_retry_at = None, time.monotonic() + REDIS_RETRY_S
+    try:
+        await client.aclose()
+    except Exception:
+        pass
+
+
+async def close_redis() -> None:
+    """Close the shared client (lifespan shutdown); the next call reconnects on the current loop."""
+    global _redis, _redis_retry_at
+    _redis_retry_at = 0.0
+    if _redis is not None:
+        client, _redis = _redis, None
+        await client.aclose()
 
 
-def cache_get(key: str) -> Optional[str]:
-    r = get_redis()
+async def cache_get(key: str) -> Optional[str]:
+    t0 = time.perf_counter()
+    val = l1.get(key)
+    if val is not None:
+        logger.debug("cache l1 hit key=%s", key)
+        CACHE_OP.observe(time.perf_counter() - t0, "get", _stats_prefix(key), "l1_hit")
+        return val
+    r = await get_redis()
     if r is None:
+        CACHE_OP.observe(time.perf_counter() - t0, "get", _stats_prefix(key), "miss")
         return None
-    val = r.get(key)
+    hits_key, prefix_hits_key, misses_key, prefix_misses_key = _counter_keys(key)
+    try:
+        if settings.cache_exact_stats:
+            val, pttl = await r.eval(
+                _GET_COUNTED, 5, key, hits_key, prefix_hits_key, misses_key, prefix_misses_key
+            )
+        else:
+            async with r.pipeline(transaction=False) as pipe:
+                val, pttl = await pipe.get(key).pttl(key).execute()
+    except redis.RedisError as e:
+        await drop_redis(r, e)
+        CACHE_OP.observe(time.perf_counter() - t0, "get", _stats_prefix(key), "error")
+        return None
+    if not settings.cache_exact_stats:
+        _pending.update((hits_key, prefix_hits_key) if val is not None else (misses_key, prefix_misses_key))
+    CACHE_OP.observe(time.perf_counter() - t0, "get", _stats_prefix(key), "hit" if val is not None else "miss")
     if val is None:
-        r.incr(CACHE_MISSES)
-        logger.info("cache miss key=%s hits=%s misses=%s", key, r.get(CACHE_HITS) or 0, r.get(CACHE_MISSES) or 0)
+        logger.debug("cache miss key=%s", key)
         return None
-    r.incr(CACHE_HITS)
-    logger.info("cache hit key=%s hits=%s misses=%s", key, r.get(CACHE_HITS) or 0, r.get(CACHE_MISSES) or 0)
+    logger.debug("cache hit key=%s", key)
+    # pttl is -1 for keys without expiry; never keep L1 longer than Redis will.
+    l2_ttl = pttl / 1000 if pttl > 0 else settings.cache_l1_ttl_s
+    l1.set(key, val, min(settings.cache_l1_ttl_s, l2_ttl))
     return val
 
 
-def cache_set(key: str, value: str, ttl_seconds: int) -> None:
-    r = get_redis()
+async def cache_set(key: str, value: str, ttl_seconds: int) -> None:
+    t0 = time.perf_counter()
+    l1.set(key, value, min(settings.cache_l1_ttl_s, ttl_seconds))
+    r = await get_redis()
+    outcome = "ok"
+    if r is not None:
+        try:
+            await r.setex(key, ttl_seconds, value)
+        except redis.RedisError as e:
+            await drop_redis(r, e)
+            outcome = "error"
+    CACHE_OP.observe(time.perf_counter() - t0, "set", _stats_prefix(key), outcome)
+
+
+async def cache_invalidate(key: str, prefix: bool = False) -> None:
+    """Remove key (or every key starting with it) from Redis and from L1 in all workers."""
+    l1.invalidate(key, prefix)
+    r = await get_redis()
     if r is None:
         return
-    r.setex(key, ttl_seconds, value)
+    try:
+        if prefix:
+            keys = [k async for k in r.scan_iter(match=f"{key}*", count=500)]
+            if keys:
+                await r.delete(*keys)
+        else:
+            await r.delete(key)
+        await r.publish(INVALIDATE_CHANNEL, json.dumps({"key": key, "prefix": prefix}))
+    except redis.RedisError as e:
+        # Other workers' L1 copies still expire within cache_l1_ttl_s.
+        await drop_redis(r, e)
+
+
+def add_invalidation_hook(hook: Callable[[str, bool], None]) -> None:
+    if hook not in _invalidation_hooks:
+        _invalidation_hooks.append(hook)
 
 
-def cache_get_json(key: str) -> Optional[Any]:
-    raw = cache_get(key)
+async def run_invalidation_listener() -> None:
+    """Apply other workers' cache_invalidate calls to this worker's L1 (runs until cancelled)."""
+    while True:
+        r = await get_redis()
+        if r is None:
+            await asyncio.sleep(REDIS_RETRY_S)
+            continue
+        try:
+            async with r.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATE_CHANNEL)
+                # Anything cached before the subscription may have missed an invalidation.
+                l1.clear()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    msg = json.loads(message["data"])
+                    key, prefix = msg["key"], bool(msg.get("prefix"))
+                    l1.invalidate(key, prefix)
+                    for hook in _invalidation_hooks:
+                        hook(key, prefix)
+        except asyncio.CancelledError:
+            raise
+        except redis.RedisError as e:
+            await drop_redis(r, e)
+        except Exception as e:
+            logger.warning("cache invalidation listener error: %s", e)
+            await asyncio.sleep(1.0)
+
+
+async def cache_get_json(key: str) -> Optional[Any]:
+    raw = await cache_get(key)
     if raw is None:
         return None
     try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
+        return loads(raw)
+    except ValueError:
         return None
 
 
-def cache_set_json(key: str, value: Any, ttl_seconds: int) -> None:
-    cache_set(key, json.dumps(value, default=str), ttl_seconds)
+async def cache_set_json(key: str, value: Any, ttl_seconds: int) -> None:
+    await cache_set(key, dumps(value), ttl_seconds)
 
 
-def cache_stats() -> dict[str, Any]:
-    r = get_redis()
-    if r is None:
-        return {"enabled": False, "hits": 0, "misses": 0, "hit_rate": None}
-    hits = int(r.get(CACHE_HITS) or 0)
-    misses = int(r.get(CACHE_MISSES) or 0)
+def _hit_rate(hits: int, misses: int) -> Optional[float]:
     total = hits + misses
-    hit_rate = (hits / total) if total else None
-    return {"enabled": True, "hits": hits, "misses": misses, "hit_rate": hit_rate}
+    return (hits / total) if total else None
+
+
+async def cache_stats() -> dict[str, Any]:
+    r = await get_redis()
+    counts: list[int] = []
+    if r is not None:
+        await flush_cache_stats()
+        prefixes = (*STATS_PREFIXES, "other")
+        names = [CACHE_HITS, CACHE_MISSES]
+        for prefix in prefixes:
+            names += [f"{CACHE_HITS}:{prefix}", f"{CACHE_MISSES}:{prefix}"]
+        try:
+            counts = [int(v or 0) for v in await r.mget(names)]
+        except redis.RedisError as e:
+            await drop_redis(r, e)
+            r = None
+    if r is None:
+        l2 = {"enabled": False, "hits": 0, "misses": 0, "hit_rate": None}
+    else:
+        hits, misses = counts[0], counts[1]
+        by_prefix = {}
+        for i, prefix in enumerate(prefixes):
+            p_hits, p_misses = counts[2 + 2 * i], counts[3 + 2 * i]
+            by_prefix[prefix] = {"hits": p_hits, "misses": p_misses, "hit_rate": _hit_rate(p_hits, p_misses)}
+        l2 = {
+            "enabled": True,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": _hit_rate(hits, misses),
+            "by_prefix": by_prefix,
+        }
+    return {**l2, "mode": "l1+l2" if r is not None else "l1-only", "l1": l1.stats(), "l2": l2}
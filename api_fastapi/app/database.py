@@ -1,21 +1,214 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+"""
+Engines, sessions and connection pools.
+
+Writes and read-your-writes queries go through the primary (engine, async_engine). Menu loads
+for /api/menu/today and the planner go through async_read_engine, which points at
+database_read_url when one is configured and is the primary's async engine otherwise.
+
+Every engine uses a queue pool sized by the db_pool_* settings, including SQLite files, so tests
+run the same checkout path as Postgres. The exception is in-memory SQLite, where one shared
+connection (StaticPool) is the only way to share a database. File-backed SQLite runs in WAL
+mode so pooled readers don't block the writer. Checkout wait time, timeouts and saturation per
+pool are in pool_stats() (GET /health) and db_pool_wait_seconds (GET /metrics).
+"""
+import time
+from typing import Any
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 
 from app.config import settings
+from app.metrics import DB_POOL_WAIT, DB_QUERY
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    """Same database as url, through its async driver (asyncpg for Postgres, aiosqlite for SQLite)."""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        return url
+    return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+
+
+class PoolStats:
+    """Checkout counters of one pool; survives the pool being recreated by engine.dispose()."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.timeouts = 0
+
+    def record(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_s += waited
+        self.max_wait_s = max(self.max_wait_s, waited)
+        DB_POOL_WAIT.observe(waited, self.name)
+
+
+class _TimedCheckout:
+    """Queue pool mixin timing each checkout (waiting for a free slot, or opening a connection)."""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.record(time.perf_counter() - t0)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    if not _is_sqlite(url):
+        return False
+    return url.split("://", 1)[1] in ("", "/") or ":memory:" in url or "mode=memory" in url
+
+
+def _engine_kw(url: str, is_async: bool) -> dict[str, Any]:
+    kw: dict[str, Any] = {"echo": settings.db_echo}
+    if _is_memory_sqlite(url):
+        kw["poolclass"] = StaticPool
+    else:
+        kw.update(
+            poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_s,
+            pool_recycle=settings.db_pool_recycle_s,
+            pool_pre_ping=not _is_sqlite(url),
+        )
+    if _is_sqlite(url) and not is_async:
+        kw["connect_args"] = {"check_same_thread": False}
+    return kw
+
 
-_engine_kw: dict = {"pool_pre_ping": True, "echo": settings.env == "development"}
-if "sqlite" in settings.database_url:
-    _engine_kw["connect_args"] = {"check_same_thread": False}
-    _engine_kw["pool_pre_ping"] = False
+def _sqlite_wal(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
 
-engine = create_engine(settings.database_url, **_engine_kw)
+
+def _configure(e, name: str):
+    if isinstance(e.pool, _TimedCheckout):
+        e.pool.stats = PoolStats(name)
+    url = e.url.render_as_string()
+    if _is_sqlite(url) and not _is_memory_sqlite(url):
+        event.listen(e, "connect", _sqlite_wal)
+    return e
+
+
+# Sync engine: migrations, seeding and scripts. Request handlers use the async engines below.
+engine = _configure(create_engine(settings.database_url, **_engine_kw(settings.database_url, False)), "sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def _async_engine(url: str, name: str) -> AsyncEngine:
+    url = async_database_url(url)
+    async_e = create_async_engine(url, **_engine_kw(url, True))
+    _configure(async_e.sync_engine, name)
+    return async_e
+
+
+async_engine = _async_engine(settings.database_url, "primary")
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async_read_engine = _async_engine(settings.database_read_url, "read") if settings.database_read_url else async_engine
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+_OPERATIONS = ("select", "insert", "update", "delete")
+
+
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop("query_start", None)
+    if start is not None:
+        op = statement.lstrip()[:6].lower()
+        DB_QUERY.observe(time.perf_counter() - start, op if op in _OPERATIONS else "other")
+
+
+def _engines() -> dict:
+    """Distinct sync-level engines by name: sync, primary and (when configured) read."""
+    engines = {"sync": engine, "primary": async_engine.sync_engine}
+    if async_read_engine is not async_engine:
+        engines["read"] = async_read_engine.sync_engine
+    return engines
+
+
+# Statement timings for GET /metrics (db_query_duration_seconds), on every engine.
+for _e in _engines().values():
+    event.listen(_e, "before_cursor_execute", _query_started)
+    event.listen(_e, "after_cursor_execute", _query_finished)
+
+
+def pool_stats() -> dict[str, dict[str, Any]]:
+    """Per-pool size, connections in use, saturation (in use / capacity) and checkout waits."""
+    out = {}
+    for name, e in _engines().items():
+        pool = e.pool
+        if not isinstance(pool, _TimedCheckout):
+            out[name] = {"pool": pool.__class__.__name__}
+            continue
+        s = pool.stats
+        # max_overflow < 0 means no limit.
+        capacity = pool.size() + settings.db_max_overflow if settings.db_max_overflow >= 0 else None
+        out[name] = {
+            "size": pool.size(),
+            "max_overflow": settings.db_max_overflow,
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "saturation": round(pool.checkedout() / capacity, 3) if capacity else None,
+            "checkouts": s.checkouts,
+            "timeouts": s.timeouts,
+            "avg_wait_ms": round(s.wait_s / s.checkouts * 1000, 3) if s.checkouts else 0.0,
+            "max_wait_ms": round(s.max_wait_s * 1000, 3),
+        }
+    return out
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    """Session on the read replica (or the primary without one); read-only use."""
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,193 @@
+"""
+Dietary tags as bitmasks, and menu pools pre-filtered by diet.
+
+MenuItem.tags (comma-separated, free text) is parsed once per compiled menu into one int per item
+over the fixed TAGS vocabulary. Spelling is normalized, ALIASES are applied and unknown tags are
+ignored; "vegan" also sets vegetarian, dairy_free and egg_free. A user's preferences
+({"include": [...], "exclude": [...]}) compile into a DietMask. An item fits when it has every
+include tag and none of the exclude tags. Labels such as "vegetarian" or "halal" go in include,
+allergens such as "contains_peanuts" in exclude.
+
+filter_pools applies a DietMask to a menu's breakfast/lunch/dinner pools with one vectorized
+test per pool. DietPools caches the result per (menu version, DietMask), so a common diet
+filters a day's menu once per process.
+"""
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from typing import Any, NamedTuple
+
+import numpy as np
+
+# Bit i is TAGS[i]; append only (masks are part of plan cache keys).
+TAGS = (
+    "vegetarian",
+    "vegan",
+    "halal",
+    "kosher",
+    "gluten_free",
+    "dairy_free",
+    "egg_free",
+    "nut_free",
+    "soy_free",
+    "contains_gluten",
+    "contains_wheat",
+    "contains_dairy",
+    "contains_eggs",
+    "contains_peanuts",
+    "contains_tree_nuts",
+    "contains_soy",
+    "contains_fish",
+    "contains_shellfish",
+    "contains_sesame",
+    "pork",
+    "beef",
+    "alcohol",
+)
+TAG_BITS = {t: 1 << i for i, t in enumerate(TAGS)}
+ALIASES = {
+    "veg": "vegetarian",
+    "veggie": "vegetarian",
+    "gf": "gluten_free",
+    "df": "dairy_free",
+    "gluten": "contains_gluten",
+    "wheat": "contains_wheat",
+    "dairy": "contains_dairy",
+    "milk": "contains_dairy",
+    "egg": "contains_eggs",
+    "eggs": "contains_eggs",
+    "peanut": "contains_peanuts",
+    "peanuts": "contains_peanuts",
+    "nuts": "contains_tree_nuts",
+    "tree_nuts": "contains_tree_nuts",
+    "soy": "contains_soy",
+    "fish": "contains_fish",
+    "shellfish": "contains_shellfish",
+    "sesame": "contains_sesame",
+}
+# Tags that imply others on an item.
+IMPLIES = {"vegan": ("vegetarian", "dairy_free", "egg_free")}
+MAX_DIET_POOLS = 64
+MAX_MASKED_VERSIONS = 8
+
+
+class DietMask(NamedTuple):
+    include: int = 0
+    exclude: int = 0
+
+
+NO_DIET = DietMask()
+
+
+def normalize_tag(tag: str) -> str:
+    t = "_".join(tag.strip().lower().replace("-", " ").split())
+    return ALIASES.get(t, t)
+
+
+def split_tags(tags: str | Iterable[str] | None) -> list[str]:
+    """Normalized tag names of a MenuItem.tags value (comma-separated string or list)."""
+    if not tags:
+        return []
+    raw = tags.split(",") if isinstance(tags, str) else tags
+    return [t for t in (normalize_tag(str(x)) for x in raw) if t]
+
+
+def tag_mask(tags: str | Iterable[str] | int | None) -> int:
+    """Bitmask of an item's known tags (implied tags included); an int is already a mask."""
+    if isinstance(tags, int):
+        return tags
+    mask = 0
+    for t in split_tags(tags):
+        mask |= TAG_BITS.get(t, 0)
+        for implied in IMPLIES.get(t, ()):
+            mask |= TAG_BITS[implied]
+    return mask
+
+
+def strict_mask(tags: Iterable[str]) -> int:
+    """Bitmask of tags that must all be known; ValueError names the unknown ones."""
+    names = split_tags(list(tags))
+    unknown = sorted({t for t in names if t not in TAG_BITS})
+    if unknown:
+        raise ValueError(f"unknown dietary tags {unknown}; known tags are {list(TAGS)}")
+    mask = 0
+    for t in names:
+        mask |= TAG_BITS[t]
+    return mask
+
+
+def compile_preferences(preferences: dict[str, Any] | None) -> DietMask:
+    """DietMask for a profile's preferences ({"include": [...], "exclude": [...]})."""
+    if not preferences:
+        return NO_DIET
+    return DietMask(strict_mask(preferences.get("include") or ()), strict_mask(preferences.get("exclude") or ()))
+
+
+def mask_tags(mask: int) -> list[str]:
+    return [t for t, bit in TAG_BITS.items() if mask & bit]
+
+
+def pool_masks(pools: Sequence[Sequence[Any]]) -> tuple[np.ndarray, ...]:
+    """uint64 tag masks aligned with each pool's items (anything with a .tags bitmask)."""
+    return tuple(np.fromiter((it.tags for it in pool), dtype=np.uint64, count=len(pool)) for pool in pools)
+
+
+def filter_pools(
+    pools: Sequence[Sequence[Any]], diet: DietMask, masks: Sequence[np.ndarray] | None = None
+) -> tuple[tuple[Any, ...], ...]:
+    """pools restricted to items fitting diet, order kept. A pool may come back empty: items that
+    don't fit are never used as a fallback."""
+    if masks is None:
+        masks = pool_masks(pools)
+    include, exclude = np.uint64(diet.include), np.uint64(diet.exclude)
+    out = []
+    for pool, m in zip(pools, masks):
+        keep = np.flatnonzero(((m & include) == include) & ((m & exclude) == 0))
+        out.append(tuple(pool[i] for i in keep))
+    return tuple(out)
+
+
+class DietPools:
+    """LRU of diet-filtered pools per (menu version, DietMask), with each version's mask arrays.
+
+    One per process: the API process (thread mode) and every planner worker keep their own.
+    """
+
+    def __init__(self, max_entries: int = MAX_DIET_POOLS):
+        self.max_entries = max_entries
+        self._pools: OrderedDict[tuple[str, DietMask], tuple] = OrderedDict()
+        self._masks: OrderedDict[str, tuple[np.ndarray, ...]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version: str, pools: Sequence[Sequence[Any]], diet: DietMask) -> Sequence[Sequence[Any]]:
+        if diet == NO_DIET:
+            return pools
+        key = (version, diet)
+        with self._lock:
+            cached = self._pools.get(key)
+            if cached is not None:
+                self._pools.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+            masks = self._masks.get(version)
+        if masks is None:
+            masks = pool_masks(pools)
+        filtered = filter_pools(pools, diet, masks)
+        with self._lock:
+            self._masks[version] = masks
+            self._masks.move_to_end(version)
+            while len(self._masks) > MAX_MASKED_VERSIONS:
+                self._masks.popitem(last=False)
+            self._pools[key] = filtered
+            while len(self._pools) > self.max_entries:
+                self._pools.popitem(last=False)
+        return filtered
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._pools), "hits": self.hits, "misses": self.misses}
+
+
+diet_pools = DietPools()
@@ -0,0 +1,275 @@
+"""
+Planner executor: runs build_plan outside the event loop's process so CPU-bound planning never
+holds the GIL of the worker serving /health and cache hits.
+
+Admission control is a bounded queue in front of max_in_flight running plans; when the queue is
+full, run() raises PlannerBusy right away (served as 503 + Retry-After) instead of letting the
+request wait into a timeout. Worker processes are pre-warmed with the current compiled menu's
+pools, so a task only ships the menu version, targets and diet; each process narrows pools to a
+diet through its own app.diet.diet_pools cache. workers=0 keeps the same admission control but
+plans on the threadpool (tests, single-core hosts).
+
+Every task returns its result with the planner's stats dict (per-slot timings, greedy rounds and
+candidates), which is recorded into app.metrics here, in the API process.
+"""
+import asyncio
+import logging
+import multiprocessing
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import date
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.diet import NO_DIET, DietMask, diet_pools
+from app.metrics import record_plan_stats
+from app.planner import build_alternative_plans, build_multi_day_plan, build_plan_from_pools, replan_slot
+
+logger = logging.getLogger(__name__)
+
+WAIT_SAMPLES = 512
+
+# Worker-process state: menu version -> pools, set by _init_worker.
+_worker_pools: dict[str, tuple] = {}
+
+
+def _init_worker(version: str | None, pools: tuple | None) -> None:
+    random.seed()  # don't inherit one shared shuffle sequence across workers
+    if version is not None:
+        _worker_pools[version] = pools
+
+
+def _noop() -> None:
+    pass
+
+
+def _pools(version: str, pools: tuple | None, diet: DietMask) -> tuple:
+    """version's pools (the warm ones when pools is None), narrowed to diet."""
+    if pools is None:
+        pools = _worker_pools[version]
+    return diet_pools.get(version, pools, diet)
+
+
+def _plan_in_worker(version: str, pools: tuple | None, diet: DietMask, targets: dict[str, float], kwargs: dict):
+    stats: dict[str, Any] = {}
+    return build_plan_from_pools(_pools(version, pools, diet), targets, **kwargs, stats=stats), stats
+
+
+def _alternatives_in_worker(
+    version: str, pools: tuple | None, diet: DietMask, targets: dict[str, float], k: int, kwargs: dict
+):
+    stats: dict[str, Any] = {}
+    return build_alternative_plans(_pools(version, pools, diet), targets, k, **kwargs, stats=stats), stats
+
+
+def _swap_in_worker(
+    version: str, pools: tuple | None, diet: DietMask, plan: dict, targets: dict[str, float], slot: str, kwargs: dict
+):
+    stats: dict[str, Any] = {}
+    return replan_slot(plan, _pools(version, pools, diet), targets, slot, **kwargs, stats=stats), stats
+
+
+def _week_in_worker(
+    days: list[tuple[str, str, tuple | None]], diet: DietMask, targets: dict[str, float], kwargs: dict
+):
+    """days: (date, menu version, pools or None when the worker was warmed with that version)."""
+    stats: dict[str, Any] = {}
+    week = build_multi_day_plan(
+        [(day, _pools(version, pools, diet)) for day, version, pools in days],
+        targets,
+        **kwargs,
+        stats=stats,
+    )
+    return week, stats
+
+
+class PlannerBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("planner queue full")
+        self.retry_after = retry_after
+
+
+class PlanExecutor:
+    def __init__(
+        self,
+        workers: int = 0,
+        max_in_flight: int = 0,
+        queue_size: int = 0,
+        retry_after: int = 1,
+    ):
+        self.workers = workers
+        self.max_in_flight = max_in_flight or max(workers, 1)
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._pool: Executor | None = None
+        self._warm_version: str | None = None
+        self._warm_date: str | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._in_flight = 0
+        self._queued = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._failed = 0
+        self._waits_ms: deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    def start(self, menu: Any | None = None) -> None:
+        """Create the admission semaphore (on the running loop) and pre-warm the workers."""
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        if self.workers > 0:
+            self._start_pool(menu)
+
+    def _start_pool(self, menu: Any | None) -> None:
+        old = self._pool
+        version = menu.version if menu is not None else None
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(version, menu.pools if menu is not None else None),
+        )
+        # Spawn every worker now so the first requests don't pay for process start-up.
+        for _ in range(self.workers):
+            pool.submit(_noop)
+        self._pool, self._warm_version = pool, version
+        self._warm_date = menu.date if menu is not None else None
+        if old is not None:
+            old.shutdown(wait=False)
+        logger.info("planner pool started workers=%d menu_version=%s", self.workers, version)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        self._warm_version = self._warm_date = None
+
+    @asynccontextmanager
+    async def _admitted(self):
+        """Hold one planner slot; raises PlannerBusy when the wait queue is full."""
+        if self._slots is None:
+            self.start()
+        if self._slots.locked() and self._queued >= self.queue_size:
+            self._rejected += 1
+            raise PlannerBusy(self.retry_after)
+        self._queued += 1
+        t0 = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+        self._waits_ms.append((time.perf_counter() - t0) * 1000)
+        self._in_flight += 1
+        self._submitted += 1
+        try:
+            yield
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    async def _submit(self, menu: Any, fn, *args: Any):
+        try:
+            return await asyncio.wrap_future(self._pool.submit(fn, *args))
+        except BrokenProcessPool:
+            logger.exception("planner pool broken; restarting")
+            self._start_pool(menu)
+            raise
+
+    async def run(
+        self, menu: Any, targets: dict[str, float], diet: DietMask = NO_DIET, **kwargs: Any
+    ) -> dict[str, Any]:
+        """build_plan_from_pools(menu.pools narrowed to diet, targets, **kwargs) under admission control."""
+        plan, stats = await self._run_on_menu(menu, _plan_in_worker, diet, targets, kwargs)
+        record_plan_stats("plan", stats, len(menu.items))
+        return plan
+
+    async def run_alternatives(
+        self, menu: Any, targets: dict[str, float], k: int, diet: DietMask = NO_DIET, **kwargs: Any
+    ) -> list[dict[str, Any]]:
+        """build_alternative_plans(menu.pools narrowed to diet, targets, k, **kwargs) as one planner task."""
+        plans, stats = await self._run_on_menu(menu, _alternatives_in_worker, diet, targets, k, kwargs)
+        record_plan_stats("alternatives", stats, len(menu.items))
+        return plans
+
+    async def run_swap(
+        self,
+        menu: Any,
+        plan: dict[str, Any],
+        targets: dict[str, float],
+        slot: str,
+        diet: DietMask = NO_DIET,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        """replan_slot(plan, menu.pools narrowed to diet, targets, slot, **kwargs) under admission control."""
+        swapped, stats = await self._run_on_menu(menu, _swap_in_worker, diet, plan, targets, slot, kwargs)
+        record_plan_stats("swap", stats, len(menu.items))
+        return swapped
+
+    async def _run_on_menu(self, menu: Any, fn, *args: Any) -> Any:
+        """fn(menu.version, pools or None, *args) as one planner task; None pools means the
+        worker already holds menu's pools."""
+        async with self._admitted():
+            if self._pool is None:
+                return await run_in_threadpool(fn, menu.version, menu.pools, *args)
+            pools = None
+            if menu.version != self._warm_version:
+                newer = self._warm_date is None or menu.date >= self._warm_date
+                if newer and menu.date <= date.today().isoformat():
+                    # Reseed or day rollover: re-warm; tasks already running finish on the old pool.
+                    self._start_pool(menu)
+                else:
+                    # An older day, or tomorrow's menu warmed before midnight: ship its pools with
+                    # the task so today's requests keep the warm pool.
+                    pools = menu.pools
+            return await self._submit(menu, fn, menu.version, pools, *args)
+
+    async def run_week(
+        self, menus: list[Any], targets: dict[str, float], diet: DietMask = NO_DIET, **kwargs: Any
+    ) -> dict[str, Any]:
+        """build_multi_day_plan over menus (date order, each narrowed to diet) as one planner task."""
+        async with self._admitted():
+            if self._pool is None:
+                days = [(m.date, m.version, m.pools) for m in menus]
+                week, stats = await run_in_threadpool(_week_in_worker, days, diet, targets, kwargs)
+            else:
+                # Only the warm day's pools are already in the workers; the others travel with the task.
+                days = [(m.date, m.version, None if m.version == self._warm_version else m.pools) for m in menus]
+                week, stats = await self._submit(menus[0], _week_in_worker, days, diet, targets, kwargs)
+        record_plan_stats("week", stats, sum(len(m.items) for m in menus))
+        return week
+
+    def stats(self) -> dict[str, Any]:
+        waits = sorted(self._waits_ms)
+
+        def pct(p: float) -> float | None:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3) if waits else None
+
+        return {
+            "mode": "process" if self.workers > 0 else "thread",
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "queue_size": self.queue_size,
+            "in_flight": self._in_flight,
+            "queue_depth": self._queued,
+            "submitted": self._submitted,
+            "rejected": self._rejected,
+            "failed": self._failed,
+            "wait_ms_p50": pct(0.5),
+            "wait_ms_p95": pct(0.95),
+            "wait_ms_max": round(waits[-1], 3) if waits else None,
+        }
+
+
+planner_executor = PlanExecutor(
+    workers=settings.planner_workers,
+    max_in_flight=settings.planner_max_in_flight,
+    queue_size=settings.planner_queue_size,
+    retry_after=settings.planner_retry_after_s,
+)
@@ -0,0 +1,280 @@
+"""
+Bulk menu ingestion: scraper exports (JSON, NDJSON, CSV) into menu_days / menu_items.
+
+Files are read incrementally and validated with pydantic in chunks of CHUNK_SIZE records;
+invalid records are counted and skipped rather than failing the run. A day with invalid records
+is not written at all (its menu in the database stays as it was) unless write_partial is set.
+Each day is written in its own transaction: the MenuDay row is inserted or updated in place (so
+meal_plans keep pointing at it), its items are replaced with one COPY on Postgres or one
+executemany INSERT elsewhere. Days are buffered until the input ends, or with sorted_input
+(each day's records contiguous, e.g. sorted by date) written as soon as the next day starts.
+Callers invalidate caches for the returned dates (see app.main.invalidate_menu_caches).
+"""
+import csv
+import io
+import json
+import logging
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, field_validator
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.models import MenuDay, MenuItem
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+FORMATS = ("json", "ndjson", "csv")
+ITEM_FIELDS = ("name", "meal_period", "calories", "protein", "carbs", "fat", "tags")
+MAX_ERRORS_REPORTED = 20
+
+# Built-in menu used by the no-Docker SQLite seed and scripts/seed_today.py.
+SAMPLE_MENU = [
+    ("Oatmeal", "breakfast", 150, 5, 27, 3),
+    ("Eggs", "breakfast", 200, 14, 2, 15),
+    ("Salad", "lunch", 300, 12, 20, 18),
+    ("Grilled Chicken", "lunch", 400, 35, 0, 22),
+    ("Pasta", "dinner", 450, 15, 60, 12),
+    ("Salmon", "dinner", 380, 34, 0, 24),
+]
+
+
+class MenuRecord(BaseModel):
+    """One menu item on one day, as found in a scraper export."""
+
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    date: str = Field(pattern=r"^\d{4}-\d{2}-\d{2}$")
+    name: str = Field(min_length=1, max_length=256)
+    meal_period: Literal["breakfast", "lunch", "dinner", "any"]
+    calories: float = Field(ge=0)
+    protein: float = Field(ge=0)
+    carbs: float = Field(ge=0)
+    fat: float = Field(ge=0)
+    tags: Optional[str] = None
+    source_url: Optional[str] = Field(None, max_length=512)
+
+    @field_validator("meal_period", mode="before")
+    @classmethod
+    def _lower_period(cls, v: Any) -> Any:
+        return v.strip().lower() if isinstance(v, str) else v
+
+    @field_validator("tags", mode="before")
+    @classmethod
+    def _join_tags(cls, v: Any) -> Any:
+        if isinstance(v, (list, tuple)):
+            return ",".join(str(t) for t in v) or None
+        return v or None
+
+
+_records = TypeAdapter(list[MenuRecord])
+
+
+@dataclass
+class IngestReport:
+    days: list[str] = field(default_factory=list)
+    rows: int = 0
+    invalid: int = 0
+    errors: list[str] = field(default_factory=list)
+    # Days with invalid records; left unwritten unless write_partial.
+    invalid_days: set[str] = field(default_factory=set)
+    skipped: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def sample_menu_records(date: str) -> list[dict[str, Any]]:
+    return [
+        {"date": date, "name": name, "meal_period": period, "calories": cal, "protein": pro, "carbs": carb, "fat": fat}
+        for name, period, cal, pro, carb, fat in SAMPLE_MENU
+    ]
+
+
+def _iter_json(f: io.TextIOBase, read_size: int = 1 << 16) -> Iterator[dict[str, Any]]:
+    """Elements of a top-level JSON array, decoded one at a time without loading the file.
+    Elements shaped {"date": ..., "items": [...]} are flattened into per-item records."""
+    decoder = json.JSONDecoder()
+    buf = f.read(read_size).lstrip()
+    if not buf.startswith("["):
+        raise ValueError("JSON menu files must contain a top-level array")
+    pos, eof = 1, False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(read_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        pos = end
+        if isinstance(obj, dict) and isinstance(obj.get("items"), list):
+            day = {k: v for k, v in obj.items() if k != "items"}
+            for item in obj["items"]:
+                yield {**day, **item}
+        else:
+            yield obj
+        if pos > read_size:
+            buf, pos = buf[pos:], 0
+
+
+def iter_raw_records(path: str | Path, fmt: str | None = None) -> Iterator[dict[str, Any]]:
+    """Raw (unvalidated) records from a menu export; fmt defaults to the file extension."""
+    path = Path(path)
+    fmt = fmt or {".jsonl": "ndjson"}.get(path.suffix, path.suffix.lstrip("."))
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown menu file format {fmt!r}; expected one of {FORMATS}")
+    with path.open(newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        elif fmt == "ndjson":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json(f)
+
+
+def validate_chunks(
+    raw: Iterable[dict[str, Any]], report: IngestReport, chunk_size: int = CHUNK_SIZE
+) -> Iterator[list[MenuRecord]]:
+    """Validated records in chunks; invalid ones are counted on report and dropped."""
+    chunk: list[dict[str, Any]] = []
+    seen = 0
+
+    def validate(batch: list[dict[str, Any]], offset: int) -> list[MenuRecord]:
+        try:
+            return _records.validate_python(batch)
+        except ValidationError as e:
+            bad = {err["loc"][0] for err in e.errors()}
+            for err in e.errors():
+                if len(report.errors) < MAX_ERRORS_REPORTED:
+                    report.errors.append(f"record {offset + err['loc'][0]}: {'.'.join(map(str, err['loc'][1:]))}: {err['msg']}")
+            report.invalid += len(bad)
+            report.invalid_days.update(
+                batch[i]["date"] for i in bad if isinstance(batch[i], dict) and isinstance(batch[i].get("date"), str)
+            )
+            return _records.validate_python([r for i, r in enumerate(batch) if i not in bad])
+
+    for record in raw:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield validate(chunk, seen)
+            seen += len(chunk)
+            chunk = []
+    if chunk:
+        yield validate(chunk, seen)
+
+
+def _copy_items(conn: Connection, rows: list[dict[str, Any]]) -> None:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for r in rows:
+        writer.writerow([r["menu_day_id"], *(r[c] for c in ITEM_FIELDS)])
+    buf.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY menu_items (menu_day_id, {', '.join(ITEM_FIELDS)}) FROM STDIN WITH (FORMAT csv)", buf
+        )
+    finally:
+        cursor.close()
+
+
+def write_day(conn: Connection, date: str, records: list[MenuRecord], scraped_at: datetime | None = None) -> int:
+    """Replace date's menu with records inside the caller's transaction; returns the MenuDay id."""
+    scraped_at = scraped_at or datetime.utcnow()
+    source_url = next((r.source_url for r in records if r.source_url), None)
+    day_id = conn.execute(select(MenuDay.id).where(MenuDay.date == date)).scalar()
+    if day_id is None:
+        day_id = conn.execute(
+            insert(MenuDay).values(date=date, scraped_at=scraped_at, source_url=source_url).returning(MenuDay.id)
+        ).scalar_one()
+    else:
+        conn.execute(update(MenuDay).where(MenuDay.id == day_id).values(scraped_at=scraped_at, source_url=source_url))
+        conn.execute(delete(MenuItem).where(MenuItem.menu_day_id == day_id))
+    rows = [{"menu_day_id": day_id, **r.model_dump(include=set(ITEM_FIELDS))} for r in records]
+    if rows:
+        if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+            _copy_items(conn, rows)
+        else:
+            conn.execute(insert(MenuItem), rows)
+    return day_id
+
+
+def ingest_records(
+    raw: Iterable[dict[str, Any]],
+    engine: Engine | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    sorted_input: bool = False,
+    write_partial: bool = False,
+) -> IngestReport:
+    """Validate and write raw records; one transaction per day.
+
+    Records may come in any order unless sorted_input, which keeps only the current day in
+    memory and raises ValueError if a day's records are not contiguous. Days with invalid
+    records are listed under report.skipped instead of replacing the stored menu, unless
+    write_partial.
+    """
+    if engine is None:
+        from app.database import engine
+    report = IngestReport()
+    t0 = time.perf_counter()
+    by_day: dict[str, list[MenuRecord]] = {}
+
+    def write(date: str) -> None:
+        records = by_day.pop(date)
+        if date in report.invalid_days and not write_partial:
+            report.skipped.append(date)
+            return
+        with engine.begin() as conn:
+            write_day(conn, date, records)
+        report.days.append(date)
+        report.rows += len(records)
+
+    seen: set[str] = set()
+    for chunk in validate_chunks(raw, report, chunk_size):
+        for record in chunk:
+            if sorted_input and record.date not in by_day:
+                if record.date in seen:
+                    raise ValueError(f"records for {record.date} are not contiguous; ingest without sorted_input")
+                seen.add(record.date)
+                for done in list(by_day):
+                    write(done)
+            by_day.setdefault(record.date, []).append(record)
+    for date in sorted(by_day):
+        write(date)
+    # Days whose every record was invalid were never buffered.
+    report.skipped.extend(sorted(report.invalid_days - set(report.skipped) - set(report.days)))
+    report.seconds = time.perf_counter() - t0
+    logger.info(
+        "ingested %d rows for %d days (%d invalid, %d days skipped) in %.2fs, %.0f rows/s",
+        report.rows, len(report.days), report.invalid, len(report.skipped), report.seconds, report.rows_per_sec,
+    )
+    return report
+
+
+def ingest_file(
+    path: str | Path,
+    fmt: str | None = None,
+    engine: Engine | None = None,
+    chunk_size: int = CHUNK_SIZE,
+    sorted_input: bool = False,
+    write_partial: bool = False,
+) -> IngestReport:
+    return ingest_records(iter_raw_records(path, fmt), engine, chunk_size, sorted_input, write_partial)
@@ -0,0 +1,45 @@
+"""
+JSON encoding for cached values and pre-serialized responses.
+
+Uses orjson when it is installed (requirements.txt) and the standard library otherwise. Either
+reads what the other wrote. orjson output is compact, and NumPy scalars and non-string keys are
+encoded the way json.dumps(..., default=str) would encode them.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson installed
+    orjson = None
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(value: Any) -> bytes:
+        return orjson.dumps(value, default=str, option=_OPTIONS)
+
+    def dumps(value: Any) -> str:
+        return orjson.dumps(value, default=str, option=_OPTIONS).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(value: Any) -> str:
+        return json.dumps(value, default=str, separators=(",", ":"))
+
+    def dumps_bytes(value: Any) -> bytes:
+        return dumps(value).encode()
+
+    loads = json.loads
+
+
+def extend_object(raw: str, fields: dict[str, Any]) -> str:
+    """raw (an encoded JSON object without any of fields' keys) with fields appended, without
+    decoding and re-encoding the rest of it."""
+    body = raw.rstrip()
+    if not body.endswith("}"):
+        raise ValueError("not a JSON object")
+    head = body[:-1].rstrip()
+    parts = [f"{dumps(k)}:{dumps(v)}" for k, v in fields.items()]
+    sep = "" if head.endswith("{") or not parts else ","
+    return head + sep + ",".join(parts) + "}"
@@ -1,30 +1,92 @@
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+from collections import Counter
+from contextlib import asynccontextmanager, suppress
+from typing import Literal
 
-from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import and_, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.cache import cache_get_json, cache_set_json, cache_stats
+from app.cache import (
+    add_invalidation_hook,
+    cache_invalidate,
+    cache_stats,
+    close_redis,
+    run_invalidation_listener,
+    run_stats_flusher,
+)
 from app.config import settings
-from app.database import get_db
-from app.models import MenuDay, UserProfile
-from app.planner import build_plan
-from pydantic import BaseModel
+from app.database import (
+    AsyncReadSessionLocal,
+    async_engine,
+    async_read_engine,
+    get_async_db,
+    get_async_read_db,
+    pool_stats,
+)
+from app.diet import NO_DIET, DietMask, compile_preferences
+from app.executor import PlannerBusy, planner_executor
+from app.json_codec import dumps, dumps_bytes, extend_object, loads
+from app.menu_index import MAX_WEEK_DAYS, get_compiled_menu, get_compiled_menus, invalidate_compiled_menu
+from app.metrics import MetricsMiddleware, register_collector, render as render_metrics
+from app.models import MealPlan, MenuDay, UserProfile
+from app.plan_cache import (
+    PLAN_CACHE_PREFIX,
+    SWAP_MARKER,
+    alternative_plan_id,
+    parse_plan_key,
+    plan_cache_key,
+    plan_seed,
+    quantize_targets,
+    session_variant,
+    split_swap_key,
+    swap_cache_key,
+)
+from app.plan_store import meal_plan_row, plan_writer
+from app.profile_cache import (
+    get_cached_profile,
+    load_profile,
+    load_profiles,
+    profile_dict,
+    profile_diet,
+    put_cached_profile,
+)
+from app.responses import etag_matches, json_response, make_etag, not_modified
+from app.planner import MAX_ALTERNATIVES, plan_deltas
+from pydantic import BaseModel, ValidationError
 
-from app.schemas import HealthResponse, PlanResponse, PlanTargets
+from app.schemas import (
+    DietPreferences,
+    HealthResponse,
+    PlanAlternativesResponse,
+    PlanBatchEntry,
+    PlanBatchRequest,
+    PlanHistoryResponse,
+    PlanResponse,
+    PlanSwapRequest,
+    PlanTargets,
+    WeekPlanResponse,
+)
+from app.singleflight import cached_json, cached_text
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-MENU_CACHE_KEY = "menu:today"
+MENU_CACHE_PREFIX = "menu:"
 MENU_TTL = 3600
-PLAN_CACHE_PREFIX = "plan:"
 PLAN_TTL = 300
+DEFAULT_TARGETS = {"calories": 2000, "protein": 150, "carbs": 200, "fat": 65}
+MAX_TRACKED_BUCKETS = 4096
+MAX_PLAN_SWAPS = 32
 
+# Quantized target bucket -> /api/plan requests in this worker; picks what the warm-up plans.
+_bucket_requests: Counter[tuple] = Counter()
 
-def _targets_from_body(body: PlanTargets | None) -> dict[str, float]:
+
+def _targets_from_body(body: PlanTargets | UserProfile | None) -> dict[str, float]:
     t: dict[str, float] = {}
     if body:
         if body.daily_calories is not None:
@@ -38,140 +100,654 @@ def _targets_from_body(body: PlanTargets | None) -> dict[str, float]:
     return t
 
 
-def _plan_cache_key(session_id: str, targets: dict[str, float]) -> str:
-    parts = sorted(f"{k}:{v}" for k, v in targets.items())
-    return f"{PLAN_CACHE_PREFIX}{session_id}:{':'.join(parts)}"
+def _diet_from_body(body: PlanTargets | None) -> DietMask | None:
+    """The body's diet, or None when it leaves preferences to the session profile."""
+    if body is None or body.preferences is None:
+        return None
+    return compile_preferences(body.preferences.model_dump())
+
+
+async def _plan_inputs(
+    db: AsyncSession, session_id: str, body: PlanTargets | None
+) -> tuple[dict[str, float], DietMask]:
+    """Targets and diet for a plan request: the body's, each falling back to what session_id
+    saved with POST /api/profile, then to DEFAULT_TARGETS and no restriction."""
+    targets, diet = _targets_from_body(body), _diet_from_body(body)
+    if session_id and (not targets or diet is None):
+        profile = await get_cached_profile(db, session_id)
+        if profile:
+            targets = targets or _targets_from_body(PlanTargets.model_construct(**profile))
+            diet = profile_diet(profile.get("preferences")) if diet is None else diet
+    return targets or dict(DEFAULT_TARGETS), NO_DIET if diet is None else diet
+
+
+def _menu_cache_key(menu) -> str:
+    return f"{MENU_CACHE_PREFIX}{menu.date}:{menu.version}"
+
+
+async def invalidate_menu_caches(date: str) -> None:
+    """Drop everything derived from date's menu (compiled menu, menu and plan responses) after a
+    reseed, in this worker and, through the invalidation channel, in every other one."""
+    invalidate_compiled_menu(date)
+    await cache_invalidate(f"{MENU_CACHE_PREFIX}{date}:", prefix=True)
+    await cache_invalidate(f"{PLAN_CACHE_PREFIX}{date}:", prefix=True)
 
 
-def _ensure_sqlite_seeded():
-    """When using SQLite, create tables and seed today's menu so the app works without Docker."""
-    from datetime import date, datetime
+def _on_cache_invalidate(key: str, prefix: bool) -> None:
+    if key.startswith(MENU_CACHE_PREFIX):
+        invalidate_compiled_menu(key[len(MENU_CACHE_PREFIX):].split(":", 1)[0])
+
+
+add_invalidation_hook(_on_cache_invalidate)
+
+
+def _ensure_sqlite_seeded() -> str | None:
+    """When using SQLite, create tables and seed today's menu so the app works without Docker.
+
+    Returns the seeded date, or None when nothing was written.
+    """
+    from datetime import date
     from app.database import Base, SessionLocal, engine
-    from app.models import MenuDay, MenuItem
+    from app.ingest import ingest_records, sample_menu_records
+    from app.models import MenuDay
     if "sqlite" not in settings.database_url:
-        return
+        return None
     Base.metadata.create_all(bind=engine)
-    db = SessionLocal()
-    try:
-        today = date.today().isoformat()
-        if db.query(MenuDay).filter(MenuDay.date == today).first():
-            return
-        menu_day = MenuDay(date=today, scraped_at=datetime.utcnow())
-        db.add(menu_day)
-        db.flush()
-        for name, period, cal, pro, carb, fat in [
-            ("Oatmeal", "breakfast", 150, 5, 27, 3), ("Eggs", "breakfast", 200, 14, 2, 15),
-            ("Salad", "lunch", 300, 12, 20, 18), ("Grilled Chicken", "lunch", 400, 35, 0, 22),
-            ("Pasta", "dinner", 450, 15, 60, 12), ("Salmon", "dinner", 380, 34, 0, 24),
-        ]:
-            db.add(MenuItem(menu_day_id=menu_day.id, name=name, meal_period=period, calories=cal, protein=pro, carbs=carb, fat=fat))
-        db.commit()
-        logger.info("Seeded today's menu for SQLite (no-Docker mode)")
-    finally:
-        db.close()
+    today = date.today().isoformat()
+    with SessionLocal() as db:
+        if db.query(MenuDay.id).filter(MenuDay.date == today).first():
+            return None
+    ingest_records(sample_menu_records(today), engine)
+    logger.info("Seeded today's menu for SQLite (no-Docker mode)")
+    return today
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    _ensure_sqlite_seeded()
+    from datetime import date
+    seeded = _ensure_sqlite_seeded()
+    if seeded:
+        await invalidate_menu_caches(seeded)
+    background = [
+        asyncio.create_task(run_invalidation_listener()),
+        asyncio.create_task(run_stats_flusher()),
+    ]
+    if settings.menu_warmup_lead_s > 0:
+        background.append(asyncio.create_task(_run_midnight_warmup()))
+    menu = None
+    try:
+        async with AsyncReadSessionLocal() as db:
+            menu = await get_compiled_menu(db, date.today().isoformat())
+    except Exception as e:
+        logger.warning("Could not pre-load today's menu for the planner pool: %s", e)
+    planner_executor.start(menu)
+    plan_writer.start()
     yield
-    # shutdown if needed
+    await plan_writer.close()
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    planner_executor.shutdown()
+    # Pooled connections and the Redis client are bound to this event loop.
+    await close_redis()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
 
 
 app = FastAPI(title="NutriOpt API", version="1.0.0", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(MetricsMiddleware)
+
+
+def _runtime_gauges():
+    """Planner executor, plan writer, L1 cache and connection pool state for GET /metrics, read at
+    scrape time."""
+    from app import cache
+
+    planner, writer, l1 = planner_executor.stats(), plan_writer.stats(), cache.l1.stats()
+    pools = pool_stats()
+    return [
+        ("planner_in_flight", "gauge", "Planner tasks running.", [({}, planner["in_flight"])]),
+        ("planner_queue_depth", "gauge", "Planner tasks waiting for a slot.", [({}, planner["queue_depth"])]),
+        ("planner_rejected_total", "counter", "Plans rejected with 503 (queue full).", [({}, planner["rejected"])]),
+        ("plan_writer_pending", "gauge", "Served plans not yet written to meal_plans.", [({}, writer["pending"])]),
+        ("plan_writer_written_total", "counter", "Plans written to meal_plans.", [({}, writer["written"])]),
+        ("plan_writer_dropped_total", "counter", "Plans dropped (buffer full).", [({}, writer["dropped"])]),
+        ("cache_l1_entries", "gauge", "Entries in this worker's L1 cache.", [({}, l1["size"])]),
+        ("cache_l1_requests_total", "counter", "L1 cache lookups by result.",
+         [({"result": "hit"}, l1["hits"]), ({"result": "miss"}, l1["misses"])]),
+        ("cache_l1_evictions_total", "counter", "L1 entries evicted for size.", [({}, l1["evictions"])]),
+        ("db_pool_checked_out", "gauge", "Connections in use, by pool.",
+         [({"pool": name}, p["checked_out"]) for name, p in pools.items() if "checked_out" in p]),
+        ("db_pool_saturation", "gauge", "Connections in use / pool capacity, by pool.",
+         [({"pool": name}, p["saturation"]) for name, p in pools.items() if p.get("saturation") is not None]),
+        ("db_pool_timeouts_total", "counter", "Checkouts that gave up after DB_POOL_TIMEOUT_S, by pool.",
+         [({"pool": name}, p["timeouts"]) for name, p in pools.items() if "timeouts" in p]),
+    ]
+
+
+register_collector(_runtime_gauges)
 
 
 @app.get("/health", response_model=HealthResponse)
-def health(db: Session = Depends(get_db)):
+async def health(db: AsyncSession = Depends(get_async_db)):
     try:
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         db_status = "healthy"
     except Exception:
         db_status = "unhealthy"
     return HealthResponse(
         status="healthy" if db_status == "healthy" else "degraded",
         database=db_status,
-        cache=cache_stats(),
+        cache=await cache_stats(),
+        planner=planner_executor.stats(),
+        plan_writer=plan_writer.stats(),
+        database_pools=pool_stats(),
     )
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """This worker's metrics in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class _NoMenu(Exception):
+    pass
+
+
+async def _load_menu(today: str):
+    # Own session: cache fills are shared by concurrent requests and may outlive any one of them.
+    # Menus are read-only here, so they come from the read replica when one is configured.
+    async with AsyncReadSessionLocal() as db:
+        menu = await get_compiled_menu(db, today)
+    if menu is None or not menu.items:
+        raise _NoMenu(today)
+    return menu
+
+
+def _menu_payload(menu) -> dict:
+    return {"date": menu.date, "items": list(menu.items)}
+
+
 @app.get("/api/menu/today")
-def menu_today(db: Session = Depends(get_db)):
-    cached = cache_get_json(MENU_CACHE_KEY)
-    if cached is not None:
-        return cached
+async def menu_today(if_none_match: str | None = Header(None)):
+    """Today's menu, sent as cached JSON text. The ETag is derived from the menu version, so a
+    client polling with If-None-Match gets a 304 without a cache lookup."""
     from datetime import date
     today = date.today().isoformat()
-    menu_day = db.query(MenuDay).filter(MenuDay.date == today).first()
-    if not menu_day:
+    try:
+        menu = await _load_menu(today)
+    except _NoMenu:
         return {"date": today, "items": [], "message": "No menu for today. Seed or scrape first."}
-    items = [
-        {
-            "id": m.id,
-            "name": m.name,
-            "meal_period": m.meal_period,
-            "calories": m.calories,
-            "protein": m.protein,
-            "carbs": m.carbs,
-            "fat": m.fat,
-        }
-        for m in menu_day.menu_items
-    ]
-    out = {"date": today, "items": items}
-    cache_set_json(MENU_CACHE_KEY, out, MENU_TTL)
-    return out
 
+    cache_key = _menu_cache_key(menu)
+    etag = make_etag(cache_key)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    async def compute():
+        return _menu_payload(menu)
+
+    return json_response(await cached_text(cache_key, MENU_TTL, compute), etag)
+
+
+def _busy_http(e: PlannerBusy) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Planner is busy, retry shortly.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def _cached_plan_text(
+    menu,
+    targets: dict[str, float],
+    optimize: str,
+    variant: int | None = None,
+    ttl: int = PLAN_TTL,
+    diet: DietMask = NO_DIET,
+) -> tuple[str, str]:
+    """(plan_id, JSON text) of the shared plan for menu at quantized targets and diet, computed
+    at most once per key across workers; plan_id is the cache key. Plans are cached without
+    deltas: those depend on each caller's own targets."""
+    cache_key = plan_cache_key(menu, targets, optimize, variant, diet)
+
+    async def compute():
+        logger.info("plan key=%s menu_items=%d", cache_key, len(menu.items))
+        plan = await planner_executor.run(menu, targets, diet=diet, optimize=optimize, seed=plan_seed(cache_key))
+        plan.pop("deltas", None)
+        return plan
+
+    return cache_key, await cached_text(cache_key, ttl, compute)
+
+
+async def _cached_plan(
+    menu,
+    targets: dict[str, float],
+    optimize: str,
+    variant: int | None = None,
+    ttl: int = PLAN_TTL,
+    diet: DietMask = NO_DIET,
+) -> dict:
+    """_cached_plan_text decoded, with its plan_id."""
+    plan_id, raw = await _cached_plan_text(menu, targets, optimize, variant, ttl, diet)
+    return {**loads(raw), "plan_id": plan_id}
+
+
+async def _cached_alternatives_text(
+    menu,
+    targets: dict[str, float],
+    optimize: str,
+    k: int,
+    variant: int | None = None,
+    diet: DietMask = NO_DIET,
+) -> tuple[str, str]:
+    """(cache key, JSON text) of up to k ranked alternative plans for menu at quantized targets
+    and diet, planned in one task and cached together. The text is {"alternatives": [...]}; each
+    plan has its own plan_id and its error, and no deltas."""
+    cache_key = plan_cache_key(menu, targets, optimize, variant, diet, k)
+
+    async def compute():
+        logger.info("plan alternatives key=%s menu_items=%d", cache_key, len(menu.items))
+        plans = await planner_executor.run_alternatives(
+            menu, targets, k, diet=diet, optimize=optimize, seed=plan_seed(cache_key)
+        )
+        for rank, plan in enumerate(plans):
+            plan.pop("deltas", None)
+            plan["plan_id"] = alternative_plan_id(cache_key, rank)
+        return {"alternatives": plans}
+
+    return cache_key, await cached_text(cache_key, PLAN_TTL, compute)
+
+
+async def _plan_by_id(menu, plan_id: str) -> dict:
+    """The plan behind a plan_id on menu: cached, or recomputed (every plan is seeded from its
+    key, so it comes out the same). ValueError for ids that are not plan keys."""
+    if split_swap_key(plan_id) is not None:
+        return await _swapped_plan(menu, plan_id)
+    key = parse_plan_key(plan_id)
+    if key.alternatives is None:
+        return await _cached_plan(menu, key.targets, key.optimize, key.variant, diet=key.diet)
+    if key.alternative is None:
+        raise ValueError(f"not a plan_id: {plan_id!r}")
+    _, raw = await _cached_alternatives_text(menu, key.targets, key.optimize, key.alternatives, key.variant, key.diet)
+    plans = loads(raw)["alternatives"]
+    if key.alternative >= len(plans):
+        raise ValueError(f"no alternative {key.alternative} in {plan_id!r}")
+    return plans[key.alternative]
+
+
+async def _swapped_plan(menu, swap_id: str) -> dict:
+    """Plan for a swap_cache_key: its parent with one meal re-filled by replan_slot."""
+    parent_id, slot, item_id = split_swap_key(swap_id)
+    key = parse_plan_key(swap_id)
+
+    async def compute():
+        parent = await _plan_by_id(menu, parent_id)
+        logger.info("plan swap key=%s", swap_id)
+        return await planner_executor.run_swap(
+            menu, parent, key.targets, slot, diet=key.diet, item_id=item_id, seed=plan_seed(swap_id)
+        )
+
+    return {**await cached_json(swap_id, PLAN_TTL, compute), "plan_id": swap_id}
+
+
+async def precompute_plans(
+    menu, targets_list: list[dict[str, float]], optimize: str = "greedy", ttl: int = PLAN_TTL
+) -> int:
+    """Fill the plan cache for popular target buckets, including every per-session variant."""
+    buckets = {tuple(sorted(quantize_targets(t).items())) for t in targets_list}
+    for bucket in buckets:
+        for variant in (None, *range(settings.plan_variants)):
+            await _cached_plan(menu, dict(bucket), optimize, variant, ttl)
+    return len(buckets) * (settings.plan_variants + 1)
+
+
+def _track_bucket(targets: dict[str, float]) -> None:
+    _bucket_requests[tuple(sorted(targets.items()))] += 1
+    if len(_bucket_requests) > MAX_TRACKED_BUCKETS:
+        keep = _bucket_requests.most_common(MAX_TRACKED_BUCKETS // 2)
+        _bucket_requests.clear()
+        _bucket_requests.update(dict(keep))
 
-@app.post("/api/plan", response_model=PlanResponse)
-def plan(
+
+def popular_targets(n: int) -> list[dict[str, float]]:
+    """The n most requested target buckets in this worker, always including the defaults."""
+    top = [dict(bucket) for bucket, _ in _bucket_requests.most_common(n)]
+    return [quantize_targets(DEFAULT_TARGETS), *top][: max(n, 1)]
+
+
+async def warm_day(day: str) -> bool:
+    """Load day's menu and fill its menu and popular plan cache entries; False if it has no menu."""
+    try:
+        menu = await _load_menu(day)
+    except _NoMenu:
+        return False
+
+    async def compute():
+        return _menu_payload(menu)
+
+    # Entries written before rollover must still be there for the first morning requests.
+    ttl_extra = settings.menu_warmup_lead_s
+    await cached_json(_menu_cache_key(menu), MENU_TTL + ttl_extra, compute)
+    n = await precompute_plans(menu, popular_targets(settings.warmup_plan_buckets), ttl=PLAN_TTL + ttl_extra)
+    logger.info("warmed menu %s version=%s plans=%d", day, menu.version, n)
+    return True
+
+
+def _seconds_until_warmup(now) -> float:
+    """Seconds from now (a datetime) until menu_warmup_lead_s before the next local midnight."""
+    from datetime import datetime, time, timedelta
+    midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+    return max((midnight - now).total_seconds() - settings.menu_warmup_lead_s, 0.0)
+
+
+async def _run_midnight_warmup() -> None:
+    """Warm tomorrow's caches shortly before every rollover (runs until cancelled)."""
+    from datetime import datetime, timedelta
+    while True:
+        now = datetime.now()
+        await asyncio.sleep(_seconds_until_warmup(now))
+        tomorrow = (datetime.now() + timedelta(seconds=settings.menu_warmup_lead_s + 1)).date()
+        try:
+            if not await warm_day(tomorrow.isoformat()):
+                logger.warning("no menu for %s yet; first requests after midnight will be cold", tomorrow)
+        except Exception:
+            logger.exception("menu warm-up for %s failed", tomorrow)
+        # Past the warm-up point until midnight: wait for the next day's.
+        await asyncio.sleep(settings.menu_warmup_lead_s + 1)
+
+
+@app.post("/api/plan", response_model=PlanResponse | PlanAlternativesResponse)
+async def plan(
     body: PlanTargets | None = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_session_id: str | None = Header(None, alias="X-Session-Id"),
+    if_none_match: str | None = Header(None),
+    optimize: Literal["greedy", "exact"] = Query("greedy"),
+    vary: bool = Query(False),
+    alternatives: int | None = Query(None, ge=1, le=MAX_ALTERNATIVES),
 ):
+    """Plan for the body's targets and dietary preferences (or the session profile's), sent as
+    the cached plan's JSON text with plan_id and deltas appended. The ETag covers the plan and
+    the requested targets; a matching If-None-Match gets a 304, which is not recorded in the
+    session's history.
+
+    With alternatives=K the response is {"alternatives": [...]}: up to K different plans from
+    one planner run, best first, each with its plan_id, error and deltas. Only the best one is
+    recorded in the session's history."""
     session_id = x_session_id or ""
     from datetime import date
     today = date.today().isoformat()
-    targets = _targets_from_body(body)
-    if not targets:
-        profile = db.query(UserProfile).filter(UserProfile.session_id == session_id).first() if session_id else None
-        if profile:
-            if profile.daily_calories is not None:
-                targets["calories"] = profile.daily_calories
-            if profile.daily_protein is not None:
-                targets["protein"] = profile.daily_protein
-            if profile.daily_carbs is not None:
-                targets["carbs"] = profile.daily_carbs
-            if profile.daily_fat is not None:
-                targets["fat"] = profile.daily_fat
-    if not targets:
-        targets = {"calories": 2000, "protein": 150, "carbs": 200, "fat": 65}
-
-    cache_key = _plan_cache_key(session_id or "anon", targets)
-    cached = cache_get_json(cache_key)
-    if cached is not None:
-        return cached
-
-    menu_day = db.query(MenuDay).filter(MenuDay.date == today).first()
-    if not menu_day or not menu_day.menu_items:
-        raise HTTPException(status_code=404, detail="No menu for today. Seed or scrape first.")
-
-    items = [
+    targets, diet = await _plan_inputs(db, session_id, body)
+
+    try:
+        menu = await _load_menu(today)
+    except _NoMenu as e:
+        raise HTTPException(status_code=404, detail="No menu for today. Seed or scrape first.") from e
+    variant = session_variant(session_id, settings.plan_variants) if vary and session_id else None
+    bucket = quantize_targets(targets)
+    if alternatives is not None:
+        return await _plan_alternatives(
+            menu, session_id, targets, bucket, optimize, alternatives, variant, diet, if_none_match
+        )
+    if optimize == "greedy" and diet == NO_DIET:
+        _track_bucket(bucket)
+    try:
+        plan_id, raw = await _cached_plan_text(menu, bucket, optimize, variant, diet=diet)
+    except PlannerBusy as e:
+        raise _busy_http(e) from e
+    etag = make_etag(plan_id, dumps(targets), raw)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    plan = loads(raw)
+    if session_id:
+        plan_writer.submit(meal_plan_row(session_id, menu.menu_day_id, plan))
+    # The cached plan is for the targets' bucket; report deltas against what was asked for.
+    deltas = plan_deltas(plan["totals"], targets)
+    return json_response(extend_object(raw, {"plan_id": plan_id, "deltas": deltas}), etag)
+
+
+async def _plan_alternatives(
+    menu,
+    session_id: str,
+    targets: dict[str, float],
+    bucket: dict[str, float],
+    optimize: str,
+    k: int,
+    variant: int | None,
+    diet: DietMask,
+    if_none_match: str | None,
+):
+    try:
+        key, raw = await _cached_alternatives_text(menu, bucket, optimize, k, variant, diet)
+    except PlannerBusy as e:
+        raise _busy_http(e) from e
+    etag = make_etag(key, dumps(targets), raw)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    plans = loads(raw)["alternatives"]
+    for plan in plans:
+        plan["deltas"] = plan_deltas(plan["totals"], targets)
+    if session_id:
+        plan_writer.submit(meal_plan_row(session_id, menu.menu_day_id, plans[0]))
+    return json_response(dumps({"alternatives": plans}), etag)
+
+
+@app.post("/api/plan/swap", response_model=PlanResponse)
+async def plan_swap(
+    body: PlanSwapRequest,
+    x_session_id: str | None = Header(None, alias="X-Session-Id"),
+):
+    """Re-fill one meal of a plan returned by /api/plan (or an earlier swap), by plan_id.
+
+    With item_id that item is replaced and the meal keeps its other items; without it the whole
+    meal is re-filled. The other two meals are returned unchanged, and no item already in the plan
+    is picked. The result is cached under its own plan_id, so swaps chain.
+    """
+    try:
+        key = parse_plan_key(body.plan_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail="Unknown plan_id.") from e
+    if body.plan_id.count(SWAP_MARKER) >= MAX_PLAN_SWAPS:
+        raise HTTPException(status_code=400, detail="Too many swaps on one plan; request a new plan.")
+    try:
+        menu = await _load_menu(key.date)
+    except _NoMenu:
+        menu = None
+    if menu is None or menu.version != key.version:
+        raise HTTPException(status_code=409, detail="The menu changed since this plan was made; request a new plan.")
+
+    try:
+        plan = await _plan_by_id(menu, body.plan_id)
+        if body.item_id is not None and all(it["id"] != body.item_id for it in plan[body.meal]["items"]):
+            raise HTTPException(status_code=400, detail=f"Item {body.item_id} is not in {body.meal}.")
+        swapped = await _swapped_plan(menu, swap_cache_key(body.plan_id, body.meal, body.item_id))
+    except PlannerBusy as e:
+        raise _busy_http(e) from e
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail="Unknown plan_id.") from e
+    targets = _targets_from_body(body) or key.targets
+    swapped = {**swapped, "deltas": plan_deltas(swapped["totals"], targets)}
+    if x_session_id:
+        plan_writer.submit(meal_plan_row(x_session_id, menu.menu_day_id, swapped))
+    return swapped
+
+
+@app.post("/api/plan/batch")
+async def plan_batch(
+    body: PlanBatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    optimize: Literal["greedy", "exact"] = Query("greedy"),
+    vary: bool = Query(False),
+):
+    """Plans for many targets against one menu load, streamed as NDJSON in completion order.
+
+    Each line is {"index", "session_id", "plan"} or {"index", "session_id", "error"}; a bad
+    entry or a busy planner fails only its own line. Plans go through the shared plan cache,
+    so entries in the same target bucket are computed once.
+    """
+    from datetime import date
+    today = date.today().isoformat()
+    try:
+        menu = await _load_menu(today)
+    except _NoMenu as e:
+        raise HTTPException(status_code=404, detail="No menu for today. Seed or scrape first.") from e
+
+    entries: list[PlanBatchEntry | Exception] = []
+    for raw in body.entries:
+        try:
+            entries.append(PlanBatchEntry.model_validate(raw))
+        except ValidationError as e:
+            entries.append(e)
+    profiles = await load_profiles(db, {
+        e.session_id for e in entries
+        if isinstance(e, PlanBatchEntry) and e.session_id and (not _targets_from_body(e) or e.preferences is None)
+    })
+    # One planner slot fewer than max_in_flight, so interactive /api/plan traffic can still run.
+    slots = asyncio.Semaphore(max(planner_executor.max_in_flight - 1, 1))
+
+    async def one(index: int, entry: PlanBatchEntry | Exception) -> dict:
+        if isinstance(entry, Exception):
+            return {"index": index, "session_id": None, "error": str(entry)}
+        session_id = entry.session_id or ""
+        profile = profiles.get(session_id)
+        targets = _targets_from_body(entry) or _targets_from_body(profile)
+        targets = targets or dict(DEFAULT_TARGETS)
+        diet = _diet_from_body(entry)
+        if diet is None:
+            diet = profile_diet(profile.preferences) if profile else NO_DIET
+        variant = session_variant(session_id, settings.plan_variants) if vary and session_id else None
+        try:
+            async with slots:
+                plan = await _cached_plan(menu, quantize_targets(targets), optimize, variant, diet=diet)
+        except PlannerBusy as e:
+            return {
+                "index": index,
+                "session_id": entry.session_id,
+                "error": "planner busy",
+                "retry_after": e.retry_after,
+            }
+        except Exception as e:
+            logger.exception("batch plan entry %d failed", index)
+            return {"index": index, "session_id": entry.session_id, "error": str(e)}
+        plan = {**plan, "deltas": plan_deltas(plan["totals"], targets)}
+        if entry.session_id:
+            plan_writer.submit(meal_plan_row(entry.session_id, menu.menu_day_id, plan))
+        return {"index": index, "session_id": entry.session_id, "plan": plan}
+
+    async def stream():
+        tasks = [asyncio.ensure_future(one(i, e)) for i, e in enumerate(entries)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield dumps_bytes(await next_done) + b"\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/api/plan/week", response_model=WeekPlanResponse)
+async def plan_week(
+    body: PlanTargets | None = None,
+    db: AsyncSession = Depends(get_async_db),
+    x_session_id: str | None = Header(None, alias="X-Session-Id"),
+    start: str | None = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    days: int = Query(7, ge=1, le=MAX_WEEK_DAYS),
+    no_repeat_days: int = Query(3, ge=1, le=MAX_WEEK_DAYS),
+    optimize: Literal["greedy", "exact"] = Query("greedy"),
+    read_db: AsyncSession = Depends(get_async_read_db),
+):
+    """Plans for `days` consecutive menu days from `start` (default today) in one planner run,
+    without repeating an item name within no_repeat_days days. With X-Session-Id the day plans
+    are recorded write-behind like /api/plan's; `saved` counts the rows queued."""
+    from datetime import date, timedelta
+    session_id = x_session_id or ""
+    first = date.fromisoformat(start) if start else date.today()
+    dates = [(first + timedelta(days=i)).isoformat() for i in range(days)]
+    targets, diet = await _plan_inputs(db, session_id, body)
+
+    compiled = await get_compiled_menus(read_db, dates)
+    menus = [compiled[d] for d in dates if d in compiled and compiled[d].items]
+    if not menus:
+        raise HTTPException(status_code=404, detail="No menus for the requested days.")
+    try:
+        week = await planner_executor.run_week(
+            menus, targets, diet=diet, no_repeat_days=no_repeat_days, optimize=optimize
+        )
+    except PlannerBusy as e:
+        raise _busy_http(e) from e
+
+    saved = 0
+    if session_id:
+        for m, day in zip(menus, week["days"]):
+            plan_writer.submit(meal_plan_row(session_id, m.menu_day_id, day))
+            saved += 1
+    return {
+        **week,
+        "missing": [d for d in dates if d not in {m.date for m in menus}],
+        "saved": saved,
+    }
+
+
+def _encode_cursor(created_at, plan_id: int) -> str:
+    return f"{created_at.isoformat()}_{plan_id}"
+
+
+def _decode_cursor(cursor: str):
+    from datetime import datetime
+    try:
+        created_at, plan_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(plan_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="invalid cursor") from e
+
+
+@app.get("/api/plans", response_model=PlanHistoryResponse)
+async def plan_history(
+    session_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """A session's saved plans, newest first. Pass next_cursor back as cursor for the next page;
+    pages are keyset-paginated on (session_id, created_at) via ix_meal_plans_session_created."""
+    q = (
+        select(MealPlan, MenuDay.date)
+        .join(MenuDay, MenuDay.id == MealPlan.menu_day_id)
+        .where(MealPlan.session_id == session_id)
+        .order_by(MealPlan.created_at.desc(), MealPlan.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, plan_id = _decode_cursor(cursor)
+        q = q.where(or_(
+            MealPlan.created_at < created_at,
+            and_(MealPlan.created_at == created_at, MealPlan.id < plan_id),
+        ))
+    rows = (await db.execute(q)).all()
+    page = rows[:limit]
+    plans = [
         {
-            "id": m.id,
-            "name": m.name,
-            "meal_period": m.meal_period,
-            "calories": m.calories,
-            "protein": m.protein,
-            "carbs": m.carbs,
-            "fat": m.fat,
+            "id": p.id,
+            "date": day,
+            "created_at": p.created_at,
+            "totals": {
+                "calories": p.totals_calories,
+                "protein": p.totals_protein,
+                "carbs": p.totals_carbs,
+                "fat": p.totals_fat,
+            },
+            "meals": p.meals,
         }
-        for m in menu_day.menu_items
+        for p, day in page
     ]
-    logger.info("plan targets=%s menu_items=%d", targets, len(items))
-    result = build_plan(items, targets)
-    cache_set_json(cache_key, result, PLAN_TTL)
-    return result
+    next_cursor = _encode_cursor(page[-1][0].created_at, page[-1][0].id) if len(rows) > limit else None
+    return {"plans": plans, "next_cursor": next_cursor}
 
 
 class ProfileUpdate(BaseModel):
@@ -180,15 +756,16 @@ class ProfileUpdate(BaseModel):
     daily_protein: float | None = None
     daily_carbs: float | None = None
     daily_fat: float | None = None
+    preferences: DietPreferences | None = None
 
 
 @app.post("/api/profile")
-def profile_post(payload: ProfileUpdate, db: Session = Depends(get_db)):
+async def profile_post(payload: ProfileUpdate, db: AsyncSession = Depends(get_async_db)):
     session_id = payload.session_id
     if not session_id:
         raise HTTPException(status_code=400, detail="session_id required")
     from datetime import datetime
-    profile = db.query(UserProfile).filter(UserProfile.session_id == session_id).first()
+    profile = await load_profile(db, session_id)
     if profile:
         if payload.daily_calories is not None:
             profile.daily_calories = payload.daily_calories
@@ -198,6 +775,8 @@ def profile_post(payload: ProfileUpdate, db: Session = Depends(get_db)):
             profile.daily_carbs = payload.daily_carbs
         if payload.daily_fat is not None:
             profile.daily_fat = payload.daily_fat
+        if payload.preferences is not None:
+            profile.preferences = payload.preferences.model_dump()
         profile.updated_at = datetime.utcnow()
     else:
         profile = UserProfile(
@@ -206,17 +785,17 @@ def profile_post(payload: ProfileUpdate, db: Session = Depends(get_db)):
             daily_protein=payload.daily_protein,
             daily_carbs=payload.daily_carbs,
             daily_fat=payload.daily_fat,
+            preferences=payload.preferences.model_dump() if payload.preferences is not None else None,
         )
         db.add(profile)
-    db.commit()
+    cached = profile_dict(profile)
+    await db.commit()
+    await put_cached_profile(session_id, cached)
     return {"ok": True}
 
 
 @app.get("/api/profile")
-def profile_get(session_id: str = "", db: Session = Depends(get_db)):
+async def profile_get(session_id: str = "", db: AsyncSession = Depends(get_async_db)):
     if not session_id:
         return {"profile": None}
-    profile = db.query(UserProfile).filter(UserProfile.session_id == session_id).first()
-    if not profile:
-        return {"profile": None}
-    return {"profile": {"daily_calories": profile.daily_calories, "daily_protein": profile.daily_protein, "daily_carbs": profile.daily_carbs, "daily_fat": profile.daily_fat}}
+    return {"profile": await get_cached_profile(db, session_id)}
@@ -0,0 +1,118 @@
+"""
+Compiled per-day menus: built once per MenuDay and shared by every request in the worker.
+Holds API-shaped items, breakfast/lunch/dinner pools of PlanItems (with diet tag bitmasks) and
+an id lookup, so a warm /api/plan or /api/menu/today does no DB round-trips before the planner
+runs.
+Entries are keyed by MenuDay.date (a new day is a new key) and re-validated against
+MenuDay.scraped_at at most every MENU_RECHECK_S; invalidate_compiled_menu() drops them now.
+Rows come from app.menu_repository: a cold day is one joined, column-projected query.
+"""
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.diet import split_tags, tag_mask
+from app.menu_repository import fetch_menu_days, fetch_menu_heads
+from app.planner import ITEM_COLUMNS, PlanItem, partition_pools
+
+MENU_RECHECK_S = 60.0
+MAX_WEEK_DAYS = 14
+# A full /api/plan/week range must not evict today's menu.
+MAX_COMPILED_DAYS = MAX_WEEK_DAYS + 1
+
+
+@dataclass(frozen=True)
+class CompiledMenu:
+    """Immutable snapshot of one day's menu. Item dicts are shared: treat them as read-only."""
+
+    date: str
+    menu_day_id: int
+    scraped_at: Any
+    version: str
+    items: tuple[dict[str, Any], ...]
+    pools: tuple[tuple[PlanItem, ...], ...]
+    by_id: Mapping[int, dict[str, Any]]
+
+
+def compile_menu(date: str, menu_day_id: int, scraped_at: Any, rows: list[tuple]) -> CompiledMenu:
+    """Build a CompiledMenu from (id, name, meal_period, calories, protein, carbs, fat[, tags]) rows.
+    Tags are parsed here, once per menu, into each PlanItem's diet bitmask and listed (normalized)
+    under the item's "tags"."""
+    n = len(ITEM_COLUMNS)
+    tags = [split_tags(row[n]) if len(row) > n else [] for row in rows]
+    items = tuple({**dict(zip(ITEM_COLUMNS, row)), "tags": t} for row, t in zip(rows, tags))
+    digest = hashlib.sha1()
+    for row, t in zip(rows, tags):
+        digest.update(repr((*row[:n], *t)).encode())
+    plan_items = [PlanItem(*row[:n], tag_mask(t)) for row, t in zip(rows, tags)]
+    return CompiledMenu(
+        date=date,
+        menu_day_id=menu_day_id,
+        scraped_at=scraped_at,
+        version=digest.hexdigest()[:12],
+        items=items,
+        pools=tuple(tuple(pool) for pool in partition_pools(plan_items)),
+        by_id=MappingProxyType({it["id"]: it for it in items}),
+    )
+
+
+_lock = threading.Lock()
+# date -> (menu, monotonic time it was last validated against the DB)
+_compiled: dict[str, tuple[CompiledMenu, float]] = {}
+
+
+async def get_compiled_menu(db: AsyncSession, date: str) -> CompiledMenu | None:
+    """Shared CompiledMenu for date, or None when no MenuDay exists for it."""
+    return (await get_compiled_menus(db, [date])).get(date)
+
+
+async def get_compiled_menus(db: AsyncSession, dates: list[str]) -> dict[str, CompiledMenu]:
+    """CompiledMenus for several dates (missing days are left out).
+
+    Dates compiled in this worker within MENU_RECHECK_S cost nothing; older ones are checked with
+    one (id, scraped_at) query, and everything new or changed is loaded with one joined query.
+    """
+    now = time.monotonic()
+    with _lock:
+        entries = {d: _compiled.get(d) for d in dates}
+    out = {d: e[0] for d, e in entries.items() if e is not None and now - e[1] < MENU_RECHECK_S}
+    recheck = [d for d, e in entries.items() if e is not None and d not in out]
+    to_load = [d for d, e in entries.items() if e is None]
+    fresh: dict[str, CompiledMenu] = {}
+    if recheck:
+        heads = await fetch_menu_heads(db, recheck)
+        for d in recheck:
+            menu = entries[d][0]
+            if heads.get(d) == (menu.menu_day_id, menu.scraped_at):
+                fresh[d] = menu
+            elif d in heads:
+                to_load.append(d)
+    if to_load:
+        for d, record in (await fetch_menu_days(db, to_load)).items():
+            fresh[d] = compile_menu(d, record.id, record.scraped_at, record.items)
+
+    with _lock:
+        for d in (*recheck, *to_load):
+            if d in fresh:
+                _compiled[d] = (fresh[d], now)
+            else:
+                _compiled.pop(d, None)
+        # Oldest dates go first once the day rolls over.
+        for stale in sorted(_compiled)[:-MAX_COMPILED_DAYS]:
+            del _compiled[stale]
+    out.update(fresh)
+    return out
+
+
+def invalidate_compiled_menu(date: str | None = None) -> None:
+    """Drop the compiled menu for date (all dates when None), e.g. after reseeding."""
+    with _lock:
+        if date is None:
+            _compiled.clear()
+        else:
+            _compiled.pop(date, None)
@@ -0,0 +1,75 @@
+"""
+Menu reads as single column-projected queries: menu_days joined to menu_items on date, only the
+columns the API and planner use, returned as tuples inside __slots__ records (no ORM identity
+map or lazy relationship loads). Period-filtered fetches put the filter in the join so it is
+served by ix_menu_items_menu_day_period.
+"""
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import MenuDay, MenuItem
+from app.planner import ITEM_COLUMNS
+
+# Rows are ITEM_COLUMNS plus the raw tags text, which menu_index compiles into diet bitmasks.
+_ITEM_ATTRS = (*(getattr(MenuItem, c) for c in ITEM_COLUMNS), MenuItem.tags)
+
+
+class MenuDayRecord:
+    """One MenuDay with its items as (id, name, meal_period, calories, protein, carbs, fat, tags)."""
+
+    __slots__ = ("id", "date", "scraped_at", "items")
+
+    def __init__(self, id: int, date: str, scraped_at: datetime, items: list[tuple[Any, ...]]):
+        self.id = id
+        self.date = date
+        self.scraped_at = scraped_at
+        self.items = items
+
+    def __repr__(self) -> str:
+        return f"MenuDayRecord(date={self.date!r}, id={self.id}, items={len(self.items)})"
+
+
+def _menu_query(dates: Sequence[str], periods: Sequence[str] | None):
+    on = MenuItem.menu_day_id == MenuDay.id
+    if periods:
+        on = and_(on, MenuItem.meal_period.in_(periods))
+    # Outer join: a day without (matching) items still comes back, with NULL item columns.
+    return (
+        select(MenuDay.id, MenuDay.date, MenuDay.scraped_at, *_ITEM_ATTRS)
+        .outerjoin(MenuItem, on)
+        .where(MenuDay.date.in_(dates) if len(dates) != 1 else MenuDay.date == dates[0])
+        .order_by(MenuDay.date, MenuItem.id)
+    )
+
+
+async def fetch_menu_days(
+    db: AsyncSession, dates: Sequence[str], periods: Sequence[str] | None = None
+) -> dict[str, MenuDayRecord]:
+    """MenuDayRecords for dates in one query; days that do not exist are left out."""
+    if not dates:
+        return {}
+    out: dict[str, MenuDayRecord] = {}
+    for row in await db.execute(_menu_query(dates, periods)):
+        day_id, date, scraped_at, *item = row
+        record = out.get(date)
+        if record is None:
+            record = out[date] = MenuDayRecord(day_id, date, scraped_at, [])
+        if item[0] is not None:
+            record.items.append(tuple(item))
+    return out
+
+
+async def fetch_menu_day(
+    db: AsyncSession, date: str, periods: Sequence[str] | None = None
+) -> MenuDayRecord | None:
+    return (await fetch_menu_days(db, [date], periods)).get(date)
+
+
+async def fetch_menu_heads(db: AsyncSession, dates: Sequence[str]) -> dict[str, tuple[int, datetime]]:
+    """(MenuDay.id, scraped_at) per existing date: the cheap check for a changed day."""
+    rows = await db.execute(select(MenuDay.date, MenuDay.id, MenuDay.scraped_at).where(MenuDay.date.in_(dates)))
+    return {date: (day_id, scraped_at) for date, day_id, scraped_at in rows}
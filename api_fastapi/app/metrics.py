@@ -0,0 +1,211 @@
+"""
+In-process metrics in the Prometheus text exposition format, served at GET /metrics.
+
+No client library or push gateway: counters and fixed-bucket histograms are plain dicts keyed by
+label values, updated under one lock (an observe is a bisect and two increments), and rendered
+on scrape. Gauges are read from their owners (planner executor, plan writer, L1 cache) at scrape
+time through register_collector, so they cost nothing between scrapes.
+
+Each worker process serves its own numbers; scrape every worker (or sum per instance). Planner
+timings are measured inside app.planner, returned with each plan and recorded in the API process
+by app.executor, so plans built in the process pool are counted too.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from typing import Any
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+SIZE_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10_000, 25_000, 50_000)
+
+_lock = threading.Lock()
+_metrics: list["_Metric"] = []
+# fn() -> [(name, type, help, [(labels, value), ...]), ...] read at scrape time.
+_collectors: list[Callable[[], Iterable[tuple[str, str, str, list[tuple[dict[str, Any], float]]]]]] = []
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        _metrics.append(self)
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: Any) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labels, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        i = bisect_left(self.buckets, value)
+        with _lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, *labels: Any) -> "_Timer":
+        return _Timer(self, labels)
+
+    def count(self, *labels: Any) -> int:
+        entry = self._values.get(labels)
+        return entry[2] if entry else 0
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labels, (counts, total, n) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, c in zip((*self.buckets, float("inf")), counts):
+                cumulative += c
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {n}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_hist", "_labels", "_t0")
+
+    def __init__(self, hist: Histogram, labels: tuple):
+        self._hist = hist
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._hist.observe(time.perf_counter() - self._t0, *self._labels)
+
+
+def register_collector(fn) -> None:
+    if fn not in _collectors:
+        _collectors.append(fn)
+
+
+def render() -> str:
+    """Every metric and collector in the text exposition format (version 0.0.4)."""
+    with _lock:
+        lines = [line for m in _metrics for line in m.render()]
+    for collect in _collectors:
+        for name, kind, help, samples in collect():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, v in samples:
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(v)}")
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route (until the last body byte).", ("method", "route")
+)
+DB_QUERY = Histogram("db_query_duration_seconds", "SQL statement execution time.", ("operation",), FAST_BUCKETS)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Connection pool checkout wait (including connecting), by pool.", ("pool",), FAST_BUCKETS
+)
+CACHE_OP = Histogram(
+    "cache_operation_duration_seconds",
+    "Cache get/set latency by key prefix; result is l1_hit, hit or miss for gets.",
+    ("op", "prefix", "result"),
+    FAST_BUCKETS,
+)
+PLAN_DURATION = Histogram("plan_build_duration_seconds", "Planner run time inside the planner, by kind.", ("kind",))
+PLAN_STAGE = Histogram(
+    "plan_stage_duration_seconds", "Planner time per meal slot (and the exact solver).", ("stage",)
+)
+PLAN_MENU_ITEMS = Histogram("plan_menu_items", "Menu size (items) of each planner run.", (), SIZE_BUCKETS)
+PLAN_ITERATIONS = Counter("planner_iterations_total", "Greedy slot-fill rounds run.")
+PLAN_CANDIDATES = Counter("planner_candidates_evaluated_total", "Candidate items scored by the greedy fill.")
+
+
+def record_plan_stats(kind: str, stats: dict[str, Any], menu_items: int) -> None:
+    """Record the stats dict a planner run filled in (see app.planner.build_plan_from_pools)."""
+    PLAN_DURATION.observe(stats.get("seconds", 0.0), kind)
+    for stage, seconds in stats.get("stages", {}).items():
+        PLAN_STAGE.observe(seconds, stage)
+    PLAN_MENU_ITEMS.observe(menu_items)
+    PLAN_ITERATIONS.inc(amount=stats.get("iterations", 0))
+    PLAN_CANDIDATES.inc(amount=stats.get("candidates", 0))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status per route template (e.g. /api/plans, not
+    /api/plans?session_id=...). Unmatched paths are recorded as route "unmatched"."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_LATENCY.observe(time.perf_counter() - t0, scope["method"], path)
+            HTTP_REQUESTS.inc(scope["method"], path, status)
@@ -0,0 +1,157 @@
+"""
+Plan cache keys: plans are shared by everyone asking for the same targets on the same menu.
+
+A key is (menu date, menu version, quantized targets, planner ALGORITHM_VERSION, optimize mode,
+diet masks when restricted) and the planner is seeded from the key, so whichever worker fills it
+produces the same plan.
+Targets are snapped to TARGET_QUANTUM buckets before planning; responses recompute deltas against
+the caller's exact targets. Sessions that opt into variety get one of K seeded variants per key,
+picked by a stable hash of the session id.
+
+A plan's cache key doubles as its public plan_id. Swapping one meal (POST /api/plan/swap) caches
+the result under swap_cache_key, which extends the key it came from, so swaps chain and are
+dropped with the menu's other plans.
+
+POST /api/plan?alternatives=K caches its K plans together under one key (plan_cache_key with
+alternatives=K). Each of them has its own plan_id, alternative_plan_id of that key and its rank,
+so any alternative can be swapped or fetched again on its own.
+"""
+import hashlib
+from typing import Any, NamedTuple
+
+from app.diet import NO_DIET, DietMask
+from app.planner import ALGORITHM_VERSION, MACROS, MAX_ALTERNATIVES, OPTIMIZE_MODES, SLOTS
+
+PLAN_CACHE_PREFIX = "plan:"
+SWAP_MARKER = ":swap:"
+ALTERNATIVE_MARKER = ":alt:"
+# Bucket width per macro (kcal / grams). Within a bucket the greedy plan barely moves.
+TARGET_QUANTUM = {"calories": 50, "protein": 5, "carbs": 5, "fat": 5}
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def quantize_targets(targets: dict[str, float]) -> dict[str, float]:
+    """Snap each target to the nearest multiple of its TARGET_QUANTUM (never below one quantum)."""
+    out = {}
+    for k in MACROS:
+        if targets.get(k):
+            q = TARGET_QUANTUM[k]
+            out[k] = float(max(q, round(targets[k] / q) * q))
+    return out
+
+
+def plan_cache_key(
+    menu: Any,
+    targets: dict[str, float],
+    optimize: str = "greedy",
+    variant: int | None = None,
+    diet: DietMask = NO_DIET,
+    alternatives: int | None = None,
+) -> str:
+    """Cache key for a plan of menu (a CompiledMenu) at already-quantized targets, or for its
+    ranked alternatives when alternatives is set."""
+    parts = [menu.date, menu.version, f"a{ALGORITHM_VERSION}"]
+    parts += (f"{k}:{targets[k]:g}" for k in MACROS if k in targets)
+    if optimize != "greedy":
+        parts.append(f"opt:{optimize}")
+    if diet != NO_DIET:
+        parts.append(f"diet:{diet.include:x}-{diet.exclude:x}")
+    if alternatives is not None:
+        parts.append(f"alts:{alternatives}")
+    if variant is not None:
+        parts.append(f"v{variant}")
+    return PLAN_CACHE_PREFIX + ":".join(parts)
+
+
+class PlanKey(NamedTuple):
+    date: str
+    version: str
+    targets: dict[str, float]
+    optimize: str
+    variant: int | None
+    diet: DietMask = NO_DIET
+    alternatives: int | None = None
+    alternative: int | None = None  # rank within the alternatives, for an alternative_plan_id
+
+
+def alternative_plan_id(alternatives_key: str, rank: int) -> str:
+    """plan_id of the rank-th plan (0 is the best) cached under an alternatives key."""
+    return f"{alternatives_key}{ALTERNATIVE_MARKER}{rank}"
+
+
+def swap_cache_key(plan_id: str, slot: str, item_id: int | None = None) -> str:
+    """Key for plan_id with slot re-filled (item_id dropped, or "*" for the whole meal)."""
+    return f"{plan_id}{SWAP_MARKER}{slot}:{'*' if item_id is None else item_id}"
+
+
+def split_swap_key(key: str) -> tuple[str, str, int | None] | None:
+    """(parent plan_id, slot, item_id) of a swap_cache_key, or None for a plain plan key."""
+    parent, sep, swap = key.rpartition(SWAP_MARKER)
+    if not sep:
+        return None
+    slot, _, item = swap.partition(":")
+    if slot not in SLOTS or not (item == "*" or item.isdigit()):
+        raise ValueError(f"not a plan key: {key!r}")
+    return parent, slot, None if item == "*" else int(item)
+
+
+def parse_plan_key(key: str) -> PlanKey:
+    """What a plan (or swap) key was built from; ValueError unless plan_cache_key would produce
+    exactly that plan key under the current ALGORITHM_VERSION."""
+    base = key.split(SWAP_MARKER, 1)[0]
+    parts = base[len(PLAN_CACHE_PREFIX):].split(":") if base.startswith(PLAN_CACHE_PREFIX) else []
+    if len(parts) < 3 or parts[2] != f"a{ALGORITHM_VERSION}":
+        raise ValueError(f"not a plan key: {key!r}")
+    targets: dict[str, float] = {}
+    optimize, variant, diet = "greedy", None, NO_DIET
+    alternatives = alternative = None
+    rest = parts[3:]
+    try:
+        i = 0
+        while i < len(rest):
+            if rest[i] in MACROS:
+                targets[rest[i]] = float(rest[i + 1])
+                i += 2
+            elif rest[i] == "opt":
+                optimize = rest[i + 1]
+                i += 2
+            elif rest[i] == "diet":
+                include, exclude = rest[i + 1].split("-")
+                diet = DietMask(int(include, 16), int(exclude, 16))
+                i += 2
+            elif rest[i] in ("alts", "alt"):
+                if rest[i] == "alts":
+                    alternatives = int(rest[i + 1])
+                else:
+                    alternative = int(rest[i + 1])
+                i += 2
+            else:
+                variant = int(rest[i].removeprefix("v"))
+                i += 1
+    except (IndexError, ValueError) as e:
+        raise ValueError(f"not a plan key: {key!r}") from e
+    parsed = PlanKey(parts[0], parts[1], targets, optimize, variant, diet, alternatives, alternative)
+    valid = optimize in OPTIMIZE_MODES and targets and all(0 < v < float("inf") for v in targets.values())
+    if alternatives is not None:
+        valid = valid and 1 <= alternatives <= MAX_ALTERNATIVES
+    if alternative is not None:
+        valid = valid and alternatives is not None and 0 <= alternative < alternatives
+    canonical = plan_cache_key(parsed, targets, optimize, variant, diet, alternatives)
+    if alternative is not None:
+        canonical = alternative_plan_id(canonical, alternative)
+    if not valid or canonical != base:
+        raise ValueError(f"not a plan key: {key!r}")
+    return parsed
+
+
+def plan_seed(key: str) -> int:
+    """Planner seed for a cache key: stable across processes and restarts."""
+    return _digest(key)
+
+
+def session_variant(session_id: str, variants: int) -> int:
+    """Which of the K per-key variants a session sees; stable for the session."""
+    return _digest(session_id) % max(variants, 1)
@@ -0,0 +1,140 @@
+"""
+Write-behind persistence of generated plans to meal_plans.
+
+Request handlers hand plan rows to PlanWriter.submit(), which only appends to an in-memory
+buffer. A background task writes the buffer with one executemany INSERT whenever it reaches
+plan_write_batch rows or plan_write_flush_ms after the first buffered row, and once more on
+lifespan shutdown. If the database is unavailable rows stay buffered (up to
+plan_write_max_pending, oldest dropped first) and are retried after a backoff that starts at
+plan_write_flush_ms and doubles up to MAX_BACKOFF_S.
+"""
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import MealPlan
+from app.planner import SLOTS
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF_S = 30.0
+
+
+def meal_plan_row(session_id: str, menu_day_id: int, plan: dict[str, Any]) -> dict[str, Any]:
+    """meal_plans row for a build_plan result."""
+    return {
+        "menu_day_id": menu_day_id,
+        "session_id": session_id,
+        "created_at": datetime.utcnow(),
+        "totals_calories": plan["totals"]["calories"],
+        "totals_protein": plan["totals"]["protein"],
+        "totals_carbs": plan["totals"]["carbs"],
+        "totals_fat": plan["totals"]["fat"],
+        "meals": {slot: plan[slot] for slot in SLOTS},
+    }
+
+
+class PlanWriter:
+    def __init__(self, batch_size: int, flush_ms: int, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self._pending: deque[dict[str, Any]] = deque(maxlen=max_pending)
+        self._wake: asyncio.Event | None = None
+        self._stop: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._written = 0
+        self._dropped = 0
+        self._failed_flushes = 0
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, row: dict[str, Any]) -> None:
+        """Buffer one meal_plans row; never blocks or touches the database."""
+        if len(self._pending) == self._pending.maxlen:
+            self._dropped += 1
+        self._pending.append(row)
+        if self._wake is not None and (len(self._pending) >= self.batch_size or len(self._pending) == 1):
+            self._wake.set()
+
+    async def _run(self) -> None:
+        backoff_s = self.flush_ms / 1000
+        while not self._stop.is_set():
+            await self._wake.wait()
+            self._wake.clear()
+            if len(self._pending) < self.batch_size and not self._stop.is_set():
+                # Give the batch flush_ms to fill up, unless it fills sooner.
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+            failed_flushes = self._failed_flushes
+            await self.flush()
+            if self._failed_flushes > failed_flushes:
+                # Database unavailable: don't spin retrying a full batch.
+                try:
+                    await asyncio.wait_for(self._stop.wait(), backoff_s)
+                except asyncio.TimeoutError:
+                    pass
+                backoff_s = min(backoff_s * 2, MAX_BACKOFF_S)
+            else:
+                backoff_s = self.flush_ms / 1000
+            if self._pending:
+                self._wake.set()
+
+    async def flush(self) -> int:
+        """Write up to everything buffered, batch_size rows per INSERT; returns rows written."""
+        written = 0
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(MealPlan), batch)
+                    await db.commit()
+            except Exception as e:
+                self._failed_flushes += 1
+                # Rows submitted meanwhile may have filled the buffer; extendleft then evicts
+                # the newest ones from the right.
+                self._dropped += max(len(self._pending) + len(batch) - self._pending.maxlen, 0)
+                self._pending.extendleft(reversed(batch))
+                logger.warning("meal_plans flush of %d rows failed: %s", len(batch), e)
+                break
+            written += len(batch)
+        self._written += written
+        return written
+
+    async def close(self) -> None:
+        """Stop the background task and write whatever is still buffered.
+
+        The task is asked to stop rather than cancelled: a batch it has taken off the buffer is
+        still being inserted, and cancelling would lose it."""
+        if self._task is not None:
+            self._stop.set()
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "written": self._written,
+            "dropped": self._dropped,
+            "failed_flushes": self._failed_flushes,
+        }
+
+
+plan_writer = PlanWriter(
+    batch_size=settings.plan_write_batch,
+    flush_ms=settings.plan_write_flush_ms,
+    max_pending=settings.plan_write_max_pending,
+)
@@ -1,13 +1,80 @@
 """
 Rule-based meal optimizer: greedy selection to meet nutritional targets.
 Partitions by meal_period; fills each slot to approach target/3 for calories/protein/carbs/fat.
+Large pools are scored with a NumPy engine (columnar macros + used-mask) that picks the same items.
+Shuffles and tie-breaks draw from one random.Random per plan, so a given seed reproduces a plan.
+Inside the planner items are PlanItem (__slots__) records; dicts appear only in build_plan's
+input and in the returned plan. Dietary restrictions are applied before planning, by narrowing
+the pools with app.diet tag bitmasks. Callers that pass a stats dict get per-slot timings and greedy
+round/candidate counts back in it (recorded as metrics by app.executor).
 """
 import random
+import time
+from collections import deque
+from collections.abc import Sequence
 from typing import Any
 
+import numpy as np
+
+from app.diet import NO_DIET, DietMask, filter_pools, tag_mask
+
 TOLERANCE = 0.05
 MAX_ITEMS_PER_MEAL = 5
 WEIGHTS = {"protein": 4, "carbs": 2, "fat": 1, "calories": 0.5}
+MACROS = ("calories", "protein", "carbs", "fat")
+SLOTS = ("breakfast", "lunch", "dinner")
+MACRO_INDEX = {k: i for i, k in enumerate(MACROS)}
+# Pools at least this large use _fill_slot_np; below it the per-call NumPy overhead dominates.
+VECTORIZE_MIN_ITEMS = 200
+ENGINES = ("auto", "python", "numpy")
+OPTIMIZE_MODES = ("greedy", "exact")
+# build_alternative_plans: extra slot error per earlier alternative that used an item.
+DIVERSITY_PENALTY = 0.25
+MAX_ALTERNATIVES = 10
+# Part of every plan cache key: bump when a change would make cached plans differ for a seed.
+ALGORITHM_VERSION = 1
+
+
+# Menu item columns in PlanItem field order; app.menu_repository selects rows in this order.
+ITEM_COLUMNS = ("id", "name", "meal_period", "calories", "protein", "carbs", "fat")
+
+
+class PlanItem:
+    """Compact planner item. Field order matches ITEM_COLUMNS rows; tags is the item's app.diet
+    bitmask (0 when untagged)."""
+
+    __slots__ = ("id", "name", "meal_period", "calories", "protein", "carbs", "fat", "tags")
+
+    def __init__(self, id, name, meal_period, calories, protein, carbs, fat, tags=0):
+        self.id = id
+        self.name = name
+        self.meal_period = meal_period
+        self.calories = calories
+        self.protein = protein
+        self.carbs = carbs
+        self.fat = fat
+        self.tags = tags
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "PlanItem":
+        return cls(
+            d["id"], d.get("name"), d.get("meal_period"), d["calories"], d["protein"], d["carbs"], d["fat"],
+            tag_mask(d.get("tags")),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "meal_period": self.meal_period,
+            "calories": self.calories,
+            "protein": self.protein,
+            "carbs": self.carbs,
+            "fat": self.fat,
+        }
+
+    def __repr__(self) -> str:
+        return f"PlanItem(id={self.id!r}, name={self.name!r})"
 
 
 def _slot_error(
@@ -29,100 +96,465 @@ def _slot_error(
     return err
 
 
+def _error_terms(slot_targets: dict[str, float]) -> tuple[tuple[int, float, float, float, float], ...]:
+    """_slot_error precomputed per target, in slot_targets order: (MACROS index or -1 for
+    unknown keys, target, norm, overshoot, weight). Used with _terms_error."""
+    return tuple(
+        (
+            MACRO_INDEX.get(k, -1),
+            target,
+            max(target, 1.0),
+            1.5 if k in ("calories", "fat", "carbs") else 1.0,
+            WEIGHTS.get(k, 1),
+        )
+        for k, target in slot_targets.items()
+        if target > 0
+    )
+
+
+def _terms_error(terms: tuple[tuple[int, float, float, float, float], ...], totals: list[float]) -> float:
+    """_slot_error for totals in MACROS order, with the same float operations in the same order."""
+    err = 0.0
+    for i, target, norm, overshoot, weight in terms:
+        diff = (totals[i] if i >= 0 else 0) - target
+        if diff > 0:
+            err += (overshoot * (diff / norm)) * weight
+        else:
+            err += (abs(diff) / norm) * weight
+    return err
+
+
 def _fill_slot(
-    items: list[dict[str, Any]],
+    items: list[PlanItem],
     slot_targets: dict[str, float],
     used_ids: set[int],
-) -> list[dict[str, Any]]:
-    chosen: list[dict[str, Any]] = []
-    current = {"calories": 0.0, "protein": 0.0, "carbs": 0.0, "fat": 0.0}
+    rng: random.Random,
+    start: Sequence[PlanItem] = (),
+    stats: dict[str, Any] | None = None,
+    penalty: dict[int, float] | None = None,
+) -> list[PlanItem]:
+    """Greedy fill of one slot, continuing from the items in start (already in used_ids).
+    penalty (item id -> extra error) steers picks away from items without excluding them."""
+    chosen: list[PlanItem] = list(start)
+    terms = _error_terms(slot_targets)
+    # Running totals and the per-candidate trial are updated in place: no per-candidate dicts.
+    current = [0.0, 0.0, 0.0, 0.0]
+    trial = [0.0, 0.0, 0.0, 0.0]
+    for it in chosen:
+        current[0] += it.calories
+        current[1] += it.protein
+        current[2] += it.carbs
+        current[3] += it.fat
+    rounds = evaluated = 0
 
-    for _ in range(MAX_ITEMS_PER_MEAL):
-        if _slot_error(current, slot_targets) <= TOLERANCE:
+    for _ in range(MAX_ITEMS_PER_MEAL - len(chosen)):
+        if _terms_error(terms, current) <= TOLERANCE:
             break
-        best_candidates: list[dict[str, Any]] = []
+        best_candidates: list[PlanItem] = []
         best_err = float("inf")
+        cal, pro, carb, fat = current
+        skipped = 0
 
         for it in items:
-            if it["id"] in used_ids:
+            if it.id in used_ids:
+                skipped += 1
                 continue
-            trial = {
-                "calories": current["calories"] + it["calories"],
-                "protein": current["protein"] + it["protein"],
-                "carbs": current["carbs"] + it["carbs"],
-                "fat": current["fat"] + it["fat"],
-            }
-            err = _slot_error(trial, slot_targets)
+            trial[0] = cal + it.calories
+            trial[1] = pro + it.protein
+            trial[2] = carb + it.carbs
+            trial[3] = fat + it.fat
+            err = _terms_error(terms, trial)
+            if penalty:
+                err += penalty.get(it.id, 0.0)
             if err < best_err:
                 best_err = err
                 best_candidates = [it]
             elif err == best_err:
                 best_candidates.append(it)
 
+        rounds += 1
+        evaluated += len(items) - skipped
         if not best_candidates:
             break
-        best = random.choice(best_candidates)
+        best = rng.choice(best_candidates)
         chosen.append(best)
-        used_ids.add(best["id"])
-        current = {
-            "calories": current["calories"] + best["calories"],
-            "protein": current["protein"] + best["protein"],
-            "carbs": current["carbs"] + best["carbs"],
-            "fat": current["fat"] + best["fat"],
-        }
+        used_ids.add(best.id)
+        current[0] += best.calories
+        current[1] += best.protein
+        current[2] += best.carbs
+        current[3] += best.fat
 
+    _count(stats, rounds, evaluated)
     return chosen
 
 
-def build_plan(
-    items: list[dict[str, Any]],
-    targets: dict[str, float],
-) -> dict[str, Any]:
-    """Rule-based optimization over nutritional targets. Returns breakfast, lunch, dinner + totals + deltas."""
+def _macro_matrix(items: Sequence[PlanItem]) -> np.ndarray:
+    """(N, 4) float64 array of calories/protein/carbs/fat in MACROS order."""
+    return np.array(
+        [(it.calories, it.protein, it.carbs, it.fat) for it in items],
+        dtype=np.float64,
+    ).reshape(-1, len(MACROS))
+
+
+def _batch_slot_error(totals: np.ndarray, slot_targets: dict[str, float]) -> np.ndarray:
+    """_slot_error for every row of an (N, 4) totals array.
+
+    Terms are accumulated in slot_targets order with the same float operations as
+    _slot_error, so equal errors stay equal and tie-breaking is unchanged.
+    """
+    err = np.zeros(totals.shape[0], dtype=np.float64)
+    for k, target in slot_targets.items():
+        if target <= 0:
+            continue
+        col = MACRO_INDEX.get(k)
+        c = totals[:, col] if col is not None else np.zeros(totals.shape[0], dtype=np.float64)
+        diff = c - target
+        norm = max(target, 1.0)
+        overshoot = 1.5 if k in ("calories", "fat", "carbs") else 1.0
+        w = WEIGHTS.get(k, 1)
+        err += np.where(diff > 0, (overshoot * (diff / norm)) * w, (np.abs(diff) / norm) * w)
+    return err
+
+
+def _fill_slot_np(
+    items: list[PlanItem],
+    slot_targets: dict[str, float],
+    used_ids: set[int],
+    rng: random.Random,
+    start: Sequence[PlanItem] = (),
+    stats: dict[str, Any] | None = None,
+    penalty: dict[int, float] | None = None,
+) -> list[PlanItem]:
+    """Vectorized _fill_slot: scores all remaining candidates per round in one batched call."""
+    chosen: list[PlanItem] = list(start)
+    if not items:
+        return chosen
+    matrix = _macro_matrix(items)
+    ids = np.array([it.id for it in items])
+    used = np.isin(ids, list(used_ids)) if used_ids else np.zeros(len(items), dtype=bool)
+    extra = np.array([penalty.get(i, 0.0) for i in ids.tolist()], dtype=np.float64) if penalty else None
+    current = np.zeros(len(MACROS), dtype=np.float64)
+    for row in _macro_matrix(chosen):
+        current += row
+    rounds = evaluated = 0
+
+    for _ in range(MAX_ITEMS_PER_MEAL - len(chosen)):
+        if _slot_error(dict(zip(MACROS, current.tolist())), slot_targets) <= TOLERANCE:
+            break
+        if used.all():
+            break
+        rounds += 1
+        evaluated += len(items) - int(used.sum())
+        err = _batch_slot_error(current + matrix, slot_targets)
+        if extra is not None:
+            err += extra
+        err[used] = np.inf
+        best_candidates = np.flatnonzero(err == err.min()).tolist()
+        idx = rng.choice(best_candidates)
+        best = items[idx]
+        chosen.append(best)
+        used_ids.add(best.id)
+        used |= ids == best.id
+        current += matrix[idx]
+
+    _count(stats, rounds, evaluated)
+    return chosen
+
+
+def _count(stats: dict[str, Any] | None, rounds: int, evaluated: int) -> None:
+    if stats is not None:
+        stats["iterations"] = stats.get("iterations", 0) + rounds
+        stats["candidates"] = stats.get("candidates", 0) + evaluated
+
+
+def _time_stages(stats: dict[str, Any] | None, seconds: float, **stages: float) -> None:
+    if stats is not None:
+        stats["seconds"] = stats.get("seconds", 0.0) + seconds
+        totals = stats.setdefault("stages", {})
+        for stage, t in stages.items():
+            totals[stage] = totals.get(stage, 0.0) + t
+
+
+def _slot_targets(targets: dict[str, float]) -> dict[str, float]:
     slot_targets = {k: v / 3.0 for k, v in targets.items() if v and v > 0}
     if not slot_targets:
         slot_targets = {"calories": 2000 / 3, "protein": 50, "carbs": 60, "fat": 22}
+    return slot_targets
+
+
+def plan_error(plan: dict[str, Any], targets: dict[str, float]) -> float:
+    """Weighted error of a build_plan result: sum of _slot_error over the three slots."""
+    slot_targets = _slot_targets(targets)
+    return sum(
+        _slot_error({k: plan[slot][k] for k in MACROS}, slot_targets)
+        for slot in SLOTS
+    )
+
+
+def plan_deltas(totals: dict[str, float], targets: dict[str, float]) -> dict[str, float]:
+    """target - total per macro (0 for macros without a target)."""
+    return {k: (targets.get(k) or 0) - totals[k] for k in MACROS}
+
 
-    breakfast_pool = [i for i in items if i.get("meal_period") in ("breakfast", "any")]
-    lunch_pool = [i for i in items if i.get("meal_period") in ("lunch", "any")]
-    dinner_pool = [i for i in items if i.get("meal_period") in ("dinner", "any")]
+def partition_pools(items: list[PlanItem]) -> tuple[list[PlanItem], ...]:
+    """Breakfast, lunch and dinner candidate pools. "any" items join every pool; an empty
+    pool falls back to all items."""
+    breakfast_pool = [i for i in items if i.meal_period in ("breakfast", "any")]
+    lunch_pool = [i for i in items if i.meal_period in ("lunch", "any")]
+    dinner_pool = [i for i in items if i.meal_period in ("dinner", "any")]
     fallback = items if items else []
-    brunch = breakfast_pool or fallback
-    lunch_items = lunch_pool or fallback
-    dinner_items = dinner_pool or fallback
+    return (breakfast_pool or fallback, lunch_pool or fallback, dinner_pool or fallback)
+
+
+def build_plan(
+    items: list[dict[str, Any]],
+    targets: dict[str, float],
+    engine: str = "auto",
+    optimize: str = "greedy",
+    time_budget_s: float | None = None,
+    seed: int | None = None,
+    diet: DietMask = NO_DIET,
+) -> dict[str, Any]:
+    """Rule-based optimization over nutritional targets. Returns breakfast, lunch, dinner + totals + deltas.
 
-    random.shuffle(brunch)
-    random.shuffle(lunch_items)
-    random.shuffle(dinner_items)
+    engine: "python" or "numpy" forces a slot-fill engine; "auto" uses NumPy for pools of
+    VECTORIZE_MIN_ITEMS or more.
+    optimize: "exact" searches all three slots jointly (app.solver) starting from the greedy
+    plan, and keeps the greedy plan if nothing better is found within time_budget_s.
+    seed: same seed, pools and targets give the same plan (greedy mode); None draws one from
+    the global random state.
+    diet: only items whose "tags" fit it are candidates (app.diet.filter_pools).
+    """
+    pools = partition_pools([PlanItem.from_dict(it) for it in items])
+    return build_plan_from_pools(pools, targets, engine, optimize, time_budget_s, seed, diet=diet)
+
+
+def build_plan_from_pools(
+    pools: tuple[Sequence[PlanItem], ...],
+    targets: dict[str, float],
+    engine: str = "auto",
+    optimize: str = "greedy",
+    time_budget_s: float | None = None,
+    seed: int | None = None,
+    stats: dict[str, Any] | None = None,
+    diet: DietMask = NO_DIET,
+) -> dict[str, Any]:
+    """build_plan over PlanItem pools already split by partition_pools (e.g. a CompiledMenu's).
+    The pools themselves are not modified, so they can be shared across requests. Pass pools
+    already narrowed by app.diet.diet_pools (and no diet) to reuse a cached filter.
+
+    stats, if given, accumulates "seconds", per-stage "stages" (slot names, "exact") and the
+    greedy "iterations" and "candidates" counts.
+    """
+    t0 = time.perf_counter()
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}; expected one of {ENGINES}")
+    if optimize not in OPTIMIZE_MODES:
+        raise ValueError(f"unknown optimize mode {optimize!r}; expected one of {OPTIMIZE_MODES}")
+    slot_targets = _slot_targets(targets)
+    if diet != NO_DIET:
+        pools = filter_pools(pools, diet)
+
+    rng = random.Random(random.getrandbits(64) if seed is None else seed)
+    shuffled, (b, lunch_slot, d), stages = _greedy_slots(pools, slot_targets, engine, rng, stats)
+
+    if optimize == "exact":
+        from app.solver import EXACT_TIME_BUDGET_S, solve_exact
+
+        t_exact = time.perf_counter()
+        budget = EXACT_TIME_BUDGET_S if time_budget_s is None else time_budget_s
+        b, lunch_slot, d = solve_exact(shuffled, slot_targets, [b, lunch_slot, d], budget).slots
+        stages["exact"] = time.perf_counter() - t_exact
+
+    plan = _plan_result(_slot_result(b), _slot_result(lunch_slot), _slot_result(d), targets)
+    _time_stages(stats, time.perf_counter() - t0, **stages)
+    return plan
+
+
+def build_alternative_plans(
+    pools: tuple[Sequence[PlanItem], ...],
+    targets: dict[str, float],
+    k: int,
+    engine: str = "auto",
+    optimize: str = "greedy",
+    time_budget_s: float | None = None,
+    seed: int | None = None,
+    stats: dict[str, Any] | None = None,
+    diversity: float = DIVERSITY_PENALTY,
+) -> list[dict[str, Any]]:
+    """Up to k different plans from one run, best first by plan_error (each has its "error").
 
+    The first is build_plan_from_pools's plan. Each later one is a greedy fill in which an item's
+    error is raised by diversity for every earlier plan that used it, so alternatives share an item
+    only when it fits much better than anything else. With optimize="exact" only the first plan
+    is solved exactly: the solver would pull the others back onto the same optimum. Plans that
+    repeat an earlier one are dropped, so a small menu can give fewer than k.
+    """
+    if not 1 <= k <= MAX_ALTERNATIVES:
+        raise ValueError(f"alternatives must be between 1 and {MAX_ALTERNATIVES}")
+    rng = random.Random(random.getrandbits(64) if seed is None else seed)
+    first = build_plan_from_pools(pools, targets, engine, optimize, time_budget_s, rng.getrandbits(64), stats)
+    slot_targets = _slot_targets(targets)
+    plans = [first]
+    seen = {_plan_signature(first)}
+    penalty: dict[int, float] = {}
+    t_alt = time.perf_counter()
+    for _ in range(2 * k):
+        if len(plans) == k:
+            break
+        for it in (it for slot in SLOTS for it in plans[-1][slot]["items"]):
+            penalty[it["id"]] = penalty.get(it["id"], 0.0) + diversity
+        _, slots, _ = _greedy_slots(pools, slot_targets, engine, rng, stats, penalty)
+        plan = _plan_result(*(_slot_result(items) for items in slots), targets)
+        signature = _plan_signature(plan)
+        if signature not in seen:
+            seen.add(signature)
+            plans.append(plan)
+    for plan in plans:
+        plan["error"] = plan_error(plan, targets)
+    plans.sort(key=lambda plan: plan["error"])
+    # The first plan's time is already in stats, under its slots.
+    elapsed = time.perf_counter() - t_alt
+    _time_stages(stats, elapsed, alternatives=elapsed)
+    return plans
+
+
+def _plan_signature(plan: dict[str, Any]) -> tuple[frozenset[int], ...]:
+    return tuple(frozenset(it["id"] for it in plan[slot]["items"]) for slot in SLOTS)
+
+
+def _greedy_slots(
+    pools: tuple[Sequence[PlanItem], ...],
+    slot_targets: dict[str, float],
+    engine: str,
+    rng: random.Random,
+    stats: dict[str, Any] | None,
+    penalty: dict[int, float] | None = None,
+) -> tuple[list[list[PlanItem]], list[list[PlanItem]], dict[str, float]]:
+    """Shuffle copies of the three pools with rng, then fill breakfast, lunch and dinner in
+    order without reusing an item. Returns (shuffled pools, slot items, seconds per slot)."""
+    shuffled = [list(pool) for pool in pools]
+    for pool in shuffled:
+        rng.shuffle(pool)
     used: set[int] = set()
+    slots: list[list[PlanItem]] = []
+    stages: dict[str, float] = {}
+    for slot, pool in zip(SLOTS, shuffled):
+        t = time.perf_counter()
+        slots.append(_fill(engine, pool, slot_targets, used, rng, stats=stats, penalty=penalty))
+        stages[slot] = time.perf_counter() - t
+    return shuffled, slots, stages
 
-    def sum_items(its: list[dict]) -> dict[str, float]:
-        return {
-            "calories": sum(x["calories"] for x in its),
-            "protein": sum(x["protein"] for x in its),
-            "carbs": sum(x["carbs"] for x in its),
-            "fat": sum(x["fat"] for x in its),
-        }
 
-    b = _fill_slot(brunch, slot_targets, used)
-    lunch_slot = _fill_slot(lunch_items, slot_targets, used)
-    d = _fill_slot(dinner_items, slot_targets, used)
+def _fill(
+    engine: str,
+    pool: list[PlanItem],
+    slot_targets: dict[str, float],
+    used: set[int],
+    rng: random.Random,
+    start: Sequence[PlanItem] = (),
+    stats: dict[str, Any] | None = None,
+    penalty: dict[int, float] | None = None,
+) -> list[PlanItem]:
+    vectorize = engine == "numpy" or (engine == "auto" and len(pool) >= VECTORIZE_MIN_ITEMS)
+    return (_fill_slot_np if vectorize else _fill_slot)(pool, slot_targets, used, rng, start, stats, penalty)
+
+
+def _slot_result(items: list[PlanItem]) -> dict[str, Any]:
+    return {
+        "items": [x.to_dict() for x in items],
+        "calories": sum(x.calories for x in items),
+        "protein": sum(x.protein for x in items),
+        "carbs": sum(x.carbs for x in items),
+        "fat": sum(x.fat for x in items),
+    }
 
-    breakfast = {"items": b, **sum_items(b)}
-    lunch = {"items": lunch_slot, **sum_items(lunch_slot)}
-    dinner = {"items": d, **sum_items(d)}
 
+def _plan_result(
+    breakfast: dict[str, Any], lunch: dict[str, Any], dinner: dict[str, Any], targets: dict[str, float]
+) -> dict[str, Any]:
     totals = {
         "calories": breakfast["calories"] + lunch["calories"] + dinner["calories"],
         "protein": breakfast["protein"] + lunch["protein"] + dinner["protein"],
         "carbs": breakfast["carbs"] + lunch["carbs"] + dinner["carbs"],
         "fat": breakfast["fat"] + lunch["fat"] + dinner["fat"],
     }
-    deltas = {
-        "calories": (targets.get("calories") or 0) - totals["calories"],
-        "protein": (targets.get("protein") or 0) - totals["protein"],
-        "carbs": (targets.get("carbs") or 0) - totals["carbs"],
-        "fat": (targets.get("fat") or 0) - totals["fat"],
-    }
+    deltas = plan_deltas(totals, targets)
     return {"breakfast": breakfast, "lunch": lunch, "dinner": dinner, "totals": totals, "deltas": deltas}
+
+
+def replan_slot(
+    plan: dict[str, Any],
+    pools: tuple[Sequence[PlanItem], ...],
+    targets: dict[str, float],
+    slot: str,
+    item_id: int | None = None,
+    engine: str = "auto",
+    seed: int | None = None,
+    stats: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """plan (a build_plan result) with one meal re-filled; the other two are returned as they are.
+
+    With item_id, that item is dropped and the meal is topped up greedily from the running totals
+    of the items it keeps; without it, the whole meal is refilled. Items anywhere in the old plan,
+    including the dropped one, are not picked again. targets must be the ones plan was built for,
+    so the slot is filled toward the same per-meal targets. stats: as for build_plan_from_pools.
+    """
+    t0 = time.perf_counter()
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}; expected one of {ENGINES}")
+    if slot not in SLOTS:
+        raise ValueError(f"unknown meal {slot!r}; expected one of {SLOTS}")
+    current = [PlanItem.from_dict(it) for it in plan[slot]["items"]]
+    if item_id is not None and all(it.id != item_id for it in current):
+        raise ValueError(f"item {item_id} is not in {slot}")
+    keep = [it for it in current if it.id != item_id] if item_id is not None else []
+    used = {it["id"] for s in SLOTS for it in plan[s]["items"]}
+
+    rng = random.Random(random.getrandbits(64) if seed is None else seed)
+    pool = list(pools[SLOTS.index(slot)])
+    rng.shuffle(pool)
+    t_start = time.perf_counter()
+    filled = _fill(engine, pool, _slot_targets(targets), used, rng, keep, stats)
+    t_slot = time.perf_counter() - t_start
+    slots = {s: _slot_result(filled) if s == slot else plan[s] for s in SLOTS}
+    out = _plan_result(slots["breakfast"], slots["lunch"], slots["dinner"], targets)
+    _time_stages(stats, time.perf_counter() - t0, **{slot: t_slot})
+    return out
+
+
+def build_multi_day_plan(
+    days: Sequence[tuple[str, tuple[Sequence[PlanItem], ...]]],
+    targets: dict[str, float],
+    no_repeat_days: int = 3,
+    engine: str = "auto",
+    optimize: str = "greedy",
+    time_budget_s: float | None = None,
+    seed: int | None = None,
+    stats: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Plans for consecutive days in one run: days is [(date, pools), ...] in date order.
+
+    An item name picked on one day is not picked again within no_repeat_days days (1 turns the
+    constraint off). If that would leave a meal's pool empty the day falls back to the full pool
+    for that meal and is listed under "relaxed".
+    """
+    rng = random.Random(random.getrandbits(64) if seed is None else seed)
+    recent: deque[set[str]] = deque(maxlen=max(no_repeat_days - 1, 0))
+    out_days: list[dict[str, Any]] = []
+    relaxed: list[str] = []
+    for date, pools in days:
+        banned = set().union(*recent)
+        day_pools = pools
+        if banned:
+            filtered = tuple([it for it in pool if it.name not in banned] for pool in pools)
+            if not all(filtered):
+                relaxed.append(date)
+            day_pools = tuple(f or pool for f, pool in zip(filtered, pools))
+        plan = build_plan_from_pools(
+            day_pools, targets, engine, optimize, time_budget_s, seed=rng.getrandbits(64), stats=stats
+        )
+        recent.append({it["name"] for slot in SLOTS for it in plan[slot]["items"]})
+        out_days.append({"date": date, **plan})
+    totals = {k: sum(day["totals"][k] for day in out_days) for k in MACROS}
+    return {"days": out_days, "totals": totals, "relaxed": relaxed}
@@ -0,0 +1,79 @@
+"""
+Write-through cache of user profiles by session id, in front of user_profiles.
+
+/api/plan and /api/plan/week resolve a session's targets on every request. They read the
+profile through the two-tier cache (app.cache: L1, then Redis) and only query the database on a
+miss. POST /api/profile writes the new values through after its commit and drops stale copies
+from every worker's L1. Sessions without a profile are cached as well ("negative" entries), for
+profile_negative_ttl_s only, so a miss that races a profile being created is not kept for long.
+The cached form carries the profile's dietary preferences too; profile_diet compiles them.
+"""
+import logging
+from typing import Any, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import cache_get_json, cache_invalidate, cache_set_json
+from app.config import settings
+from app.diet import NO_DIET, DietMask, compile_preferences
+from app.models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CACHE_PREFIX = "profile:"
+PROFILE_FIELDS = ("daily_calories", "daily_protein", "daily_carbs", "daily_fat")
+
+
+def profile_cache_key(session_id: str) -> str:
+    return f"{PROFILE_CACHE_PREFIX}{session_id}"
+
+
+def profile_dict(profile: UserProfile | None) -> Optional[dict[str, Any]]:
+    """The cached (and GET /api/profile) form of a profile row: its target fields and
+    preferences, or None."""
+    if profile is None:
+        return None
+    return {**{f: getattr(profile, f) for f in PROFILE_FIELDS}, "preferences": profile.preferences}
+
+
+def profile_diet(preferences: Any) -> DietMask:
+    """DietMask of saved UserProfile.preferences. Rows written before preferences were validated
+    may not compile; those plan unrestricted (logged) rather than failing every request."""
+    try:
+        return compile_preferences(preferences)
+    except (AttributeError, TypeError, ValueError):
+        logger.warning("ignoring unreadable profile preferences %r", preferences)
+        return NO_DIET
+
+
+async def load_profile(db: AsyncSession, session_id: str) -> UserProfile | None:
+    result = await db.execute(select(UserProfile).where(UserProfile.session_id == session_id))
+    return result.scalars().first()
+
+
+async def load_profiles(db: AsyncSession, session_ids: set[str]) -> dict[str, UserProfile]:
+    """Profiles for many sessions in one query."""
+    if not session_ids:
+        return {}
+    result = await db.execute(select(UserProfile).where(UserProfile.session_id.in_(session_ids)))
+    return {p.session_id: p for p in result.scalars()}
+
+
+async def get_cached_profile(db: AsyncSession, session_id: str) -> Optional[dict[str, Any]]:
+    """profile_dict for session_id, from the cache when present (None: no profile)."""
+    key = profile_cache_key(session_id)
+    cached = await cache_get_json(key)
+    if cached is not None:
+        return cached["profile"]
+    profile = profile_dict(await load_profile(db, session_id))
+    ttl = settings.profile_cache_ttl_s if profile is not None else settings.profile_negative_ttl_s
+    await cache_set_json(key, {"profile": profile}, ttl)
+    return profile
+
+
+async def put_cached_profile(session_id: str, profile: dict[str, Any]) -> None:
+    """Write a just-committed profile through, replacing older (or negative) entries everywhere."""
+    key = profile_cache_key(session_id)
+    await cache_invalidate(key)
+    await cache_set_json(key, {"profile": profile}, settings.profile_cache_ttl_s)
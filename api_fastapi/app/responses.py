@@ -0,0 +1,59 @@
+"""
+Pre-serialized JSON responses with strong ETags.
+
+Cached menu and plan payloads are kept as JSON text. RawJSONResponse sends that text as the
+body, so a cache hit is not decoded, validated against the response model and encoded again.
+Responses carry an ETag and "Cache-Control: no-cache", and a request whose If-None-Match already
+names the ETag gets an empty 304.
+"""
+import hashlib
+from typing import Any
+
+from fastapi import Response
+
+from app.json_codec import dumps_bytes
+
+CACHE_CONTROL = "no-cache"
+
+
+class RawJSONResponse(Response):
+    """application/json response whose str/bytes content is already encoded JSON."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        if isinstance(content, str):
+            return content.encode()
+        return dumps_bytes(content)
+
+
+def make_etag(*parts: str) -> str:
+    """Strong ETag for the representation identified by parts."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 specifies for this header)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=_headers(etag))
+
+
+def json_response(content: Any, etag: str) -> RawJSONResponse:
+    return RawJSONResponse(content, headers=_headers(etag))
@@ -1,5 +1,20 @@
-from typing import Any, Optional
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Literal, Optional
+from pydantic import BaseModel, Field, field_validator
+
+from app.diet import TAGS, split_tags, strict_mask
+
+
+class DietPreferences(BaseModel):
+    # Items must carry every include tag and none of the exclude tags (names from app.diet.TAGS).
+    include: list[str] = Field(default_factory=list, max_length=len(TAGS))
+    exclude: list[str] = Field(default_factory=list, max_length=len(TAGS))
+
+    @field_validator("include", "exclude")
+    @classmethod
+    def _known_tags(cls, tags: list[str]) -> list[str]:
+        strict_mask(tags)
+        return list(dict.fromkeys(split_tags(tags)))
 
 
 class PlanTargets(BaseModel):
@@ -7,6 +22,27 @@ class PlanTargets(BaseModel):
     daily_protein: Optional[float] = Field(None, gt=0)
     daily_carbs: Optional[float] = Field(None, gt=0)
     daily_fat: Optional[float] = Field(None, gt=0)
+    # Overrides the session profile's saved preferences; omitted means use those.
+    preferences: Optional[DietPreferences] = None
+
+
+MAX_BATCH_ENTRIES = 1000
+
+
+class PlanBatchEntry(PlanTargets):
+    session_id: Optional[str] = None
+
+
+class PlanSwapRequest(PlanTargets):
+    # Targets only change the reported deltas; the meal is re-filled toward the plan's own targets.
+    plan_id: str = Field(..., max_length=2048)
+    meal: Literal["breakfast", "lunch", "dinner"]
+    item_id: Optional[int] = None
+
+
+class PlanBatchRequest(BaseModel):
+    # Entries are validated one by one (PlanBatchEntry) so a bad entry fails only its own result.
+    entries: list[dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BATCH_ENTRIES)
 
 
 class PlanResponse(BaseModel):
@@ -15,9 +51,47 @@ class PlanResponse(BaseModel):
     dinner: dict[str, Any]
     totals: dict[str, float]
     deltas: dict[str, float]
+    plan_id: Optional[str] = None
+
+
+class RankedPlan(PlanResponse):
+    error: float
+
+
+class PlanAlternativesResponse(BaseModel):
+    # Best first by error; each plan_id works with /api/plan/swap like a single plan's.
+    alternatives: list[RankedPlan]
 
 
 class HealthResponse(BaseModel):
     status: str
     database: str
     cache: dict[str, Any]
+    planner: Optional[dict[str, Any]] = None
+    plan_writer: Optional[dict[str, Any]] = None
+    database_pools: Optional[dict[str, Any]] = None
+
+
+class DayPlan(PlanResponse):
+    date: str
+
+
+class WeekPlanResponse(BaseModel):
+    days: list[DayPlan]
+    totals: dict[str, float]
+    missing: list[str]
+    relaxed: list[str]
+    saved: int
+
+
+class StoredPlan(BaseModel):
+    id: int
+    date: str
+    created_at: datetime
+    totals: dict[str, float]
+    meals: dict[str, Any]
+
+
+class PlanHistoryResponse(BaseModel):
+    plans: list[StoredPlan]
+    next_cursor: Optional[str] = None
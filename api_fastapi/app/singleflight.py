@@ -0,0 +1,161 @@
+"""
+Single-flight cache fills: concurrent misses on the same key share one computation.
+
+Within a worker, callers missing the same key await one in-flight task. Across workers, the
+task first takes a short Redis lock (SET NX PX); workers that lose the race poll the key for
+the winner's value instead of recomputing. A Redis error while taking, polling or releasing
+the lock drops the client (app.cache.drop_redis), and the worker computes the value itself,
+as it does without Redis.
+
+With stale_s > 0 a copy of every value is kept under "swr:<key>" for that much longer, and a
+miss on the fresh key returns the stale copy while one background refresh repopulates it
+(stale-while-revalidate).
+"""
+import asyncio
+import logging
+import secrets
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import redis.asyncio as redis
+
+from app.cache import cache_get, cache_set, drop_redis, get_redis
+from app.config import settings
+from app.json_codec import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = "lock:"
+STALE_PREFIX = "swr:"
+POLL_INTERVAL_S = 0.025
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then return redis.call("del", KEYS[1]) end
+return 0
+"""
+
+
+class SingleFlight:
+    """In-process deduplication of concurrent async calls by key."""
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # shield: one caller disconnecting must not cancel the fill for everyone else.
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+_flight = SingleFlight()
+_background: set[asyncio.Task] = set()
+
+
+async def _acquire_lock(key: str) -> str | None:
+    """Lock token if this worker should compute key; None if another worker holds the lock."""
+    r = await get_redis()
+    if r is None:
+        return ""  # no Redis: nothing to coordinate with
+    token = secrets.token_hex(8)
+    try:
+        ok = await r.set(LOCK_PREFIX + key, token, nx=True, px=settings.singleflight_lock_ms)
+    except redis.RedisError as e:
+        await drop_redis(r, e)
+        return ""
+    return token if ok else None
+
+
+async def _release_lock(key: str, token: str) -> None:
+    r = await get_redis()
+    if r is not None and token:
+        try:
+            await r.eval(_RELEASE_LOCK, 1, LOCK_PREFIX + key, token)
+        except redis.RedisError as e:
+            await drop_redis(r, e)  # the lock expires after singleflight_lock_ms
+
+
+async def _await_other_worker(key: str) -> str | None:
+    """Poll for the value another worker is computing; None once it gives up or times out."""
+    r = await get_redis()
+    deadline = time.monotonic() + settings.singleflight_wait_ms / 1000
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL_S)
+        value = await cache_get(key)
+        if value is not None:
+            return value
+        if r is None:
+            continue
+        try:
+            if not await r.exists(LOCK_PREFIX + key):
+                return await cache_get(key)
+        except redis.RedisError as e:
+            await drop_redis(r, e)
+            return None
+    return None
+
+
+async def _fill(key: str, ttl: int, compute: Callable[[], Awaitable[Any]], stale_s: int) -> str:
+    token = await _acquire_lock(key)
+    if token is None:
+        value = await _await_other_worker(key)
+        if value is not None:
+            return value
+        logger.info("single-flight wait expired key=%s; computing locally", key)
+        token = ""
+    try:
+        value = dumps(await compute())
+        await cache_set(key, value, ttl)
+        if stale_s > 0:
+            await cache_set(STALE_PREFIX + key, value, ttl + stale_s)
+        return value
+    finally:
+        await _release_lock(key, token)
+
+
+def _refresh_done(task: asyncio.Task) -> None:
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("stale-while-revalidate refresh failed: %r", task.exception())
+
+
+async def cached_text(
+    key: str,
+    ttl: int,
+    compute: Callable[[], Awaitable[Any]],
+    stale_s: int | None = None,
+) -> str:
+    """Cached JSON text for key, computing it at most once per key across concurrent misses.
+
+    compute returns the value to encode. It must not depend on request-scoped resources (it may
+    outlive the request when refreshing in the background). Exceptions it raises propagate to
+    every waiting caller and nothing is cached.
+    """
+    cached = await cache_get(key)
+    if cached is not None:
+        return cached
+    stale_s = settings.cache_stale_while_revalidate_s if stale_s is None else stale_s
+    if stale_s > 0:
+        stale = await cache_get(STALE_PREFIX + key)
+        if stale is not None:
+            task = asyncio.ensure_future(_flight.do(key, lambda: _fill(key, ttl, compute, stale_s)))
+            _background.add(task)
+            task.add_done_callback(_refresh_done)
+            return stale
+    return await _flight.do(key, lambda: _fill(key, ttl, compute, stale_s))
+
+
+async def cached_json(
+    key: str,
+    ttl: int,
+    compute: Callable[[], Awaitable[Any]],
+    stale_s: int | None = None,
+) -> Any:
+    """cached_text, decoded. Every caller gets its own copy of the value."""
+    return loads(await cached_text(key, ttl, compute, stale_s))
@@ -0,0 +1,205 @@
+"""
+Exact/near-optimal plan solver: branch-and-bound over breakfast, lunch and dinner at once.
+Minimizes the sum of per-slot _slot_error under MAX_ITEMS_PER_MEAL and unique item ids.
+The greedy plan is the starting incumbent, so a search cut short by the wall-clock budget
+returns a plan that is never worse than greedy.
+"""
+import time
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from app.planner import MACROS, MAX_ITEMS_PER_MEAL, PlanItem, _batch_slot_error, _macro_matrix, _slot_error
+
+EXACT_TIME_BUDGET_S = 0.25
+_EPS = 1e-9
+
+
+class ExactResult(NamedTuple):
+    slots: list[list[PlanItem]]
+    error: float
+    optimal: bool
+    nodes: int
+
+
+class _Timeout(Exception):
+    pass
+
+
+class _SlotSpace:
+    """One slot's candidates, ordered by standalone error, with suffix maxima for bounds."""
+
+    __slots__ = ("items", "matrix", "ids", "suffix_max")
+
+    def __init__(self, items: list[PlanItem], slot_targets: dict[str, float]):
+        matrix = _macro_matrix(items)
+        order = np.argsort(_batch_slot_error(matrix, slot_targets), kind="stable")
+        self.items = [items[i] for i in order]
+        self.matrix = matrix[order]
+        self.ids = np.array([it.id for it in self.items])
+        # suffix_max[i] = per-macro max over matrix[i:]; the extra last row is zeros.
+        self.suffix_max = np.zeros((len(items) + 1, len(MACROS)), dtype=np.float64)
+        if len(items):
+            self.suffix_max[:-1] = np.maximum.accumulate(self.matrix[::-1], axis=0)[::-1]
+
+
+def _totals(items: list[PlanItem]) -> dict[str, float]:
+    return {k: float(sum(getattr(it, k) for it in items)) for k in MACROS}
+
+
+class _Search:
+    """Depth-first branch-and-bound over slots in order; raises _Timeout at the deadline.
+
+    A node is a partial selection for slot s. Its children add one more candidate (later in
+    the slot's order, so each combination is visited once); "stopping" commits the slot and
+    descends into slot s + 1. Because macros are non-negative, a child's totals can only grow
+    up to totals + remaining_picks * suffix_max, and the slot error is convex, so the error at
+    the target clipped into that box is a lower bound. rest_lb[s] bounds slots s.. from below.
+    """
+
+    def __init__(
+        self,
+        spaces: list[_SlotSpace],
+        slot_targets: dict[str, float],
+        rest_lb: list[float],
+        best_err: float,
+        best_sel: list[list[PlanItem]],
+        deadline: float,
+    ):
+        self.spaces = spaces
+        self.slot_targets = slot_targets
+        self.tvec = np.array([slot_targets.get(k, 0.0) for k in MACROS], dtype=np.float64)
+        self.rest_lb = rest_lb
+        self.best_err = best_err
+        self.best_sel = best_sel
+        self.deadline = deadline
+        self.sel: list[list[PlanItem]] = [[] for _ in spaces]
+        self.nodes = 0
+
+    def run(self) -> None:
+        self._slot(0, set(), 0.0)
+
+    def _slot(self, s: int, used: set[Any], committed: float) -> None:
+        space = self.spaces[s]
+        blocked = np.isin(space.ids, list(used)) if used else np.zeros(len(space.items), dtype=bool)
+        self._node(s, blocked, [], np.zeros(len(MACROS), dtype=np.float64), -1, committed, used)
+
+    def _stop(self, s: int, chosen: list[int], stop_err: float, used: set[Any]) -> None:
+        if stop_err + self.rest_lb[s + 1] >= self.best_err - _EPS:
+            return
+        space = self.spaces[s]
+        self.sel[s] = [space.items[j] for j in chosen]
+        if s == len(self.spaces) - 1:
+            self.best_err = stop_err
+            self.best_sel = [list(x) for x in self.sel]
+        else:
+            self._slot(s + 1, used | {it.id for it in self.sel[s]}, stop_err)
+
+    def _node(
+        self,
+        s: int,
+        blocked: np.ndarray,
+        chosen: list[int],
+        current: np.ndarray,
+        last: int,
+        committed: float,
+        used: set[Any],
+    ) -> None:
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise _Timeout
+        space = self.spaces[s]
+        st = self.slot_targets
+        stop_err = committed + _slot_error(dict(zip(MACROS, current.tolist())), st)
+        stop_pending = True
+
+        if len(chosen) < MAX_ITEMS_PER_MEAL:
+            start = last + 1
+            cand = np.flatnonzero(~blocked[start:]) + start
+            if cand.size:
+                totals = current + space.matrix[cand]
+                hi = totals + (MAX_ITEMS_PER_MEAL - len(chosen) - 1) * space.suffix_max[cand + 1]
+                lb = committed + _batch_slot_error(np.clip(self.tvec, totals, hi), st)
+                lb += self.rest_lb[s + 1]
+                keep = lb < self.best_err - _EPS
+                cand, totals, lb = cand[keep], totals[keep], lb[keep]
+                trial = committed + _batch_slot_error(totals, st)
+                for pos in np.argsort(trial, kind="stable").tolist():
+                    if lb[pos] >= self.best_err - _EPS:
+                        continue
+                    if stop_pending and trial[pos] > stop_err:
+                        stop_pending = False
+                        self._stop(s, chosen, stop_err, used)
+                    j = int(cand[pos])
+                    child_blocked = blocked | (space.ids == space.ids[j])
+                    self._node(s, child_blocked, chosen + [j], totals[pos], j, committed, used)
+
+        if stop_pending:
+            self._stop(s, chosen, stop_err, used)
+
+
+def _root_bound(space: _SlotSpace, slot_targets: dict[str, float], tvec: np.ndarray) -> float:
+    hi = MAX_ITEMS_PER_MEAL * space.suffix_max[0]
+    return float(_batch_slot_error(np.clip(tvec, 0.0, hi)[None, :], slot_targets)[0])
+
+
+def _run(search: _Search) -> bool:
+    """Run a search to completion; False if it hit its deadline first."""
+    try:
+        search.run()
+        return True
+    except _Timeout:
+        return False
+
+
+def solve_exact(
+    pools: list[list[PlanItem]],
+    slot_targets: dict[str, float],
+    incumbent: list[list[PlanItem]],
+    time_budget_s: float = EXACT_TIME_BUDGET_S,
+) -> ExactResult:
+    """Best selection per pool minimizing total slot error; incumbent is the greedy plan.
+
+    Each slot is first solved on its own (ignoring shared ids) with a share of the budget.
+    Completed single-slot optima are lower bounds for the joint problem, and if the per-slot
+    picks use disjoint ids they already form a feasible (and, if all completed, optimal) plan.
+    Otherwise the joint search runs with those bounds until the deadline. optimal=False means
+    the budget ran out and the best plan found so far is returned.
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget_s
+    errs = [_slot_error(_totals(sel), slot_targets) for sel in incumbent]
+    best_slots, best_err = [list(sel) for sel in incumbent], sum(errs)
+    spaces = [_SlotSpace(pool, slot_targets) for pool in pools]
+    if any(sp.matrix.size and not (sp.matrix >= 0).all() for sp in spaces):
+        # Bounds assume non-negative (and finite) macros; keep the greedy plan otherwise.
+        return ExactResult(best_slots, best_err, False, 0)
+
+    tvec = np.array([slot_targets.get(k, 0.0) for k in MACROS], dtype=np.float64)
+    share = time_budget_s / (2 * max(len(spaces), 1))
+    nodes = 0
+    picks: list[list[PlanItem]] = []
+    pick_errs: list[float] = []
+    slot_lbs: list[float] = []
+    all_complete = True
+    for space, sel, err in zip(spaces, incumbent, errs):
+        slot_deadline = min(deadline, time.perf_counter() + share)
+        search = _Search([space], slot_targets, [0.0, 0.0], err, [list(sel)], slot_deadline)
+        complete = _run(search)
+        nodes += search.nodes
+        all_complete = all_complete and complete
+        picks.append(search.best_sel[0])
+        pick_errs.append(search.best_err)
+        slot_lbs.append(search.best_err if complete else _root_bound(space, slot_targets, tvec))
+
+    ids = [it.id for sel in picks for it in sel]
+    if len(ids) == len(set(ids)):
+        if all_complete:
+            return ExactResult(picks, sum(pick_errs), True, nodes)
+        if sum(pick_errs) < best_err:
+            best_slots, best_err = picks, sum(pick_errs)
+
+    rest_lb = [sum(slot_lbs[s:]) for s in range(len(spaces))] + [0.0]
+    search = _Search(spaces, slot_targets, rest_lb, best_err, best_slots, deadline)
+    complete = _run(search)
+    return ExactResult(search.best_sel, search.best_err, complete, nodes + search.nodes)
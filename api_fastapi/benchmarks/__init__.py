@@ -0,0 +1 @@
+# Planner/API benchmarks; run from api_fastapi/, e.g. `python benchmarks/bench_exact.py`.
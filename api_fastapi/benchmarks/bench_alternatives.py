@@ -0,0 +1,72 @@
+"""K separate plans vs one alternatives=K run: latency, distinct plans, item overlap and error.
+
+"separate" is what K "show me another option" /api/plan calls get below the HTTP layer: K
+build_plan_from_pools runs with different seeds. "alternatives" is one build_alternative_plans
+run. overlap is the mean Jaccard similarity of item ids between pairs of plans (1 = identical).
+
+    python benchmarks/bench_alternatives.py --sizes 200 1000 5000 --k 5 --repeats 5
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.planner import (  # noqa: E402
+    SLOTS,
+    PlanItem,
+    build_alternative_plans,
+    build_plan_from_pools,
+    partition_pools,
+    plan_error,
+)
+from benchmarks.menus import DEFAULT_TARGETS, synthetic_menu  # noqa: E402
+
+
+def _ids(plan: dict) -> frozenset[int]:
+    return frozenset(it["id"] for slot in SLOTS for it in plan[slot]["items"])
+
+
+def _overlap(plans: list[dict]) -> float:
+    pairs = [len(_ids(a) & _ids(b)) / len(_ids(a) | _ids(b)) for a, b in itertools.combinations(plans, 2)]
+    return statistics.mean(pairs) if pairs else 1.0
+
+
+def _separate(pools, k: int, seed: int) -> list[dict]:
+    return [build_plan_from_pools(pools, DEFAULT_TARGETS, seed=seed * 1000 + i) for i in range(k)]
+
+
+def _alternatives(pools, k: int, seed: int) -> list[dict]:
+    return build_alternative_plans(pools, DEFAULT_TARGETS, k, seed=seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'items':>6} {'mode':>13} {'ms':>8} {'distinct':>9} {'overlap':>8} {'mean err':>9}")
+    for n in args.sizes:
+        for name, fn in (("separate", _separate), ("alternatives", _alternatives)):
+            ms, distinct, overlap, err = [], [], [], []
+            for seed in range(args.repeats):
+                pools = partition_pools([PlanItem.from_dict(it) for it in synthetic_menu(n, seed)])
+                t0 = time.perf_counter()
+                plans = fn(pools, args.k, seed)
+                ms.append((time.perf_counter() - t0) * 1000)
+                distinct.append(len({_ids(p) for p in plans}))
+                overlap.append(_overlap(plans))
+                err.append(statistics.mean(plan_error(p, DEFAULT_TARGETS) for p in plans))
+            print(
+                f"{n:>6} {name:>13} {statistics.median(ms):>8.1f} {statistics.mean(distinct):>9.1f}"
+                f" {statistics.mean(overlap):>8.2f} {statistics.mean(err):>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
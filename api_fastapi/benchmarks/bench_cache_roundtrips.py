@@ -0,0 +1,89 @@
+"""Redis round-trips per cached request: the old GET+INCR+GET+GET lookup vs pipelined lookups.
+
+Runs cached_json over a skewed key mix against an in-process fakeredis (requirements-dev.txt)
+and counts packets sent to Redis, so the numbers are I/O counts, not network latency.
+
+    python benchmarks/bench_cache_roundtrips.py --requests 2000 --keys 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakeredis  # noqa: E402
+
+from app import cache, singleflight  # noqa: E402
+from app.cache import CACHE_HITS, CACHE_MISSES  # noqa: E402
+from app.singleflight import cached_json  # noqa: E402
+
+
+async def _legacy_cache_get(key):
+    """cache_get as it was before counters were batched: four round-trips per lookup."""
+    r = await cache.get_redis()
+    val = await r.get(key)
+    await r.incr(CACHE_HITS if val is not None else CACHE_MISSES)
+    await r.get(CACHE_HITS)
+    await r.get(CACHE_MISSES)
+    return val
+
+
+async def _run(mode: str, n_requests: int, n_keys: int, seed: int) -> tuple[float, float]:
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    await r.ping()  # connection handshake is not part of a request
+    sent = 0
+    conn_cls = r.connection_pool.connection_class
+    send = conn_cls.send_packed_command
+
+    async def counted(self, *args, **kwargs):
+        nonlocal sent
+        sent += 1
+        return await send(self, *args, **kwargs)
+
+    conn_cls.send_packed_command = counted
+    cache._redis = r
+    cache._pending = Counter()
+    cache.l1 = cache.LocalCache(1024 if mode == "pipelined+l1" else 0)
+    cache.settings.cache_exact_stats = mode == "exact"
+    original_get = singleflight.cache_get
+    if mode == "legacy":
+        # cached_json calls the name singleflight imported, not cache.cache_get.
+        singleflight.cache_get = _legacy_cache_get
+    rng = random.Random(seed)
+    keys = [("menu:today" if i == 0 else f"plan:{i}") for i in range(n_keys)]
+    weights = [1 / (i + 1) for i in range(n_keys)]
+
+    async def compute():
+        return {"ok": True}
+
+    try:
+        for _ in range(n_requests):
+            await cached_json(rng.choices(keys, weights)[0], 300, compute, stale_s=0)
+        lookups_sent = sent
+        await cache.flush_cache_stats()
+        return lookups_sent / n_requests, sent / n_requests
+    finally:
+        conn_cls.send_packed_command = send
+        singleflight.cache_get = original_get
+        cache._redis = None
+        await r.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--keys", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':>13} {'round-trips/request':>20} {'incl. stats flush':>18}")
+    for mode in ("legacy", "exact", "pipelined", "pipelined+l1"):
+        per_req, with_flush = asyncio.run(_run(mode, args.requests, args.keys, args.seed))
+        print(f"{mode:>13} {per_req:>20.3f} {with_flush:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
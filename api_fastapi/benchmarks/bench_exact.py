@@ -0,0 +1,53 @@
+"""Greedy vs exact (branch-and-bound) build_plan: plan error and latency on synthetic menus.
+
+    python benchmarks/bench_exact.py --sizes 50 200 1000 5000 --repeats 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.planner import build_plan, plan_error  # noqa: E402
+from app.solver import EXACT_TIME_BUDGET_S  # noqa: E402
+from benchmarks.menus import DEFAULT_TARGETS, synthetic_menu  # noqa: E402
+
+
+def _run(items, optimize: str, seed: int, budget: float) -> tuple[float, float]:
+    random.seed(seed)
+    t0 = time.perf_counter()
+    plan = build_plan(list(items), DEFAULT_TARGETS, optimize=optimize, time_budget_s=budget)
+    return (time.perf_counter() - t0) * 1000, plan_error(plan, DEFAULT_TARGETS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000, 5000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=EXACT_TIME_BUDGET_S)
+    args = parser.parse_args()
+
+    print(f"{'items':>6} {'greedy ms':>10} {'greedy err':>11} {'exact ms':>9} {'exact err':>10} {'gain':>6}")
+    for n in args.sizes:
+        g_ms, g_err, e_ms, e_err = [], [], [], []
+        for seed in range(args.repeats):
+            items = synthetic_menu(n, seed)
+            ms, err = _run(items, "greedy", seed, args.budget)
+            g_ms.append(ms)
+            g_err.append(err)
+            ms, err = _run(items, "exact", seed, args.budget)
+            e_ms.append(ms)
+            e_err.append(err)
+        g, e = statistics.mean(g_err), statistics.mean(e_err)
+        gain = (1 - e / g) * 100 if g else 0.0
+        print(
+            f"{n:>6} {statistics.median(g_ms):>10.1f} {g:>11.3f} "
+            f"{statistics.median(e_ms):>9.1f} {e:>10.3f} {gain:>5.0f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
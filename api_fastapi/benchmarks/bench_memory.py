@@ -0,0 +1,62 @@
+"""Planner memory and allocations on large menus: dict items vs PlanItem, per engine.
+
+"menu" is the traced size of the item objects alone: dicts, or PlanItems built from the same
+rows as compile_menu does. Each engine row is one build_plan_from_pools call over shared pools
+(median wall time and median tracemalloc peak over --repeats seeds).
+
+    python benchmarks/bench_memory.py --items 10000 --repeats 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.planner import ITEM_COLUMNS, PlanItem, build_plan_from_pools, partition_pools  # noqa: E402
+from benchmarks.menus import DEFAULT_TARGETS, synthetic_menu  # noqa: E402
+
+
+def _traced_kib(build) -> tuple[object, float]:
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size / 1024
+
+
+def _plan(pools, engine: str, repeats: int) -> tuple[float, float]:
+    build_plan_from_pools(pools, DEFAULT_TARGETS, engine=engine, seed=0)  # warm-up
+    times, peaks = [], []
+    for seed in range(repeats):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        build_plan_from_pools(pools, DEFAULT_TARGETS, engine=engine, seed=seed)
+        times.append((time.perf_counter() - t0) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return statistics.median(times), statistics.median(peaks) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = [tuple(it[c] for c in ITEM_COLUMNS) for it in synthetic_menu(args.items)]
+    _, dict_kib = _traced_kib(lambda: [dict(zip(ITEM_COLUMNS, row)) for row in rows])
+    items, slots_kib = _traced_kib(lambda: [PlanItem(*row) for row in rows])
+    print(f"menu of {args.items} items: dicts {dict_kib:.0f} KiB, PlanItem {slots_kib:.0f} KiB")
+
+    pools = tuple(tuple(pool) for pool in partition_pools(items))
+    print(f"{'engine':>7} {'median ms':>10} {'peak KiB':>9}")
+    for engine in ("python", "numpy"):
+        ms, peak = _plan(pools, engine, args.repeats)
+        print(f"{engine:>7} {ms:>10.1f} {peak:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Planner benchmark suite: latency percentiles, allocations and plan quality, with a regression gate.
+
+For each menu size (synthetic_menu, one menu per size) three cases are measured:
+  build_plan    whole plan from API-shaped items, engine "auto"
+  fill_slot     one pure-Python _fill_slot over the lunch pool
+  fill_slot_np  the same slot with the NumPy engine
+Latency is p50/p95/p99 over --repeats timed calls (after one warm-up). Quality is the weighted
+error from _slot_error (plan_error for whole plans), averaged over a fixed set of plan seeds and
+target profiles, so it does not depend on --repeats and is identical across machines.
+peak_kib is the median tracemalloc peak of one call.
+
+    python benchmarks/bench_planner.py --out results.json
+    python benchmarks/bench_planner.py --baseline benchmarks/baselines/planner.json
+
+With --baseline the run exits 1 when a case's p95 is more than --max-latency-regression slower,
+or its mean error more than --max-quality-regression worse, than the baseline. Latency baselines
+are machine-specific: regenerate them with --out on the machine that gates (or pass
+--quality-only, as CI does).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app.planner import (  # noqa: E402
+    ALGORITHM_VERSION,
+    MACROS,
+    PlanItem,
+    _fill_slot,
+    _fill_slot_np,
+    _slot_error,
+    _slot_targets,
+    build_plan,
+    partition_pools,
+    plan_error,
+)
+from benchmarks.menus import DEFAULT_TARGETS, synthetic_menu  # noqa: E402
+
+CASES = ("build_plan", "fill_slot", "fill_slot_np")
+PROFILES = (
+    DEFAULT_TARGETS,
+    {"calories": 1600, "protein": 140, "carbs": 120, "fat": 50},
+    {"calories": 3000, "protein": 180, "carbs": 350, "fat": 90},
+)
+QUALITY_SEEDS = 5
+DEFAULT_SIZES = (10, 100, 1000, 10_000, 50_000)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "planner.json")
+
+
+def _pct(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def _case_fn(case: str, items: list[dict], pools: tuple) -> Callable[[int, dict], float]:
+    """fn(seed, targets) -> weighted error of what it planned."""
+    if case == "build_plan":
+        def run(seed: int, targets: dict) -> float:
+            return plan_error(build_plan(items, targets, seed=seed), targets)
+        return run
+
+    fill = _fill_slot if case == "fill_slot" else _fill_slot_np
+    lunch = pools[1]
+
+    def run_fill(seed: int, targets: dict) -> float:
+        slot_targets = _slot_targets(targets)
+        chosen = fill(lunch, slot_targets, set(), random.Random(seed))
+        return _slot_error({k: sum(getattr(it, k) for it in chosen) for k in MACROS}, slot_targets)
+    return run_fill
+
+
+def _measure(fn: Callable[[int, dict], float], repeats: int) -> dict[str, float]:
+    fn(0, DEFAULT_TARGETS)  # warm-up
+    times = []
+    for i in range(repeats):
+        t0 = time.perf_counter()
+        fn(i, PROFILES[i % len(PROFILES)])
+        times.append((time.perf_counter() - t0) * 1000)
+    errors, peaks = [], []
+    for seed in range(QUALITY_SEEDS):
+        for targets in PROFILES:
+            tracemalloc.start()
+            errors.append(fn(seed, targets))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return {
+        "p50_ms": round(_pct(times, 0.50), 4),
+        "p95_ms": round(_pct(times, 0.95), 4),
+        "p99_ms": round(_pct(times, 0.99), 4),
+        "mean_error": round(statistics.fmean(errors), 6),
+        "peak_kib": round(statistics.median(peaks) / 1024, 1),
+    }
+
+
+def run_suite(sizes: list[int], repeats: int, menu_seed: int) -> dict:
+    results = {}
+    for n in sizes:
+        items = synthetic_menu(n, menu_seed)
+        pools = partition_pools([PlanItem.from_dict(it) for it in items])
+        for case in CASES:
+            results[f"{case}/{n}"] = _measure(_case_fn(case, items, pools), repeats)
+            r = results[f"{case}/{n}"]
+            print(
+                f"{case:>13} {n:>7} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}"
+                f" {r['peak_kib']:>9.1f} {r['mean_error']:>10.4f}",
+                flush=True,
+            )
+    return {
+        "meta": {
+            "algorithm_version": ALGORITHM_VERSION,
+            "menu_seed": menu_seed,
+            "repeats": repeats,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, max_latency: float, max_quality: float, quality_only: bool) -> list[str]:
+    """Regressions of current against baseline, one message each (empty: gate passes)."""
+    failures = []
+    if baseline["meta"]["menu_seed"] != current["meta"]["menu_seed"]:
+        return [f"baseline menu_seed {baseline['meta']['menu_seed']} != {current['meta']['menu_seed']}"]
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None:
+            continue
+        # Small absolute slack so near-zero errors don't fail on float noise.
+        if cur["mean_error"] > base["mean_error"] * (1 + max_quality) + 1e-6:
+            failures.append(f"{name}: mean_error {cur['mean_error']:.4f} vs baseline {base['mean_error']:.4f}")
+        if not quality_only and cur["p95_ms"] > base["p95_ms"] * (1 + max_latency):
+            failures.append(f"{name}: p95 {cur['p95_ms']:.2f} ms vs baseline {base['p95_ms']:.2f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--menu-seed", type=int, default=0)
+    parser.add_argument("--out", help="write results as JSON to this path")
+    parser.add_argument("--baseline", nargs="?", const=BASELINE, help=f"gate against this run (default {BASELINE})")
+    parser.add_argument("--max-latency-regression", type=float, default=0.25, help="allowed p95 slowdown (0.25 = 25%%)")
+    parser.add_argument("--max-quality-regression", type=float, default=0.02, help="allowed mean error increase")
+    parser.add_argument("--quality-only", action="store_true", help="gate on plan quality only")
+    args = parser.parse_args()
+
+    print(f"{'case':>13} {'items':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak KiB':>9} {'mean err':>10}")
+    current = run_suite(args.sizes, args.repeats, args.menu_seed)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = compare(
+            current, baseline, args.max_latency_regression, args.max_quality_regression, args.quality_only
+        )
+        for msg in failures:
+            print(f"REGRESSION {msg}")
+        if failures:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
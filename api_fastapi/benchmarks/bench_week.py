@@ -0,0 +1,102 @@
+"""One 7-day plan vs 7 single-day plans: wall time and SQL statements, menus loaded cold.
+
+"separate" is what 7 /api/plan calls cost below the HTTP layer: per day, a compiled-menu load
+(one joined query, so 7 statements for 7 days) and a build_plan_from_pools run. "week" is
+POST /api/plan/week: one batched load (get_compiled_menus, 1 statement for all days) and one
+build_multi_day_plan run. Uses a throwaway SQLite database unless DATABASE_URL is set.
+
+    python benchmarks/bench_week.py --items 500 --days 7 --repeats 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp.name}/bench.db")
+os.environ.setdefault("DB_ECHO", "0")  # no SQL echo unless asked for
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from app.database import AsyncSessionLocal, Base, SessionLocal, async_engine, engine  # noqa: E402
+from app.menu_index import get_compiled_menu, get_compiled_menus, invalidate_compiled_menu  # noqa: E402
+from app.models import MenuDay, MenuItem  # noqa: E402
+from app.planner import build_multi_day_plan, build_plan_from_pools  # noqa: E402
+from benchmarks.menus import DEFAULT_TARGETS, synthetic_menu  # noqa: E402
+
+COLUMNS = ("name", "meal_period", "calories", "protein", "carbs", "fat")
+
+
+def _seed(dates: list[str], n_items: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        for i, d in enumerate(dates):
+            if db.query(MenuDay).filter(MenuDay.date == d).first():
+                continue
+            day = MenuDay(date=d, scraped_at=datetime.utcnow())
+            db.add(day)
+            db.flush()
+            rows = [{c: it[c] for c in COLUMNS} | {"menu_day_id": day.id} for it in synthetic_menu(n_items, i)]
+            db.execute(insert(MenuItem), rows)
+        db.commit()
+
+
+async def _separate(dates: list[str]) -> None:
+    for d in dates:
+        async with AsyncSessionLocal() as db:
+            menu = await get_compiled_menu(db, d)
+        build_plan_from_pools(menu.pools, DEFAULT_TARGETS)
+
+
+async def _week(dates: list[str]) -> None:
+    async with AsyncSessionLocal() as db:
+        menus = await get_compiled_menus(db, dates)
+    build_multi_day_plan([(d, menus[d].pools) for d in dates], DEFAULT_TARGETS)
+
+
+async def _measure(fn, dates: list[str], repeats: int) -> tuple[float, int]:
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    times = []
+    try:
+        for _ in range(repeats):
+            invalidate_compiled_menu()
+            t0 = time.perf_counter()
+            await fn(dates)
+            times.append((time.perf_counter() - t0) * 1000)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    return statistics.median(times), statements // repeats
+
+
+async def _main(args) -> None:
+    first = date(2099, 3, 1)
+    dates = [(first + timedelta(days=i)).isoformat() for i in range(args.days)]
+    _seed(dates, args.items)
+    print(f"{'mode':>9} {'median ms':>10} {'SQL stmts':>10}")
+    for name, fn in (("separate", _separate), ("week", _week)):
+        ms, stmts = await _measure(fn, dates, args.repeats)
+        print(f"{name:>9} {ms:>10.1f} {stmts:>10}")
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--repeats", type=int, default=5)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""End-to-end load test of app.main:app against SQLite and an in-process Redis (fakeredis).
+
+The app runs in this process behind httpx's ASGI transport, with its real lifespan (background
+tasks, planner executor, plan writer); nothing is mocked below the HTTP layer. Menus for today
+and tomorrow are synthetic (benchmarks/menus.py). Each scenario reports, per phase and per
+endpoint: throughput, latency p50/p95/p99, error count and SQL statements per request
+(statements issued outside any request, e.g. plan write-behind flushes, appear as
+"background"), plus cache_stats() hit rates and planner tasks submitted.
+
+Scenarios:
+  steady         warm caches, then the request mix
+  cold-start     every cache tier emptied (as after a deploy), then the request mix
+  herd           caches emptied, then every client asks for a plan at the default targets
+  rollover       warm caches, request mix, then the clock passes midnight with no warm-up
+  rollover-warm  the same, with warm_day(tomorrow) run before midnight as the lifespan does
+
+    python benchmarks/loadtest.py --scenario all --requests 2000 --concurrency 50
+    PLANNER_WORKERS=4 python benchmarks/loadtest.py --scenario herd --out herd.json
+"""
+import argparse
+import asyncio
+import contextvars
+import datetime as datetime_mod
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp.name}/loadtest.db")
+os.environ.setdefault("DB_ECHO", "0")  # no SQL echo unless asked for
+os.environ.setdefault("PLANNER_WORKERS", "0")
+
+import fakeredis  # noqa: E402
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import cache  # noqa: E402
+from app.database import Base, async_engine, engine  # noqa: E402
+from app.executor import planner_executor  # noqa: E402
+from app.ingest import ingest_records  # noqa: E402
+from app.main import app, invalidate_menu_caches, warm_day  # noqa: E402
+from app.menu_index import invalidate_compiled_menu  # noqa: E402
+from benchmarks.menus import synthetic_menu  # noqa: E402
+
+SCENARIOS = ("steady", "cold-start", "herd", "rollover", "rollover-warm")
+MIX = {"menu": 0.3, "plan": 0.5, "profile_get": 0.1, "profile_post": 0.1}
+BACKGROUND = "background"
+
+# Endpoint of the request being served; SQL run in tasks it spawned inherits it.
+_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar("endpoint", default=BACKGROUND)
+_statements: Counter[str] = Counter()
+
+
+def _count_statement(*_):
+    _statements[_endpoint.get()] += 1
+
+
+class _ShiftedDate(date):
+    """datetime.date whose today() is `shift` days ahead (the app calls date.today() per request)."""
+
+    shift = 0
+
+    @classmethod
+    def today(cls):
+        return _REAL_DATE.today() + timedelta(days=cls.shift)
+
+
+_REAL_DATE = date
+
+
+@contextmanager
+def _clock():
+    datetime_mod.date = _ShiftedDate
+    try:
+        yield _ShiftedDate
+    finally:
+        datetime_mod.date = _REAL_DATE
+        _ShiftedDate.shift = 0
+
+
+def _targets(rng: random.Random) -> dict[str, float]:
+    calories = rng.choice((1600, 1800, 2000, 2000, 2200, 2500, 2800))
+    return {
+        "daily_calories": calories + rng.randint(-40, 40),
+        "daily_protein": round(calories * rng.uniform(0.05, 0.09)),
+        "daily_carbs": round(calories * rng.uniform(0.08, 0.14)),
+        "daily_fat": round(calories * rng.uniform(0.025, 0.04)),
+    }
+
+
+def _session_targets(session: str) -> dict[str, float]:
+    """A session's own targets: the same on every request it makes."""
+    return _targets(random.Random(session))
+
+
+def _request(kind: str, rng: random.Random, sessions: list[str]) -> tuple[str, str, dict]:
+    session = rng.choice(sessions)
+    if kind == "menu":
+        return "GET", "/api/menu/today", {}
+    if kind == "plan":
+        if rng.random() < 0.3:  # targets from the saved profile
+            return "POST", "/api/plan", {"headers": {"X-Session-Id": session}}
+        return "POST", "/api/plan", {"headers": {"X-Session-Id": session}, "json": _session_targets(session)}
+    if kind == "plan_default":
+        return "POST", "/api/plan", {}
+    if kind == "profile_get":
+        return "GET", "/api/profile", {"params": {"session_id": session}}
+    return "POST", "/api/profile", {"json": {"session_id": session, **_session_targets(session)}}
+
+
+class Phase:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+        self.seconds = 0.0
+        self.statements: Counter[str] = Counter()
+        self.cache: dict = {}
+        self.planner_tasks = 0
+
+    def report(self) -> dict:
+        def pct(values: list[float], p: float) -> float:
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+        total = sum(len(v) for v in self.latencies.values())
+        endpoints = {}
+        for name, values in sorted(self.latencies.items()):
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": self.errors[name],
+                "p50_ms": pct(values, 0.50),
+                "p95_ms": pct(values, 0.95),
+                "p99_ms": pct(values, 0.99),
+                "sql_per_request": round(self.statements[name] / len(values), 3),
+            }
+        return {
+            "phase": self.name,
+            "requests": total,
+            "seconds": round(self.seconds, 3),
+            "throughput_rps": round(total / self.seconds, 1) if self.seconds else None,
+            "endpoints": endpoints,
+            "background_sql": self.statements[BACKGROUND],
+            "planner_tasks": self.planner_tasks,
+            "cache": {
+                "l1_hit_rate": self.cache["l1"]["hit_rate"],
+                "l2_hit_rate": self.cache["l2"]["hit_rate"],
+                "by_prefix": self.cache["l2"].get("by_prefix"),
+            },
+        }
+
+
+async def _drive(client: httpx.AsyncClient, phase: Phase, kinds: list[str], weights: list[float],
+                 n_requests: int, concurrency: int, sessions: list[str], seed: int) -> None:
+    rng = random.Random(seed)
+    queue = [_request(k, rng, sessions) for k in rng.choices(kinds, weights, k=n_requests)]
+    queue.reverse()
+
+    async def worker():
+        while queue:
+            method, path, kw = queue.pop()
+            name = f"{method} {path}"
+            token = _endpoint.set(name)
+            t0 = time.perf_counter()
+            try:
+                r = await client.request(method, path, **kw)
+                if r.status_code >= 400:
+                    phase.errors[name] += 1
+            except Exception:
+                phase.errors[name] += 1
+            finally:
+                phase.latencies[name].append((time.perf_counter() - t0) * 1000)
+                _endpoint.reset(token)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    phase.seconds += time.perf_counter() - t0
+
+
+async def _reset_counters(r) -> None:
+    await cache.flush_cache_stats()
+    keys = [k async for k in r.scan_iter(match=f"{cache.CACHE_HITS}*")]
+    keys += [k async for k in r.scan_iter(match=f"{cache.CACHE_MISSES}*")]
+    if keys:
+        await r.delete(*keys)
+    cache._pending.clear()
+    cache.l1.hits = cache.l1.misses = cache.l1.evictions = cache.l1.invalidations = 0
+
+
+async def _empty_caches(r) -> None:
+    await r.flushall()
+    cache.l1.clear()
+    invalidate_compiled_menu()
+
+
+async def _run_phase(name: str, r, client, args, sessions, *, kinds=None, weights=None, seed=0) -> Phase:
+    phase = Phase(name)
+    await _reset_counters(r)
+    before = Counter(_statements)
+    submitted = planner_executor.stats()["submitted"]
+    await _drive(
+        client, phase, kinds or list(MIX), weights or list(MIX.values()),
+        args.requests, args.concurrency, sessions, args.seed + seed,
+    )
+    await asyncio.sleep(0)
+    phase.statements = Counter(_statements) - before
+    phase.planner_tasks = planner_executor.stats()["submitted"] - submitted
+    phase.cache = await cache.cache_stats()
+    return phase
+
+
+async def _scenario(name: str, r, client, args, sessions) -> list[Phase]:
+    if name == "steady":
+        await _run_phase("warm-up", r, client, args, sessions, seed=1)
+        return [await _run_phase("steady", r, client, args, sessions)]
+    if name == "cold-start":
+        await _empty_caches(r)
+        return [await _run_phase("cold", r, client, args, sessions)]
+    if name == "herd":
+        await _empty_caches(r)
+        return [await _run_phase("herd", r, client, args, sessions, kinds=["plan_default"], weights=[1.0])]
+    # rollover / rollover-warm: start from the same state, today's caches warm and tomorrow's empty.
+    await _empty_caches(r)
+    with _clock() as clock:
+        await _run_phase("warm-up", r, client, args, sessions, seed=1)
+        before = await _run_phase("before-midnight", r, client, args, sessions)
+        if name == "rollover-warm":
+            await warm_day((_REAL_DATE.today() + timedelta(days=1)).isoformat())
+        clock.shift = 1
+        after = await _run_phase("after-midnight", r, client, args, sessions, seed=2)
+    return [before, after]
+
+
+def _seed_menus(n_items: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    today = date.today()
+    records = []
+    for offset in (0, 1):
+        day = (today + timedelta(days=offset)).isoformat()
+        records += [{**it, "date": day} for it in synthetic_menu(n_items, seed=offset)]
+    ingest_records(records, engine)
+
+
+def _print(name: str, phases: list[Phase]) -> None:
+    for phase in phases:
+        rep = phase.report()
+        print(f"\n[{name}] {rep['phase']}: {rep['requests']} requests in {rep['seconds']:.2f}s "
+              f"({rep['throughput_rps']} req/s), planner tasks {rep['planner_tasks']}, "
+              f"background SQL {rep['background_sql']}")
+        print(f"  cache hit rate: l1 {rep['cache']['l1_hit_rate']}, l2 {rep['cache']['l2_hit_rate']}")
+        print(f"  {'endpoint':<22} {'reqs':>6} {'errs':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL/req':>8}")
+        for endpoint, e in rep["endpoints"].items():
+            print(f"  {endpoint:<22} {e['requests']:>6} {e['errors']:>5} {e['p50_ms']:>8.2f} "
+                  f"{e['p95_ms']:>8.2f} {e['p99_ms']:>8.2f} {e['sql_per_request']:>8.2f}")
+
+
+async def _main(args) -> dict:
+    _seed_menus(args.menu_items)
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    cache._redis = r
+    for e in (engine, async_engine.sync_engine):
+        event.listen(e, "before_cursor_execute", _count_statement)
+    sessions = [f"load-{i}" for i in range(args.sessions)]
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        for day in (date.today(), date.today() + timedelta(days=1)):
+            await invalidate_menu_caches(day.isoformat())
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            for sid in sessions:  # saved profiles for the "plan from profile" requests
+                await client.post("/api/profile", json={"session_id": sid, **_session_targets(sid)})
+            names = SCENARIOS if args.scenario == "all" else (args.scenario,)
+            for name in names:
+                phases = await _scenario(name, r, client, args, sessions)
+                _print(name, phases)
+                results[name] = [p.report() for p in phases]
+    cache._redis = None
+    await r.aclose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=(*SCENARIOS, "all"), default="all")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per phase")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--menu-items", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the report as JSON to this path")
+    args = parser.parse_args()
+    results = asyncio.run(_main(args))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"args": vars(args), "scenarios": results}, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Reproducible synthetic dining-hall menus for planner benchmarks."""
+import random
+from typing import Any
+
+DEFAULT_TARGETS = {"calories": 2000, "protein": 150, "carbs": 200, "fat": 65}
+
+# Mean grams of (protein, carbs, fat) per serving for common dining-hall item kinds.
+ARCHETYPES = {
+    "entree": (30, 25, 15),
+    "starch": (6, 45, 5),
+    "vegetable": (3, 12, 3),
+    "breakfast": (12, 30, 12),
+    "dessert": (4, 40, 14),
+    "salad": (8, 12, 10),
+    "soup": (10, 20, 6),
+}
+PERIOD_MIX = (("breakfast", 0.25), ("lunch", 0.3), ("dinner", 0.3), ("any", 0.15))
+
+
+def _gram(rng: random.Random, mean: float) -> float:
+    return round(max(0.0, rng.gauss(mean, mean * 0.35)) * 2) / 2
+
+
+def synthetic_menu(n: int, seed: int = 0) -> list[dict[str, Any]]:
+    """n menu items shaped like /api/menu/today items; same (n, seed) gives the same menu."""
+    rng = random.Random(seed)
+    kinds = list(ARCHETYPES)
+    periods, weights = zip(*PERIOD_MIX)
+    items = []
+    for i in range(n):
+        kind = rng.choice(kinds)
+        period = "breakfast" if kind == "breakfast" else rng.choices(periods, weights)[0]
+        protein, carbs, fat = (_gram(rng, m) for m in ARCHETYPES[kind])
+        calories = max(0.0, round(4 * protein + 4 * carbs + 9 * fat + rng.gauss(0, 10)))
+        items.append(
+            {
+                "id": i + 1,
+                "name": f"{kind} {i + 1}",
+                "meal_period": period,
+                "calories": calories,
+                "protein": protein,
+                "carbs": carbs,
+                "fat": fat,
+            }
+        )
+    return items
@@ -0,0 +1,65 @@
+"""Load scraper menu exports (JSON / NDJSON / CSV) into the database, one transaction per day.
+
+    python scripts/ingest_menus.py exports/*.ndjson [--format csv] [--chunk-size 2000] [--sorted]
+        [--write-partial] [--no-invalidate]
+
+Days already in the database are replaced, except days with invalid records, which are skipped
+unless --write-partial is given. --sorted writes each day as soon as the next one starts instead
+of buffering the whole file (each day's records must be contiguous). Cached menus and plans for
+every ingested day are invalidated in all running API workers (via Redis pub/sub) unless
+--no-invalidate is given.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.ingest import CHUNK_SIZE, FORMATS, ingest_file  # noqa: E402
+
+
+async def _invalidate(dates: list[str]) -> None:
+    from app.cache import close_redis
+    from app.main import invalidate_menu_caches
+
+    for d in dates:
+        await invalidate_menu_caches(d)
+    await close_redis()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--sorted", action="store_true", help="each day's records are contiguous")
+    parser.add_argument("--write-partial", action="store_true", help="write days with invalid records too")
+    parser.add_argument("--no-invalidate", action="store_true")
+    args = parser.parse_args()
+
+    engine = create_engine(settings.database_url, pool_pre_ping=True)
+    days: set[str] = set()
+    failed = False
+    for path in args.paths:
+        report = ingest_file(path, args.format, engine, args.chunk_size, args.sorted, args.write_partial)
+        days.update(report.days)
+        print(
+            f"{path}: {report.rows} rows, {len(report.days)} days, {report.invalid} invalid "
+            f"in {report.seconds:.2f}s ({report.rows_per_sec:,.0f} rows/s)"
+        )
+        for err in report.errors:
+            print(f"  {err}")
+        if report.skipped:
+            print(f"  not written (invalid records): {', '.join(report.skipped)}")
+        failed = failed or report.invalid > 0
+    if days and not args.no_invalidate:
+        asyncio.run(_invalidate(sorted(days)))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
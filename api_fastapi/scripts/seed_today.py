@@ -1,40 +1,35 @@
 """Seed today's menu so /api/menu/today and /api/plan return data. Idempotent for the day."""
+import asyncio
 import os
 import sys
-from datetime import date, datetime
+from datetime import date
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, select
 
 from app.config import settings
-from app.models import Base, MenuDay, MenuItem
+from app.ingest import ingest_records, sample_menu_records
+from app.models import MenuDay
 
 def main():
     engine = create_engine(settings.database_url, pool_pre_ping=True)
-    Session = sessionmaker(bind=engine)
-    db = Session()
     today = date.today().isoformat()
-    menu_day = db.query(MenuDay).filter(MenuDay.date == today).first()
-    if menu_day:
-        print(f"Menu for {today} already exists, skip seed.")
-        return
-    menu_day = MenuDay(date=today, scraped_at=datetime.utcnow())
-    db.add(menu_day)
-    db.flush()
-    items = [
-        ("Oatmeal", "breakfast", 150, 5, 27, 3),
-        ("Eggs", "breakfast", 200, 14, 2, 15),
-        ("Salad", "lunch", 300, 12, 20, 18),
-        ("Grilled Chicken", "lunch", 400, 35, 0, 22),
-        ("Pasta", "dinner", 450, 15, 60, 12),
-        ("Salmon", "dinner", 380, 34, 0, 24),
-    ]
-    for name, period, cal, pro, carb, fat in items:
-        db.add(MenuItem(menu_day_id=menu_day.id, name=name, meal_period=period, calories=cal, protein=pro, carbs=carb, fat=fat))
-    db.commit()
-    print(f"Seeded menu for {today} with {len(items)} items.")
+    with engine.connect() as conn:
+        if conn.execute(select(MenuDay.id).where(MenuDay.date == today)).first():
+            print(f"Menu for {today} already exists, skip seed.")
+            return
+    report = ingest_records(sample_menu_records(today), engine)
+    asyncio.run(_invalidate(today))
+    print(f"Seeded menu for {today} with {report.rows} items.")
+
+async def _invalidate(today):
+    """Drop cached menu/plan responses here and, via pub/sub, in every running API worker."""
+    from app.cache import close_redis
+    from app.main import invalidate_menu_caches
+
+    await invalidate_menu_caches(today)
+    await close_redis()
 
 if __name__ == "__main__":
     main()
@@ -1,15 +1,132 @@
 import os
 import sys
+from datetime import datetime
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
 # Ensure app is importable
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Plan on the threadpool in API tests; tests/test_executor.py covers the process pool.
+os.environ.setdefault("PLANNER_WORKERS", "0")
 
 from app.main import app
 
 
+@pytest.fixture(autouse=True)
+def _fresh_l1_cache(monkeypatch):
+    """The in-process cache tier and unflushed counters are module state; start every test empty."""
+    from collections import Counter
+
+    from app import cache
+
+    monkeypatch.setattr(cache, "l1", cache.LocalCache(cache.l1.max_entries))
+    monkeypatch.setattr(cache, "_pending", Counter())
+
+
 @pytest.fixture
 def client():
-    return TestClient(app)
+    # One event loop for all requests of a test; lifespan shutdown releases loop-bound pools.
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+async def adb():
+    from app.database import AsyncSessionLocal, async_engine
+
+    async with AsyncSessionLocal() as session:
+        yield session
+    await async_engine.dispose()
+
+
+@pytest.fixture
+async def fake_redis(monkeypatch):
+    """In-process Redis stand-in installed as the app's shared client."""
+    import fakeredis
+
+    from app import cache
+
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "_redis", r)
+    yield r
+    await r.aclose()
+
+
+@pytest.fixture
+def db():
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_menu_day(db):
+    """Insert a MenuDay with items (name, period, cal, pro, carb, fat[, tags]) for a given date;
+    removed again after the test."""
+    from app.models import MenuDay, MenuItem
+
+    created: list[int] = []
+
+    def make(date: str, items: list[tuple]) -> MenuDay:
+        for old in db.query(MenuDay).filter(MenuDay.date == date).all():
+            db.query(MenuItem).filter(MenuItem.menu_day_id == old.id).delete()
+            db.delete(old)
+        db.flush()
+        menu_day = MenuDay(date=date, scraped_at=datetime.utcnow())
+        db.add(menu_day)
+        db.flush()
+        for name, period, cal, pro, carb, fat, *tags in items:
+            db.add(MenuItem(
+                menu_day_id=menu_day.id, name=name, meal_period=period, calories=cal, protein=pro, carbs=carb, fat=fat,
+                tags=tags[0] if tags else None,
+            ))
+        db.commit()
+        created.append(menu_day.id)
+        return menu_day
+
+    yield make
+    db.rollback()
+    for menu_day_id in created:
+        db.query(MenuItem).filter(MenuItem.menu_day_id == menu_day_id).delete()
+        db.query(MenuDay).filter(MenuDay.id == menu_day_id).delete()
+    db.commit()
+
+
+@pytest.fixture
+def today_menu(make_menu_day):
+    """Today's menu (the sample items) for API tests. CI databases are migrated but never
+    seeded, so tests must not rely on the SQLite start-up seed. Request it before client."""
+    from datetime import date
+
+    from app.ingest import SAMPLE_MENU
+    from app.menu_index import invalidate_compiled_menu
+
+    menu_day = make_menu_day(date.today().isoformat(), SAMPLE_MENU)
+    invalidate_compiled_menu()
+    yield menu_day
+    invalidate_compiled_menu()
+
+
+@pytest.fixture
+def sql_statements():
+    """List that collects every SQL statement executed while the test runs."""
+    from app.database import async_engine, engine
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for e in engines:
+        event.listen(e, "before_cursor_execute", record)
+    yield statements
+    for e in engines:
+        event.remove(e, "before_cursor_execute", record)
@@ -73,3 +73,25 @@ def test_openapi_schema_available(client: TestClient):
     assert "paths" in schema
     assert "/health" in schema["paths"]
     assert "/api/plan" in schema["paths"]
+
+
+def test_plan_rejects_unknown_optimize_mode(client: TestClient):
+    r = client.post("/api/plan?optimize=fastest", json={"daily_calories": 2000})
+    assert r.status_code == 422
+
+
+def test_profile_roundtrip(client: TestClient):
+    r = client.post("/api/profile", json={"session_id": "test-roundtrip", "daily_calories": 1800})
+    assert r.status_code == 200
+    r = client.get("/api/profile", params={"session_id": "test-roundtrip"})
+    assert r.json()["profile"]["daily_calories"] == 1800
+    assert client.get("/api/profile").json() == {"profile": None}
+
+
+def test_async_database_url_maps_drivers():
+    from app.database import async_database_url
+
+    assert async_database_url("postgresql://u:p@h:5432/db") == "postgresql+asyncpg://u:p@h:5432/db"
+    assert async_database_url("postgresql+psycopg2://u@h/db") == "postgresql+asyncpg://u@h/db"
+    assert async_database_url("sqlite:///./dev.db") == "sqlite+aiosqlite:///./dev.db"
+    assert async_database_url("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
@@ -0,0 +1,152 @@
+"""Two-tier cache: in-process L1 (LRU + TTL) in front of Redis, pub/sub invalidation."""
+import asyncio
+import json
+import time
+
+from app import cache
+from app.cache import (
+    CACHE_HITS,
+    CACHE_MISSES,
+    INVALIDATE_CHANNEL,
+    LocalCache,
+    cache_get,
+    cache_invalidate,
+    cache_set,
+    cache_stats,
+)
+
+
+def test_local_cache_evicts_least_recently_used():
+    lc = LocalCache(2)
+    lc.set("a", "1", 60)
+    lc.set("b", "2", 60)
+    assert lc.get("a") == "1"  # touch a; b is now the oldest
+    lc.set("c", "3", 60)
+    assert lc.get("b") is None
+    assert (lc.get("a"), lc.get("c")) == ("1", "3")
+    assert lc.stats()["evictions"] == 1
+
+
+def test_local_cache_entries_expire(monkeypatch):
+    lc = LocalCache(8)
+    now = time.monotonic()
+    lc.set("a", "1", 5)
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 6)
+    assert lc.get("a") is None
+    assert lc.stats()["size"] == 0
+
+
+async def test_l1_hit_skips_redis(fake_redis):
+    await cache_set("menu:today", '{"v": 1}', 60)
+    await fake_redis.delete("menu:today")  # only L1 can answer now
+    assert await cache_get("menu:today") == '{"v": 1}'
+    stats = await cache_stats()
+    assert stats["mode"] == "l1+l2"
+    assert stats["l1"]["hits"] == 1
+    assert stats["l2"]["hits"] == stats["l2"]["misses"] == 0
+
+
+async def test_l1_never_outlives_l2_ttl(fake_redis):
+    await fake_redis.set("plan:a", "x", px=50)
+    assert await cache_get("plan:a") == "x"  # L2 hit, copied into L1 with the remaining TTL
+    await asyncio.sleep(0.1)
+    assert await cache_get("plan:a") is None
+    stats = await cache_stats()
+    assert (stats["l2"]["hits"], stats["l2"]["misses"]) == (1, 1)
+
+
+async def test_l1_only_when_redis_is_down(monkeypatch):
+    monkeypatch.setattr(cache, "_redis", None)
+    monkeypatch.setattr(cache, "_redis_retry_at", time.monotonic() + 3600)
+    await cache_set("menu:today", "m", 60)
+    assert await cache_get("menu:today") == "m"
+    stats = await cache_stats()
+    assert stats["mode"] == "l1-only"
+    assert stats["enabled"] is False
+    assert stats["l1"]["hits"] == 1
+
+
+async def test_l1_only_when_a_connected_redis_fails(monkeypatch):
+    import redis.asyncio as redis
+
+    dead = redis.from_url("redis://127.0.0.1:1", socket_connect_timeout=0.2)
+    monkeypatch.setattr(cache, "_redis", dead)
+    await cache_set("menu:today", "m", 60)
+    assert cache._redis is None and cache._redis_retry_at > time.monotonic()
+    assert await cache_get("menu:today") == "m"
+
+    monkeypatch.setattr(cache, "_redis", dead)
+    assert await cache_get("plan:missing") is None
+    await cache_invalidate("plan:", prefix=True)
+    assert cache._redis is None
+    assert (await cache_stats())["mode"] == "l1-only"
+
+
+async def test_invalidation_reaches_other_workers_l1(fake_redis):
+    listener = asyncio.create_task(cache.run_invalidation_listener())
+    try:
+        while (await fake_redis.pubsub_numsub(INVALIDATE_CHANNEL))[0][1] == 0:
+            await asyncio.sleep(0.01)
+        await cache_set("plan:s1:a", "1", 60)
+        await cache_set("plan:s2:b", "2", 60)
+        await cache_set("menu:today", "m", 60)
+        # Another worker reseeded: it publishes, this worker's L1 drops the keys.
+        await fake_redis.publish(INVALIDATE_CHANNEL, json.dumps({"key": "plan:", "prefix": True}))
+        for _ in range(100):
+            if cache.l1.stats()["size"] == 1:
+                break
+            await asyncio.sleep(0.01)
+        assert cache.l1.get("plan:s1:a") is None and cache.l1.get("plan:s2:b") is None
+        assert cache.l1.get("menu:today") == "m"
+    finally:
+        listener.cancel()
+
+
+async def test_cache_invalidate_clears_both_tiers(fake_redis):
+    await cache_set("plan:s1:a", "1", 60)
+    await cache_set("menu:today", "m", 60)
+    await cache_invalidate("plan:", prefix=True)
+    assert not await fake_redis.exists("plan:s1:a")
+    assert await cache_get("plan:s1:a") is None
+    assert await cache_get("menu:today") == "m"
+
+
+async def test_l2_lookup_is_one_round_trip(fake_redis, monkeypatch):
+    await fake_redis.set("menu:today", "m")
+    conn_cls = fake_redis.connection_pool.connection_class
+    sent = 0
+    send = conn_cls.send_packed_command
+
+    async def counted(self, *args, **kwargs):
+        nonlocal sent
+        sent += 1
+        return await send(self, *args, **kwargs)
+
+    monkeypatch.setattr(conn_cls, "send_packed_command", counted)
+    assert await cache_get("menu:today") == "m"
+    assert await cache_get("plan:none") is None
+    assert sent == 2
+    assert not await fake_redis.exists(CACHE_HITS)  # counted locally until the next flush
+
+
+async def test_stats_break_down_by_key_prefix(fake_redis):
+    await fake_redis.set("menu:today", "m")
+    await fake_redis.set("plan:a", "p")
+    for key in ("menu:today", "plan:a", "plan:b", "plan:c", "swr:menu:today"):
+        await cache_get(key)
+    await cache.flush_cache_stats()
+    assert (int(await fake_redis.get(CACHE_HITS)), int(await fake_redis.get(CACHE_MISSES))) == (2, 3)
+    by_prefix = (await cache_stats())["l2"]["by_prefix"]
+    assert by_prefix["menu"] == {"hits": 1, "misses": 0, "hit_rate": 1.0}
+    assert (by_prefix["plan"]["hits"], by_prefix["plan"]["misses"]) == (1, 2)
+    assert by_prefix["other"]["misses"] == 1
+
+
+async def test_exact_stats_count_in_the_lookup(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache.settings, "cache_exact_stats", True)
+    await fake_redis.set("plan:a", "p", px=60_000)
+    assert await cache_get("plan:a") == "p"
+    assert await cache_get("plan:b") is None
+    assert not cache._pending
+    assert await fake_redis.mget(CACHE_HITS, f"{CACHE_HITS}:plan", f"{CACHE_MISSES}:plan") == ["1", "1", "1"]
+    assert 0 < cache.l1._data["plan:a"][0] - time.monotonic() <= 60
@@ -0,0 +1,42 @@
+"""Connection pools: settings-driven queue pools, checkout timing and /health pool stats."""
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import StaticPool
+
+from app.database import TimedAsyncQueuePool, TimedQueuePool, _configure, _engine_kw
+
+
+def test_engine_kw_uses_queue_pools_except_for_in_memory_sqlite():
+    assert _engine_kw("sqlite:///:memory:", False)["poolclass"] is StaticPool
+    assert _engine_kw("sqlite://", True)["poolclass"] is StaticPool
+    assert _engine_kw("sqlite:////tmp/x.db", False)["poolclass"] is TimedQueuePool
+    pg = _engine_kw("postgresql+asyncpg://u@h/db", True)
+    assert pg["poolclass"] is TimedAsyncQueuePool and pg["pool_pre_ping"]
+    assert "connect_args" not in pg
+
+
+def test_checkout_waits_and_timeouts_are_counted(tmp_path):
+    e = _configure(
+        create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05
+        ),
+        "test",
+    )
+    with e.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        with pytest.raises(exc.TimeoutError):
+            e.connect()
+    stats = e.pool.stats
+    assert (stats.checkouts, stats.timeouts) == (2, 1)
+    assert stats.max_wait_s >= 0.05
+    e.dispose()
+    assert e.pool.stats is stats
+    e.dispose()
+
+
+def test_health_reports_pool_stats(client):
+    pools = client.get("/health").json()["database_pools"]
+    primary = pools["primary"]
+    assert primary["checkouts"] >= 1 and primary["timeouts"] == 0
+    assert 0 <= primary["saturation"] <= 1
+    assert {"size", "checked_out", "idle", "avg_wait_ms", "max_wait_ms"} <= primary.keys()
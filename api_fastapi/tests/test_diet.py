@@ -0,0 +1,102 @@
+"""Dietary tag bitmasks: parsing, pool pre-filtering, the per-(version, diet) cache and the API."""
+import uuid
+
+import pytest
+
+from app.diet import NO_DIET, TAG_BITS, DietMask, DietPools, compile_preferences, filter_pools, mask_tags, tag_mask
+from app.menu_index import compile_menu, invalidate_compiled_menu
+from app.models import MealPlan
+from app.plan_cache import parse_plan_key, plan_cache_key
+from app.planner import SLOTS, build_plan
+
+VEG = DietMask(TAG_BITS["vegetarian"], 0)
+NO_PEANUTS = DietMask(0, TAG_BITS["contains_peanuts"])
+DAY = "2099-03-01"
+ROWS = [
+    (1, "Tofu scramble", "breakfast", 300, 20, 20, 15, "Vegan, GF"),
+    (2, "Bacon & eggs", "breakfast", 450, 25, 5, 35, "pork,eggs"),
+    (3, "Satay bowl", "lunch", 600, 30, 60, 25, "vegetarian, peanuts"),
+    (4, "Lentil soup", "lunch", 400, 22, 50, 8, "vegan"),
+    (5, "Steak", "dinner", 700, 55, 0, 45, "beef, gluten free"),
+    (6, "Veggie curry", "dinner", 550, 18, 70, 20, "veg, dairy"),
+    (7, "Fruit", "any", 80, 1, 20, 0, None),
+]
+
+
+@pytest.fixture(autouse=True)
+def _clear_compiled():
+    invalidate_compiled_menu()
+    yield
+    invalidate_compiled_menu()
+
+
+def _names(plan: dict) -> set[str]:
+    return {it["name"] for slot in SLOTS for it in plan[slot]["items"]}
+
+
+def test_tags_are_normalized_aliased_and_implied():
+    assert mask_tags(tag_mask("Vegan, GF , unknown-tag")) == [
+        "vegetarian", "vegan", "gluten_free", "dairy_free", "egg_free"
+    ]
+    assert tag_mask(["Tree Nuts", "milk"]) == TAG_BITS["contains_tree_nuts"] | TAG_BITS["contains_dairy"]
+    assert tag_mask(None) == tag_mask("") == 0
+    assert compile_preferences({"include": ["veg"], "exclude": ["peanuts"]}) == DietMask(
+        TAG_BITS["vegetarian"], TAG_BITS["contains_peanuts"]
+    )
+    assert compile_preferences(None) == NO_DIET
+    with pytest.raises(ValueError, match="unknown dietary tags"):
+        compile_preferences({"exclude": ["kryptonite"]})
+
+
+def test_filter_pools_keeps_order_and_never_falls_back():
+    pools = compile_menu(DAY, 1, None, ROWS).pools
+    veg = filter_pools(pools, VEG)
+    assert [[it.name for it in pool] for pool in veg] == [
+        ["Tofu scramble"], ["Satay bowl", "Lentil soup"], ["Veggie curry"]
+    ]
+    strict = filter_pools(pools, DietMask(VEG.include, NO_PEANUTS.exclude | TAG_BITS["contains_dairy"]))
+    assert [[it.name for it in pool] for pool in strict] == [["Tofu scramble"], ["Lentil soup"], []]
+    assert filter_pools(pools, NO_DIET) == tuple(tuple(pool) for pool in pools)
+
+
+def test_diet_pools_cached_per_version_and_diet():
+    menu = compile_menu(DAY, 1, None, ROWS)
+    cache = DietPools(max_entries=2)
+    assert cache.get(menu.version, menu.pools, NO_DIET) is menu.pools
+    first = cache.get(menu.version, menu.pools, VEG)
+    assert cache.get(menu.version, menu.pools, VEG) is first
+    assert cache.get("other", menu.pools, VEG) is not first
+    cache.get(menu.version, menu.pools, NO_PEANUTS)
+    assert cache.stats() == {"size": 2, "hits": 1, "misses": 3}
+
+
+def test_build_plan_with_diet_and_plan_key_round_trip():
+    items = list(compile_menu(DAY, 1, None, ROWS).items)
+    plan = build_plan(items, {"calories": 1500}, seed=3, diet=VEG)
+    assert _names(plan) and _names(plan) <= {"Tofu scramble", "Satay bowl", "Lentil soup", "Veggie curry"}
+    menu = compile_menu(DAY, 1, None, ROWS)
+    key = plan_cache_key(menu, {"calories": 1500.0}, "greedy", 2, VEG)
+    assert key != plan_cache_key(menu, {"calories": 1500.0}, "greedy", 2)
+    assert parse_plan_key(key).diet == VEG
+    assert parse_plan_key(plan_cache_key(menu, {"calories": 1500.0})).diet == NO_DIET
+
+
+def test_week_plan_and_profile_preferences(client, db, make_menu_day):
+    make_menu_day(DAY, [row[1:] for row in ROWS])
+    session = f"diet-{uuid.uuid4()}"
+    url = f"/api/plan/week?start={DAY}&days=1"
+    try:
+        r = client.post(url, json={"preferences": {"include": ["Vegetarian"], "exclude": ["peanut"]}})
+        assert r.status_code == 200
+        assert _names(r.json()["days"][0]) <= {"Tofu scramble", "Lentil soup", "Veggie curry"}
+
+        assert client.post("/api/profile", json={"session_id": session, "preferences": {"exclude": ["x"]}}).status_code == 422
+        saved = {"session_id": session, "daily_calories": 1800, "preferences": {"include": ["veg"]}}
+        assert client.post("/api/profile", json=saved).status_code == 200
+        profile = client.get(f"/api/profile?session_id={session}").json()["profile"]
+        assert profile["preferences"] == {"include": ["vegetarian"], "exclude": []}
+        r = client.post(url, headers={"X-Session-Id": session})
+        assert not _names(r.json()["days"][0]) & {"Bacon & eggs", "Steak", "Fruit"}
+    finally:
+        db.query(MealPlan).filter(MealPlan.session_id == session).delete()
+        db.commit()
@@ -0,0 +1,85 @@
+"""Planner executor: admission control, 503 backpressure and the process pool."""
+import asyncio
+import threading
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import executor as executor_mod
+from app.executor import PlanExecutor, PlannerBusy
+from app.menu_index import compile_menu
+
+TARGETS = {"calories": 2000, "protein": 150, "carbs": 200, "fat": 65}
+ROWS = [
+    (1, "Oatmeal", "breakfast", 150, 5, 27, 3),
+    (2, "Eggs", "breakfast", 200, 14, 2, 15),
+    (3, "Salad", "lunch", 300, 12, 20, 18),
+    (4, "Salmon", "dinner", 380, 34, 0, 24),
+]
+
+
+def _menu(date: str = "2099-01-01", rows=ROWS):
+    return compile_menu(date, 1, None, rows)
+
+
+async def test_full_queue_rejects_immediately(monkeypatch):
+    release = threading.Event()
+
+    def slow_plan(pools, targets, **kwargs):
+        release.wait(5)
+        return {"ok": True}
+
+    monkeypatch.setattr(executor_mod, "build_plan_from_pools", slow_plan)
+    ex = PlanExecutor(workers=0, max_in_flight=1, queue_size=1, retry_after=3)
+    ex.start()
+    running = asyncio.create_task(ex.run(_menu(), TARGETS))
+    await asyncio.sleep(0.05)
+    queued = asyncio.create_task(ex.run(_menu(), TARGETS))
+    await asyncio.sleep(0.05)
+    assert ex.stats()["in_flight"] == 1 and ex.stats()["queue_depth"] == 1
+
+    with pytest.raises(PlannerBusy) as busy:
+        await ex.run(_menu(), TARGETS)
+    assert busy.value.retry_after == 3
+
+    release.set()
+    assert await running == {"ok": True}
+    assert await queued == {"ok": True}
+    stats = ex.stats()
+    assert stats["rejected"] == 1 and stats["submitted"] == 2
+    assert stats["wait_ms_max"] > 0
+
+
+async def test_process_pool_plans_with_prewarmed_and_shipped_menus():
+    ex = PlanExecutor(workers=1)
+    day = date.today()
+    today = _menu(day.isoformat())
+    ex.start(today)
+    try:
+        plan = await ex.run(today, TARGETS)
+        assert plan["totals"]["calories"] > 0
+        # Older days, and tomorrow's menu warmed before midnight, are shipped with the task
+        # instead of re-warming the pool.
+        for other in ((day - timedelta(days=1)).isoformat(), (day + timedelta(days=1)).isoformat()):
+            plan = await ex.run(_menu(other, ROWS[:3]), TARGETS)
+            assert {it["id"] for s in ("breakfast", "lunch", "dinner") for it in plan[s]["items"]} <= {1, 2, 3}
+            assert ex._warm_version == today.version
+        assert ex.stats()["mode"] == "process"
+    finally:
+        ex.shutdown()
+
+
+def test_plan_returns_503_with_retry_after_when_busy(today_menu, client: TestClient, monkeypatch):
+    async def busy(*args, **kwargs):
+        raise PlannerBusy(7)
+
+    monkeypatch.setattr(executor_mod.planner_executor, "run", busy)
+    r = client.post("/api/plan", json={"daily_calories": 1234.5})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "7"
+
+
+def test_health_reports_planner_stats(client: TestClient):
+    planner = client.get("/health").json()["planner"]
+    assert {"queue_depth", "in_flight", "wait_ms_p95", "rejected"} <= planner.keys()
@@ -0,0 +1,103 @@
+"""Bulk menu ingestion: incremental readers, chunked validation, per-day bulk upsert."""
+import io
+import json
+
+import pytest
+
+from app.database import engine
+from app.ingest import IngestReport, _iter_json, ingest_file, ingest_records, iter_raw_records, validate_chunks
+from app.models import MenuDay, MenuItem
+
+DAYS = ["2099-05-01", "2099-05-02"]
+
+
+def _record(date, name, period="lunch", cal=300):
+    return {"date": date, "name": name, "meal_period": period, "calories": cal, "protein": 10, "carbs": 20, "fat": 5}
+
+
+@pytest.fixture
+def cleanup_days(db):
+    yield
+    for day in db.query(MenuDay).filter(MenuDay.date.in_(DAYS)).all():
+        db.query(MenuItem).filter(MenuItem.menu_day_id == day.id).delete()
+        db.delete(day)
+    db.commit()
+
+
+def test_json_array_is_decoded_incrementally():
+    data = [
+        {"date": DAYS[0], "items": [{"name": "Soup", "meal_period": "lunch"}, {"name": "Rice", "meal_period": "dinner"}]},
+        _record(DAYS[1], "Toast", "breakfast"),
+    ]
+    records = list(_iter_json(io.StringIO(json.dumps(data, indent=2)), read_size=16))
+    assert [(r["date"], r["name"]) for r in records] == [(DAYS[0], "Soup"), (DAYS[0], "Rice"), (DAYS[1], "Toast")]
+
+
+def test_csv_and_ndjson_readers(tmp_path):
+    csv_path = tmp_path / "menu.csv"
+    csv_path.write_text(
+        "date,name,meal_period,calories,protein,carbs,fat,tags,hall\n"
+        f"{DAYS[0]},Soup,Lunch,120,4,15,3,vegan,North\n"
+        f"{DAYS[0]},Bad,brunch,1,1,1,1,,North\n"
+    )
+    nd_path = tmp_path / "menu.jsonl"
+    nd_path.write_text(json.dumps(_record(DAYS[0], "Soup")) + "\n\n" + json.dumps(_record(DAYS[0], "X", cal=-1)) + "\n")
+    for path in (csv_path, nd_path):
+        report = IngestReport()
+        chunks = list(validate_chunks(iter_raw_records(path), report, chunk_size=1))
+        records = [r for chunk in chunks for r in chunk]
+        assert [r.name for r in records] == ["Soup"]
+        assert records[0].meal_period == "lunch"
+        assert report.invalid == 1 and "record 1" in report.errors[0]
+    with pytest.raises(ValueError):
+        list(iter_raw_records(tmp_path / "menu.xml"))
+
+
+def test_ingest_bulk_inserts_one_statement_per_day(cleanup_days, sql_statements):
+    records = [_record(DAYS[i % 2], f"item{i}", cal=100 + i) for i in range(50)]
+    report = ingest_records(records, engine, chunk_size=7)
+    assert (report.days, report.rows, report.invalid) == (DAYS, 50, 0)
+    assert report.rows_per_sec > 0
+    inserts = [s for s in sql_statements if s.startswith("INSERT INTO menu_items")]
+    assert len(inserts) == 2  # executemany per day
+
+
+def test_reingest_replaces_day_in_place(db, cleanup_days, tmp_path):
+    ingest_records([_record(DAYS[0], "Old"), _record(DAYS[0], "Older")], engine)
+    day_id = db.query(MenuDay.id).filter(MenuDay.date == DAYS[0]).scalar()
+    path = tmp_path / "menu.ndjson"
+    path.write_text(json.dumps({**_record(DAYS[0], "New"), "tags": ["vegan", "gf"]}) + "\n")
+    report = ingest_file(path, engine=engine)
+    assert report.rows == 1
+    db.expire_all()
+    assert db.query(MenuDay.id).filter(MenuDay.date == DAYS[0]).scalar() == day_id
+    items = db.query(MenuItem).filter(MenuItem.menu_day_id == day_id).all()
+    assert [(i.name, i.tags) for i in items] == [("New", "vegan,gf")]
+
+
+def test_sorted_input_writes_each_day_when_the_next_starts(cleanup_days, sql_statements):
+    def records():
+        yield _record(DAYS[0], "Soup")
+        yield _record(DAYS[1], "Toast", "breakfast")
+        # DAYS[0] is committed before the rest of the input is read.
+        assert any(s.startswith("INSERT INTO menu_items") for s in sql_statements)
+        yield _record(DAYS[1], "Rice", "dinner")
+
+    sql_statements.clear()
+    report = ingest_records(records(), engine, chunk_size=1, sorted_input=True)
+    assert (report.days, report.rows) == (DAYS, 3)
+    with pytest.raises(ValueError, match="not contiguous"):
+        ingest_records([_record(DAYS[0], "A"), _record(DAYS[1], "B"), _record(DAYS[0], "C")], engine, sorted_input=True)
+
+
+def test_day_with_invalid_records_keeps_its_menu(db, cleanup_days):
+    ingest_records([_record(DAYS[0], "Old")], engine)
+    records = [_record(DAYS[0], "New"), _record(DAYS[0], "Bad", cal=-1), _record(DAYS[1], "Toast")]
+    report = ingest_records(records, engine)
+    assert (report.days, report.skipped, report.invalid) == ([DAYS[1]], [DAYS[0]], 1)
+    day_id = db.query(MenuDay.id).filter(MenuDay.date == DAYS[0]).scalar()
+    assert [i.name for i in db.query(MenuItem).filter(MenuItem.menu_day_id == day_id)] == ["Old"]
+    report = ingest_records(records, engine, write_partial=True)
+    assert (report.days, report.skipped) == (DAYS, [])
+    db.expire_all()
+    assert [i.name for i in db.query(MenuItem).filter(MenuItem.menu_day_id == day_id)] == ["New"]
@@ -0,0 +1,77 @@
+"""Date/version-scoped menu and plan cache entries, reseed invalidation, midnight warm-up."""
+from datetime import datetime
+
+import pytest
+
+import app.main as main
+from app import cache
+from app.executor import planner_executor
+from app.menu_index import _compiled, compile_menu, invalidate_compiled_menu
+
+DAY = "2099-01-02"
+ITEMS = [
+    ("Oatmeal", "breakfast", 150, 5, 27, 3),
+    ("Salad", "lunch", 300, 12, 20, 18),
+    ("Salmon", "dinner", 380, 34, 0, 24),
+]
+
+
+@pytest.fixture(autouse=True)
+def _clear_compiled():
+    invalidate_compiled_menu()
+    yield
+    invalidate_compiled_menu()
+
+
+def test_menu_key_is_scoped_by_date_and_version():
+    menu = compile_menu(DAY, 1, None, [(1, *ITEMS[0])])
+    reseeded = compile_menu(DAY, 1, None, [(1, *ITEMS[1])])
+    assert main._menu_cache_key(menu) == f"menu:{DAY}:{menu.version}"
+    assert main._menu_cache_key(reseeded) != main._menu_cache_key(menu)
+
+
+async def test_reseed_invalidation_drops_day_entries(adb, make_menu_day):
+    make_menu_day(DAY, ITEMS)
+    assert await main.warm_day(DAY)
+    assert any(k.startswith(f"menu:{DAY}:") for k in cache.l1._data)
+    await cache.cache_set("plan:2099-01-03:v:a1", "{}", 60)
+    await main.invalidate_menu_caches(DAY)
+    assert list(cache.l1._data) == ["plan:2099-01-03:v:a1"]  # other days untouched
+    assert DAY not in _compiled
+
+
+async def test_warm_day_fills_menu_and_popular_plans(adb, make_menu_day, monkeypatch):
+    make_menu_day(DAY, ITEMS)
+    runs = []
+    run = planner_executor.run
+
+    async def counted(menu, targets, **kwargs):
+        runs.append(targets)
+        return await run(menu, targets, **kwargs)
+
+    monkeypatch.setattr(planner_executor, "run", counted)
+    monkeypatch.setattr(main, "_bucket_requests", main.Counter())
+    for _ in range(3):
+        main._track_bucket({"calories": 2500.0})
+    main._track_bucket({"calories": 1500.0})
+    monkeypatch.setattr(main.settings, "warmup_plan_buckets", 2)
+
+    assert await main.warm_day(DAY)
+    buckets = {tuple(sorted(t.items())) for t in runs}
+    assert buckets == {tuple(sorted(main.quantize_targets(main.DEFAULT_TARGETS).items())), (("calories", 2500.0),)}
+    assert len(runs) == 2 * (main.settings.plan_variants + 1)
+    assert not await main.warm_day("2099-12-31")  # no menu seeded
+
+
+def test_warmup_fires_lead_seconds_before_midnight(monkeypatch):
+    monkeypatch.setattr(main.settings, "menu_warmup_lead_s", 300)
+    assert main._seconds_until_warmup(datetime(2099, 1, 1, 23, 0)) == 3600 - 300
+    assert main._seconds_until_warmup(datetime(2099, 1, 1, 23, 58)) == 0
+
+
+def test_remote_menu_invalidation_drops_compiled_menu():
+    _compiled[DAY] = (compile_menu(DAY, 1, None, [(1, *ITEMS[0])]), 0.0)
+    main._on_cache_invalidate(f"plan:{DAY}:", True)
+    assert DAY in _compiled
+    main._on_cache_invalidate(f"menu:{DAY}:", True)
+    assert DAY not in _compiled
@@ -0,0 +1,58 @@
+"""Compiled per-day menu: partitions, versioning, sharing and invalidation."""
+import pytest
+
+from app import menu_index
+from app.menu_index import compile_menu, get_compiled_menu, invalidate_compiled_menu
+
+DAY = "2099-01-01"
+ITEMS = [
+    ("Oatmeal", "breakfast", 150, 5, 27, 3),
+    ("Salad", "lunch", 300, 12, 20, 18),
+    ("Salmon", "dinner", 380, 34, 0, 24),
+    ("Fruit", "any", 80, 1, 20, 0),
+]
+
+
+@pytest.fixture(autouse=True)
+def _clear_compiled():
+    invalidate_compiled_menu()
+    yield
+    invalidate_compiled_menu()
+
+
+def test_compile_menu_partitions_and_lookup():
+    rows = [(i + 1, *row) for i, row in enumerate(ITEMS)]
+    menu = compile_menu(DAY, 1, None, rows)
+    assert [it.name for it in menu.pools[0]] == ["Oatmeal", "Fruit"]
+    assert [it.name for it in menu.pools[2]] == ["Salmon", "Fruit"]
+    assert menu.by_id[3]["name"] == "Salmon"
+    assert compile_menu(DAY, 1, None, rows).version == menu.version
+    rows[0] = (1, "Oatmeal", "breakfast", 151, 5, 27, 3)
+    assert compile_menu(DAY, 1, None, rows).version != menu.version
+
+
+async def test_compiled_menu_shared_without_db_round_trips(adb, make_menu_day, sql_statements):
+    make_menu_day(DAY, ITEMS)
+    first = await get_compiled_menu(adb, DAY)
+    assert len(first.items) == len(ITEMS)
+    sql_statements.clear()
+    assert await get_compiled_menu(adb, DAY) is first
+    assert sql_statements == []
+
+
+async def test_compiled_menu_revalidates_and_invalidates(adb, make_menu_day, monkeypatch):
+    make_menu_day(DAY, ITEMS)
+    first = await get_compiled_menu(adb, DAY)
+    monkeypatch.setattr(menu_index, "MENU_RECHECK_S", 0.0)
+    assert await get_compiled_menu(adb, DAY) is first  # unchanged MenuDay: kept after recheck
+
+    make_menu_day(DAY, ITEMS[:2])  # reseeded
+    await adb.rollback()  # end the read transaction so the new rows are visible
+    assert len((await get_compiled_menu(adb, DAY)).items) == 2
+    monkeypatch.setattr(menu_index, "MENU_RECHECK_S", 60.0)
+    invalidate_compiled_menu(DAY)
+    assert await get_compiled_menu(adb, DAY) is not first
+
+
+async def test_compiled_menu_missing_day(adb, db):
+    assert await get_compiled_menu(adb, "2099-12-31") is None
@@ -0,0 +1,55 @@
+"""Menu repository: one joined, column-projected query; statement counts per request."""
+import pytest
+
+from app.menu_index import invalidate_compiled_menu
+from app.menu_repository import MenuDayRecord, fetch_menu_day, fetch_menu_days
+
+DAY = "2099-01-05"
+ITEMS = [
+    ("Oatmeal", "breakfast", 150, 5, 27, 3),
+    ("Salad", "lunch", 300, 12, 20, 18),
+    ("Salmon", "dinner", 380, 34, 0, 24),
+    ("Fruit", "any", 80, 1, 20, 0),
+]
+
+
+@pytest.fixture(autouse=True)
+def _clear_compiled():
+    invalidate_compiled_menu()
+    yield
+    invalidate_compiled_menu()
+
+
+async def test_fetch_menu_day_is_one_projected_query(adb, make_menu_day, sql_statements):
+    make_menu_day(DAY, ITEMS)
+    make_menu_day("2099-01-06", [])
+    sql_statements.clear()
+    record = await fetch_menu_day(adb, DAY)
+    assert isinstance(record, MenuDayRecord) and not hasattr(record, "__dict__")
+    assert [row[1:3] for row in record.items] == [(n, p) for n, p, *_ in ITEMS]
+    assert len(sql_statements) == 1
+    assert "JOIN menu_items" in sql_statements[0] and "menu_items.tags" in sql_statements[0]
+    assert all(len(row) == 8 and row[-1] is None for row in record.items)
+
+    days = await fetch_menu_days(adb, [DAY, "2099-01-06", "2099-01-07"])
+    assert sorted(days) == [DAY, "2099-01-06"]
+    assert days["2099-01-06"].items == []
+
+
+async def test_period_filter_in_join(adb, make_menu_day):
+    make_menu_day(DAY, ITEMS)
+    record = await fetch_menu_day(adb, DAY, periods=("breakfast", "any"))
+    assert [row[1] for row in record.items] == ["Oatmeal", "Fruit"]
+    assert (await fetch_menu_day(adb, DAY, periods=("brunch",))).items == []
+
+
+def test_statements_per_request(today_menu, client, sql_statements):
+    invalidate_compiled_menu()
+    sql_statements.clear()
+    assert client.get("/api/menu/today").status_code == 200
+    assert len(sql_statements) == 1  # cold: one joined menu query
+
+    sql_statements.clear()
+    assert client.post("/api/plan", json={"daily_calories": 2100}).status_code == 200
+    assert client.get("/api/menu/today").status_code == 200
+    assert sql_statements == []  # warm: compiled menu and cached responses only
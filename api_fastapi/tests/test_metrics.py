@@ -0,0 +1,56 @@
+"""GET /metrics: Prometheus text format, request/DB/cache/planner instrumentation."""
+import re
+
+from app.metrics import Counter, Histogram, _metrics, render
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    """Value of the sample `name` whose labels include `labels`."""
+    for line in text.splitlines():
+        if line.startswith(name + "{") or line.startswith(name + " "):
+            found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', line.split(" ")[0]))
+            if all(found.get(k) == v for k, v in labels.items()):
+                return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"no sample {name} {labels}")
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    counter = Counter("test_total", "Test.", ("route",))
+    try:
+        for v in (0.05, 0.5, 0.5, 3.0):
+            hist.observe(v, 'a"b')
+        counter.inc("x", amount=2)
+        text = render()
+        assert "# TYPE test_seconds histogram" in text
+        assert 'test_seconds_bucket{route="a\\"b",le="0.1"} 1' in text
+        assert 'test_seconds_bucket{route="a\\"b",le="1"} 3' in text
+        assert 'test_seconds_bucket{route="a\\"b",le="+Inf"} 4' in text
+        assert _sample(text, "test_seconds_sum") == 4.05
+        assert _sample(text, "test_seconds_count") == 4
+        assert 'test_total{route="x"} 2' in text
+    finally:
+        _metrics.remove(hist)
+        _metrics.remove(counter)
+
+
+def test_metrics_cover_requests_db_cache_and_planner(today_menu, client):
+    client.post("/api/plan", json={"daily_calories": 2150})
+    client.post("/api/plan", json={"daily_calories": 2150})
+    client.get("/api/plans", params={"session_id": "nobody"})
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = r.text
+    assert _sample(text, "http_request_duration_seconds_count", method="POST", route="/api/plan") >= 2
+    assert _sample(text, "http_requests_total", method="GET", route="/api/plans", status="200") >= 1
+    assert _sample(text, "db_query_duration_seconds_count", operation="select") >= 1
+    assert _sample(text, "cache_operation_duration_seconds_count", op="get", prefix="plan", result="l1_hit") >= 1
+    assert _sample(text, "cache_operation_duration_seconds_count", op="set", prefix="plan", result="ok") >= 1
+    for stage in ("breakfast", "lunch", "dinner"):
+        assert _sample(text, "plan_stage_duration_seconds_count", stage=stage) >= 1
+    assert _sample(text, "plan_build_duration_seconds_count", kind="plan") >= 1
+    assert _sample(text, "plan_menu_items_count") >= 1
+    assert _sample(text, "planner_candidates_evaluated_total") > 0
+    assert _sample(text, "planner_in_flight") == 0
+    assert _sample(text, "cache_l1_requests_total", result="hit") >= 1
@@ -0,0 +1,88 @@
+"""POST /api/plan?alternatives=K: ranked, diverse plans from one planner run, cached together."""
+import itertools
+
+import pytest
+
+from app import cache
+from app.executor import planner_executor
+from app.plan_cache import alternative_plan_id, parse_plan_key, plan_cache_key
+from app.planner import SLOTS, PlanItem, build_alternative_plans, build_plan_from_pools, partition_pools, plan_error
+
+from tests.test_planner import TARGETS, _menu
+
+
+def _ids(plan: dict) -> set[int]:
+    return {it["id"] for slot in SLOTS for it in plan[slot]["items"]}
+
+
+def _overlap(plans: list[dict]) -> float:
+    pairs = [len(_ids(a) & _ids(b)) / len(_ids(a) | _ids(b)) for a, b in itertools.combinations(plans, 2)]
+    return sum(pairs) / len(pairs)
+
+
+@pytest.fixture(scope="module")
+def pools():
+    return partition_pools([PlanItem.from_dict(it) for it in _menu(300, seed=5)])
+
+
+def test_alternatives_are_ranked_distinct_and_reproducible(pools):
+    plans = build_alternative_plans(pools, TARGETS, 5, seed=11)
+    assert len(plans) == 5
+    assert [p["error"] for p in plans] == sorted(p["error"] for p in plans)
+    assert all(p["error"] == plan_error(p, TARGETS) for p in plans)
+    assert len({frozenset(_ids(p)) for p in plans}) == 5
+    assert build_alternative_plans(pools, TARGETS, 5, seed=11) == plans
+    assert build_alternative_plans(pools, TARGETS, 5, seed=11, engine="numpy") == plans
+
+    # Independent seeds mostly land on the same greedy plan; the penalty spreads them out.
+    reruns = [build_plan_from_pools(pools, TARGETS, seed=s) for s in range(5)]
+    assert _overlap(plans) < _overlap(reruns)
+    with pytest.raises(ValueError):
+        build_alternative_plans(pools, TARGETS, 0)
+
+
+def test_small_menu_gives_fewer_alternatives():
+    pools = partition_pools([PlanItem(1, "Only", "any", 600, 40, 60, 20)])
+    assert len(build_alternative_plans(pools, TARGETS, 4, seed=1)) == 1
+
+
+def test_alternative_plan_ids_round_trip():
+    class Menu:
+        date, version = "2099-01-01", "abc"
+
+    key = plan_cache_key(Menu, {"calories": 2000.0}, alternatives=3)
+    parsed = parse_plan_key(alternative_plan_id(key, 2))
+    assert (parsed.alternatives, parsed.alternative) == (3, 2)
+    for bad in (alternative_plan_id(key, 3), plan_cache_key(Menu, {"calories": 2000.0}) + ":alt:0"):
+        with pytest.raises(ValueError):
+            parse_plan_key(bad)
+
+
+def test_api_alternatives_cached_together_and_swappable(today_menu, client, monkeypatch):
+    runs = []
+    run_alternatives = planner_executor.run_alternatives
+
+    async def counted(*args, **kwargs):
+        runs.append(args)
+        return await run_alternatives(*args, **kwargs)
+
+    monkeypatch.setattr(planner_executor, "run_alternatives", counted)
+    r = client.post("/api/plan?alternatives=3", json={"daily_calories": 2100})
+    assert r.status_code == 200
+    plans = r.json()["alternatives"]
+    assert 1 <= len(plans) <= 3 and len({p["plan_id"] for p in plans}) == len(plans)
+    assert [p["error"] for p in plans] == sorted(p["error"] for p in plans)
+    assert all(p["deltas"]["calories"] == 2100 - p["totals"]["calories"] for p in plans)
+
+    assert client.post("/api/plan?alternatives=3", json={"daily_calories": 2100}).json()["alternatives"] == plans
+    cached = client.post(
+        "/api/plan?alternatives=3", json={"daily_calories": 2100}, headers={"If-None-Match": r.headers["etag"]}
+    )
+    assert cached.status_code == 304 and len(runs) == 1
+
+    last = plans[-1]
+    cache.l1.clear()
+    swapped = client.post("/api/plan/swap", json={"plan_id": last["plan_id"], "meal": "dinner"})
+    assert swapped.status_code == 200
+    assert swapped.json()["breakfast"] == last["breakfast"] and swapped.json()["lunch"] == last["lunch"]
+    assert client.post("/api/plan?alternatives=11").status_code == 422
@@ -0,0 +1,83 @@
+"""POST /api/plan/batch: one menu load, NDJSON results, per-entry errors, shared plan cache."""
+import asyncio
+import json
+
+from app.executor import PlannerBusy, planner_executor
+
+
+def _lines(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _count_runs(monkeypatch) -> list[dict]:
+    runs = []
+    run = planner_executor.run
+
+    async def counted(menu, targets, **kwargs):
+        runs.append(targets)
+        return await run(menu, targets, **kwargs)
+
+    monkeypatch.setattr(planner_executor, "run", counted)
+    return runs
+
+
+def test_batch_streams_one_line_per_entry(today_menu, client, monkeypatch):
+    runs = _count_runs(monkeypatch)
+    client.post("/api/profile", json={"session_id": "batch-p", "daily_calories": 2700})
+    entries = [
+        {"daily_calories": 1800, "session_id": "a"},
+        {"daily_calories": 1810, "session_id": "b"},  # same bucket as the first entry
+        {"daily_calories": -5},
+        {"session_id": "batch-p"},
+    ]
+    r = client.post("/api/plan/batch", json={"entries": entries})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = sorted(_lines(r), key=lambda x: x["index"])
+    assert [x["index"] for x in lines] == [0, 1, 2, 3]
+    assert "error" in lines[2] and "plan" not in lines[2]
+    assert lines[0]["plan"]["totals"] == lines[1]["plan"]["totals"]
+    assert lines[1]["plan"]["deltas"]["calories"] - lines[0]["plan"]["deltas"]["calories"] == 10
+    assert lines[3]["session_id"] == "batch-p"
+    assert sorted(t["calories"] for t in runs) == [1800.0, 2700.0]
+
+    # The batch filled the same cache /api/plan reads.
+    assert client.post("/api/plan", json={"daily_calories": 1790}).status_code == 200
+    assert len(runs) == 2
+
+
+def test_busy_planner_fails_only_that_entry(today_menu, client, monkeypatch):
+    run = planner_executor.run
+
+    async def flaky(menu, targets, **kwargs):
+        if targets["calories"] == 3000:
+            raise PlannerBusy(2)
+        return await run(menu, targets, **kwargs)
+
+    monkeypatch.setattr(planner_executor, "run", flaky)
+    r = client.post("/api/plan/batch", json={"entries": [{"daily_calories": 3000}, {"daily_calories": 1200}]})
+    lines = {x["index"]: x for x in _lines(r)}
+    assert lines[0]["error"] == "planner busy" and lines[0]["retry_after"] == 2
+    assert "plan" in lines[1]
+
+
+def test_batch_leaves_a_planner_slot_free(today_menu, client, monkeypatch):
+    running, peak = 0, 0
+
+    async def slow(menu, targets, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        raise PlannerBusy(1)  # nothing cached, so every entry reaches the planner
+
+    monkeypatch.setattr(planner_executor, "max_in_flight", 3)
+    monkeypatch.setattr(planner_executor, "run", slow)
+    entries = [{"daily_calories": 1000 + 100 * i} for i in range(8)]
+    assert len(_lines(client.post("/api/plan/batch", json={"entries": entries}))) == 8
+    assert peak == 2
+
+
+def test_batch_rejects_empty_request(client):
+    assert client.post("/api/plan/batch", json={"entries": []}).status_code == 422
@@ -0,0 +1,84 @@
+"""Session-independent plan cache: quantized target keys, seeded plans, per-session variants."""
+import random
+
+from app.executor import planner_executor
+from app.menu_index import compile_menu
+from app.plan_cache import plan_cache_key, plan_seed, quantize_targets, session_variant
+from app.planner import build_plan
+
+from tests.test_planner import TARGETS, _ids, _menu
+
+ROWS = [(1, "Oatmeal", "breakfast", 150, 5, 27, 3), (2, "Salmon", "dinner", 380, 34, 0, 24)]
+
+
+def test_quantize_targets_snaps_to_buckets():
+    assert quantize_targets({"calories": 2012, "protein": 151.9, "fat": 1}) == {
+        "calories": 2000.0,
+        "protein": 150.0,
+        "fat": 5.0,
+    }
+    assert quantize_targets({"calories": 2030}) == quantize_targets({"calories": 2060})
+
+
+def test_key_covers_menu_version_targets_and_mode():
+    menu = compile_menu("2099-01-01", 1, None, ROWS)
+    other = compile_menu("2099-01-01", 1, None, ROWS[:1])
+    t = quantize_targets(TARGETS)
+    key = plan_cache_key(menu, t)
+    assert key.startswith("plan:2099-01-01:" + menu.version)
+    assert key != plan_cache_key(other, t)
+    assert key != plan_cache_key(menu, t, "exact")
+    assert key != plan_cache_key(menu, t, variant=0)
+    assert plan_seed(key) == plan_seed(key)
+
+
+def test_same_seed_same_plan():
+    base = _menu(40, seed=3)
+    # Every item twice under another id: every pick is a tie the seed has to break.
+    items = base + [{**it, "id": it["id"] + 1000} for it in base]
+    random.seed(1)
+    a = build_plan(items, TARGETS, seed=42)
+    random.seed(2)  # the global state must not matter
+    b = build_plan(items, TARGETS, seed=42)
+    assert _ids(a) == _ids(b)
+    assert any(_ids(build_plan(items, TARGETS, seed=s)) != _ids(a) for s in range(10))
+
+
+def test_session_variant_is_stable_and_bounded():
+    assert session_variant("abc", 4) == session_variant("abc", 4)
+    assert {session_variant(f"s{i}", 4) for i in range(50)} == {0, 1, 2, 3}
+
+
+def test_sessions_with_nearby_targets_share_one_plan(today_menu, client, monkeypatch):
+    runs = []
+    run = planner_executor.run
+
+    async def counted(menu, targets, **kwargs):
+        runs.append(targets)
+        return await run(menu, targets, **kwargs)
+
+    monkeypatch.setattr(planner_executor, "run", counted)
+    body = {"daily_calories": 1990, "daily_protein": 140}
+    a = client.post("/api/plan", json=body, headers={"X-Session-Id": "alice"})
+    b = client.post("/api/plan", json={**body, "daily_calories": 2010}, headers={"X-Session-Id": "bob"})
+    assert (a.status_code, b.status_code) == (200, 200)
+    assert runs == [{"calories": 2000.0, "protein": 140.0}]
+    assert a.json()["totals"] == b.json()["totals"]
+    # deltas are against each caller's own targets, not the bucket's
+    assert a.json()["deltas"]["calories"] - b.json()["deltas"]["calories"] == -20
+
+
+def test_vary_gives_a_session_its_own_variant(today_menu, client, monkeypatch):
+    seeds = []
+    run = planner_executor.run
+
+    async def counted(menu, targets, **kwargs):
+        seeds.append(kwargs["seed"])
+        return await run(menu, targets, **kwargs)
+
+    monkeypatch.setattr(planner_executor, "run", counted)
+    body = {"daily_calories": 2400}
+    for _ in range(2):
+        assert client.post("/api/plan?vary=true", json=body, headers={"X-Session-Id": "carol"}).status_code == 200
+    assert client.post("/api/plan", json=body, headers={"X-Session-Id": "carol"}).status_code == 200
+    assert len(seeds) == 2 and seeds[0] != seeds[1]  # one variant fill, one shared fill
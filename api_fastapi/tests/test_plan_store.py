@@ -0,0 +1,135 @@
+"""Write-behind plan history: batched inserts off the request path, shutdown flush, keyset pages."""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import plan_store
+from app.main import app
+from app.models import MealPlan
+from app.plan_store import PlanWriter, meal_plan_row
+
+PLAN = {
+    "breakfast": {"items": [], "calories": 100.0, "protein": 1.0, "carbs": 1.0, "fat": 1.0},
+    "lunch": {"items": [], "calories": 100.0, "protein": 1.0, "carbs": 1.0, "fat": 1.0},
+    "dinner": {"items": [], "calories": 100.0, "protein": 1.0, "carbs": 1.0, "fat": 1.0},
+    "totals": {"calories": 300.0, "protein": 3.0, "carbs": 3.0, "fat": 3.0},
+}
+
+
+@pytest.fixture
+def cleanup_plans(db):
+    sessions: list[str] = []
+    yield sessions
+    db.query(MealPlan).filter(MealPlan.session_id.in_(sessions)).delete()
+    db.commit()
+
+
+async def test_rows_written_in_batches(adb, make_menu_day, sql_statements, cleanup_plans):
+    day = make_menu_day("2099-04-01", [("Oatmeal", "breakfast", 150, 5, 27, 3)])
+    cleanup_plans.append("w1")
+    writer = PlanWriter(batch_size=2, flush_ms=20, max_pending=100)
+    writer.start()
+    sql_statements.clear()
+    for _ in range(3):
+        writer.submit(meal_plan_row("w1", day.id, PLAN))
+    assert writer.stats()["pending"] == 3  # submit never waits for the database
+    for _ in range(100):
+        if writer.stats()["written"] == 3:
+            break
+        await asyncio.sleep(0.01)
+    await writer.close()
+    assert writer.stats() == {"pending": 0, "written": 3, "dropped": 0, "failed_flushes": 0}
+    assert len([s for s in sql_statements if s.startswith("INSERT INTO meal_plans")]) == 2
+
+
+async def test_close_flushes_and_failures_keep_rows(adb, make_menu_day, monkeypatch, cleanup_plans):
+    day = make_menu_day("2099-04-01", [("Oatmeal", "breakfast", 150, 5, 27, 3)])
+    cleanup_plans.append("w2")
+    writer = PlanWriter(batch_size=100, flush_ms=60_000, max_pending=100)
+    writer.start()
+    writer.submit(meal_plan_row("w2", day.id, PLAN))
+
+    def unavailable():
+        raise ConnectionError("db down")
+
+    monkeypatch.setattr(plan_store, "AsyncSessionLocal", unavailable)
+    assert await writer.flush() == 0
+    assert writer.stats()["pending"] == 1 and writer.stats()["failed_flushes"] == 1
+    monkeypatch.undo()
+    await writer.close()
+    assert writer.stats()["written"] == 1
+
+
+async def test_close_during_a_slow_flush_loses_no_rows(adb, db, make_menu_day, monkeypatch, cleanup_plans):
+    day = make_menu_day("2099-04-01", [("Oatmeal", "breakfast", 150, 5, 27, 3)])
+    cleanup_plans.append("w4")
+    session_factory = plan_store.AsyncSessionLocal
+
+    def slow_session():
+        session = session_factory()
+        execute = session.execute
+
+        async def slow_execute(*args, **kwargs):
+            await asyncio.sleep(0.1)
+            return await execute(*args, **kwargs)
+
+        session.execute = slow_execute
+        return session
+
+    monkeypatch.setattr(plan_store, "AsyncSessionLocal", slow_session)
+    writer = PlanWriter(batch_size=2, flush_ms=10, max_pending=100)
+    writer.start()
+    for _ in range(5):
+        writer.submit(meal_plan_row("w4", day.id, PLAN))
+    await asyncio.sleep(0.03)  # the background task is inside its first INSERT
+    assert writer.stats()["pending"] < 5
+    await writer.close()
+    stats = writer.stats()
+    assert stats["pending"] == 0 and stats["written"] + stats["dropped"] == 5
+    assert db.query(MealPlan).filter(MealPlan.session_id == "w4").count() == stats["written"]
+
+
+async def test_failed_flushes_back_off_and_count_evicted_rows(monkeypatch):
+    writer = PlanWriter(batch_size=1, flush_ms=20, max_pending=3)
+
+    def unavailable():
+        raise ConnectionError("db down")
+
+    monkeypatch.setattr(plan_store, "AsyncSessionLocal", unavailable)
+    writer.start()
+    writer.submit(meal_plan_row("w3", 1, PLAN))
+    await asyncio.sleep(0.35)  # 20 + 40 + 80 + 160 ms of backoff
+    assert 3 <= writer.stats()["failed_flushes"] <= 6
+    await writer.close()  # its final flush fails too; the row stays buffered
+
+    writer = PlanWriter(batch_size=2, flush_ms=20, max_pending=3)
+    writer.submit(meal_plan_row("w3", 1, PLAN))
+    writer.submit(meal_plan_row("w3", 1, PLAN))
+
+    def fills_buffer_then_fails():
+        for _ in range(3):
+            writer.submit(meal_plan_row("w3", 1, PLAN))
+        raise ConnectionError("db down")
+
+    monkeypatch.setattr(plan_store, "AsyncSessionLocal", fills_buffer_then_fails)
+    assert await writer.flush() == 0
+    assert writer.stats() == {"pending": 3, "written": 0, "dropped": 2, "failed_flushes": 1}
+
+
+def test_plan_history_keyset_pages(today_menu, cleanup_plans):
+    cleanup_plans.append("hist")
+    headers = {"X-Session-Id": "hist"}
+    with TestClient(app) as c:
+        for cal in (1500, 2000, 2500):
+            assert c.post("/api/plan", json={"daily_calories": cal}, headers=headers).status_code == 200
+    # Lifespan shutdown flushed the write-behind buffer.
+    with TestClient(app) as c:
+        first = c.get("/api/plans", params={"session_id": "hist", "limit": 2}).json()
+        assert len(first["plans"]) == 2 and first["next_cursor"]
+        second = c.get("/api/plans", params={"session_id": "hist", "limit": 2, "cursor": first["next_cursor"]}).json()
+        assert second["next_cursor"] is None
+        plans = first["plans"] + second["plans"]
+        assert len({p["id"] for p in plans}) == 3
+        assert plans == sorted(plans, key=lambda p: (p["created_at"], p["id"]), reverse=True)
+        assert c.get("/api/plans", params={"session_id": "hist", "cursor": "nope"}).status_code == 400
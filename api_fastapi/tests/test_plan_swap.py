@@ -0,0 +1,91 @@
+"""POST /api/plan/swap: one meal re-filled from a cached plan, the rest left as it was."""
+from app import cache
+from app.executor import planner_executor
+from app.plan_cache import parse_plan_key, plan_cache_key, split_swap_key, swap_cache_key
+from app.planner import SLOTS, PlanItem, build_plan, partition_pools, replan_slot
+
+from tests.test_planner import TARGETS, _menu
+
+
+def _ids(plan: dict, slot: str) -> list[int]:
+    return [it["id"] for it in plan[slot]["items"]]
+
+
+def test_replan_slot_keeps_other_meals_and_kept_items():
+    items = _menu(60, seed=4)
+    plan = build_plan(items, TARGETS, seed=3)
+    pools = partition_pools([PlanItem.from_dict(it) for it in items])
+    dropped, *kept = _ids(plan, "lunch")
+    swapped = replan_slot(plan, pools, TARGETS, "lunch", item_id=dropped, seed=1)
+    assert swapped["breakfast"] == plan["breakfast"] and swapped["dinner"] == plan["dinner"]
+    assert _ids(swapped, "lunch")[: len(kept)] == kept
+    all_ids = [i for slot in SLOTS for i in _ids(swapped, slot)]
+    assert dropped not in all_ids and len(all_ids) == len(set(all_ids))
+    assert swapped["totals"]["calories"] == sum(swapped[s]["calories"] for s in SLOTS)
+    assert replan_slot(plan, pools, TARGETS, "lunch", item_id=dropped, seed=1) == swapped
+
+    refilled = replan_slot(plan, pools, TARGETS, "dinner", seed=1)
+    assert not set(_ids(refilled, "dinner")) & {i for s in SLOTS for i in _ids(plan, s)}
+
+
+def test_swap_keys_round_trip():
+    class Menu:
+        date, version = "2099-01-01", "abc"
+
+    key = plan_cache_key(Menu, {"calories": 2000.0, "protein": 150.0}, "exact", 2)
+    swap = swap_cache_key(swap_cache_key(key, "lunch", 7), "dinner")
+    assert split_swap_key(swap) == (swap_cache_key(key, "lunch", 7), "dinner", None)
+    assert split_swap_key(key) is None
+    parsed = parse_plan_key(swap)
+    assert (parsed.date, parsed.version, parsed.optimize, parsed.variant) == ("2099-01-01", "abc", "exact", 2)
+    assert parsed.targets == {"calories": 2000.0, "protein": 150.0}
+
+
+def test_swap_replaces_one_item(today_menu, client, monkeypatch):
+    swaps = []
+    run_swap = planner_executor.run_swap
+
+    async def counted(*args, **kwargs):
+        swaps.append(args)
+        return await run_swap(*args, **kwargs)
+
+    monkeypatch.setattr(planner_executor, "run_swap", counted)
+    plan = client.post("/api/plan", json={"daily_calories": 2000}).json()
+    slot = next(s for s in SLOTS if plan[s]["items"])
+    item_id = _ids(plan, slot)[0]
+    r = client.post("/api/plan/swap", json={"plan_id": plan["plan_id"], "meal": slot, "item_id": item_id})
+    assert r.status_code == 200
+    swapped = r.json()
+    assert swapped["plan_id"] == swap_cache_key(plan["plan_id"], slot, item_id)
+    assert item_id not in _ids(swapped, slot)
+    assert all(swapped[s] == plan[s] for s in SLOTS if s != slot)
+    assert swapped["deltas"]["calories"] == 2000 - swapped["totals"]["calories"]
+
+    # Cached under the derived key; swaps chain from it.
+    again = client.post("/api/plan/swap", json={"plan_id": plan["plan_id"], "meal": slot, "item_id": item_id})
+    assert again.json() == swapped and len(swaps) == 1
+    chained = client.post("/api/plan/swap", json={"plan_id": swapped["plan_id"], "meal": slot})
+    assert chained.status_code == 200 and len(swaps) == 2
+
+
+def test_swap_recomputes_an_expired_plan(today_menu, client):
+    plan = client.post("/api/plan", json={"daily_calories": 2400}).json()
+    cache.l1.clear()
+    r = client.post("/api/plan/swap", json={"plan_id": plan["plan_id"], "meal": "dinner"})
+    assert r.status_code == 200
+    assert r.json()["breakfast"] == plan["breakfast"] and r.json()["lunch"] == plan["lunch"]
+
+
+def test_swap_rejects_unknown_plans_and_items(today_menu, client):
+    plan = client.post("/api/plan", json={"daily_calories": 2000}).json()
+
+    def swap(**body):
+        return client.post("/api/plan/swap", json={"meal": "lunch", **body})
+
+    assert swap(plan_id="menu:today").status_code == 404
+    assert swap(plan_id=plan["plan_id"] + ":junk").status_code == 404
+    assert swap(plan_id=plan["plan_id"], item_id=10**9).status_code == 400
+    date, version = parse_plan_key(plan["plan_id"])[:2]
+    stale = plan["plan_id"].replace(f"{date}:{version}", f"{date}:000000000000")
+    assert swap(plan_id=stale).status_code == 409
+    assert swap(plan_id=plan["plan_id"], meal="brunch").status_code == 422
@@ -1,5 +1,35 @@
 """Unit tests for rule-based meal planner (no DB/Redis)."""
-from app.planner import build_plan
+import random
+
+import numpy as np
+import pytest
+
+from app import planner
+from app.planner import PlanItem, _batch_slot_error, _slot_error, build_plan
+
+TARGETS = {"calories": 2000, "protein": 150, "carbs": 200, "fat": 65}
+
+
+def _menu(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    periods = ("breakfast", "lunch", "dinner", "any")
+    # Coarse macro steps so many candidates tie and the random tie-break is exercised.
+    return [
+        {
+            "id": i,
+            "name": f"item{i}",
+            "meal_period": periods[i % 4],
+            "calories": rng.randrange(50, 800, 50),
+            "protein": rng.randrange(0, 50, 5),
+            "carbs": rng.randrange(0, 100, 10),
+            "fat": rng.randrange(0, 40, 5),
+        }
+        for i in range(n)
+    ]
+
+
+def _ids(result: dict) -> list[list[int]]:
+    return [[it["id"] for it in result[s]["items"]] for s in ("breakfast", "lunch", "dinner")]
 
 
 def test_build_plan_empty_items_uses_fallback():
@@ -34,3 +64,115 @@ def test_build_plan_any_period_spreads():
     result = build_plan(items, {"calories": 900, "protein": 30, "carbs": 36, "fat": 12})
     assert result["totals"]["calories"] >= 100
     assert result["totals"]["protein"] >= 4
+
+
+def test_batch_slot_error_matches_slot_error():
+    items = _menu(50)
+    slot_targets = {k: v / 3.0 for k, v in TARGETS.items()}
+    batched = _batch_slot_error(planner._macro_matrix([PlanItem.from_dict(it) for it in items]), slot_targets)
+    for it, err in zip(items, batched):
+        assert err == _slot_error({k: it[k] for k in planner.MACROS}, slot_targets)
+
+
+def test_terms_error_matches_slot_error():
+    slot_targets = {"protein": 50.0, "calories": 666.6, "fat": 0, "fiber": 10.0}
+    terms = planner._error_terms(slot_targets)
+    for it in _menu(50):
+        totals = [it[k] for k in planner.MACROS]
+        assert planner._terms_error(terms, totals) == _slot_error(dict(zip(planner.MACROS, totals)), slot_targets)
+
+
+def test_plan_items_are_dicts_at_the_boundary():
+    result = build_plan(_menu(30), TARGETS, seed=1)
+    item = result["lunch"]["items"][0]
+    assert isinstance(item, dict)
+    assert set(item) == {"id", "name", "meal_period", "calories", "protein", "carbs", "fat"}
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_numpy_engine_matches_python_engine(seed):
+    items = _menu(400, seed)
+    random.seed(seed)
+    expected = build_plan(list(items), TARGETS, engine="python")
+    random.seed(seed)
+    actual = build_plan(list(items), TARGETS, engine="numpy")
+    assert _ids(actual) == _ids(expected)
+    assert actual["totals"] == expected["totals"]
+
+
+def test_auto_engine_switches_on_pool_size(monkeypatch):
+    calls = []
+    monkeypatch.setattr(planner, "_fill_slot_np", lambda pool, *a: calls.append(len(pool)) or [])
+    build_plan(_menu(8), TARGETS)
+    assert calls == []
+    build_plan(_menu(planner.VECTORIZE_MIN_ITEMS * 2), TARGETS)
+    assert len(calls) == 3
+
+
+def test_unknown_engine_rejected():
+    with pytest.raises(ValueError):
+        build_plan([], TARGETS, engine="gpu")
+
+
+def test_numpy_engine_respects_used_ids():
+    items = [PlanItem.from_dict(it) for it in _menu(20)]
+    chosen = planner._fill_slot_np(items, {"calories": 5000}, {0, 1, 2}, random.Random(0))
+    assert not {0, 1, 2} & {it.id for it in chosen}
+    assert np.unique([it.id for it in chosen]).size == len(chosen)
+
+
+def _brute_force_error(pools, slot_targets) -> float:
+    from itertools import combinations
+
+    def options(pool):
+        for r in range(planner.MAX_ITEMS_PER_MEAL + 1):
+            yield from combinations(pool, r)
+
+    best = float("inf")
+    for b in options(pools[0]):
+        for lunch in options(pools[1]):
+            for d in options(pools[2]):
+                ids = [it.id for it in (*b, *lunch, *d)]
+                if len(ids) != len(set(ids)):
+                    continue
+                err = sum(
+                    _slot_error({k: sum(getattr(it, k) for it in sel) for k in planner.MACROS}, slot_targets)
+                    for sel in (b, lunch, d)
+                )
+                best = min(best, err)
+    return best
+
+
+def test_exact_matches_brute_force_on_small_menu():
+    from app.solver import solve_exact
+
+    items = [PlanItem.from_dict(it) for it in _menu(12, seed=3)]
+    slot_targets = planner._slot_targets(TARGETS)
+    periods = ("breakfast", "lunch", "dinner")
+    pools = [[i for i in items if i.meal_period in (p, "any")] for p in periods]
+    result = solve_exact(pools, slot_targets, [[], [], []], time_budget_s=30)
+    assert result.optimal
+    assert result.error == pytest.approx(_brute_force_error(pools, slot_targets))
+    ids = [it.id for sel in result.slots for it in sel]
+    assert len(ids) == len(set(ids))
+
+
+@pytest.mark.parametrize("n", [30, 300])
+def test_exact_never_worse_than_greedy(n):
+    items = _menu(n, seed=n)
+    random.seed(n)
+    greedy = build_plan(list(items), TARGETS)
+    random.seed(n)
+    exact = build_plan(list(items), TARGETS, optimize="exact", time_budget_s=0.2)
+    assert planner.plan_error(exact, TARGETS) <= planner.plan_error(greedy, TARGETS) + 1e-9
+    ids = [i for slot in _ids(exact) for i in slot]
+    assert len(ids) == len(set(ids))
+
+
+def test_exact_with_zero_budget_returns_greedy():
+    items = _menu(100, seed=5)
+    random.seed(5)
+    greedy = build_plan(list(items), TARGETS)
+    random.seed(5)
+    exact = build_plan(list(items), TARGETS, optimize="exact", time_budget_s=0)
+    assert _ids(exact) == _ids(greedy)
@@ -0,0 +1,44 @@
+"""Profile cache: warm /api/plan requests resolve session targets without touching the database."""
+import json
+import uuid
+
+from app import cache
+from app.plan_store import plan_writer
+from app.profile_cache import profile_cache_key
+
+
+def test_warm_plan_request_issues_no_sql(today_menu, client, sql_statements, monkeypatch):
+    # Keep the write-behind plan history from flushing in the middle of the measured request.
+    monkeypatch.setattr(plan_writer, "flush_ms", 60_000)
+    session_id = f"profile-cache-{uuid.uuid4().hex}"
+    headers = {"X-Session-Id": session_id}
+    client.post("/api/profile", json={"session_id": session_id, "daily_calories": 2300})
+    first = client.post("/api/plan", headers=headers)
+    assert first.status_code == 200
+
+    sql_statements.clear()
+    again = client.post("/api/plan", headers=headers)
+    assert again.status_code == 200
+    assert sql_statements == []
+    assert again.json()["plan_id"] == first.json()["plan_id"]
+    assert again.json()["deltas"]["calories"] == 2300 - again.json()["totals"]["calories"]
+
+
+def test_missing_profile_is_cached_until_written_through(today_menu, client, sql_statements, monkeypatch):
+    monkeypatch.setattr(plan_writer, "flush_ms", 60_000)
+    session_id = f"profile-cache-{uuid.uuid4().hex}"
+    headers = {"X-Session-Id": session_id}
+    client.post("/api/plan", headers=headers)
+    assert json.loads(cache.l1.get(profile_cache_key(session_id))) == {"profile": None}
+
+    sql_statements.clear()
+    default = client.post("/api/plan", headers=headers).json()
+    assert not [s for s in sql_statements if "user_profiles" in s]
+
+    client.post("/api/profile", json={"session_id": session_id, "daily_calories": 2900})
+    sql_statements.clear()
+    updated = client.post("/api/plan", headers=headers).json()
+    assert not [s for s in sql_statements if "user_profiles" in s]
+    assert updated["deltas"]["calories"] == 2900 - updated["totals"]["calories"]
+    assert client.get("/api/profile", params={"session_id": session_id}).json()["profile"]["daily_calories"] == 2900
+    assert default["plan_id"] != updated["plan_id"]
@@ -0,0 +1,60 @@
+"""Pre-serialized menu/plan responses: raw cached JSON out, strong ETags and 304s."""
+import numpy as np
+import pytest
+
+from app.json_codec import dumps, extend_object, loads
+from app.responses import etag_matches, make_etag
+from app.schemas import PlanResponse
+
+
+def test_extend_object_appends_fields_without_reencoding():
+    assert loads(extend_object('{"a": [1, 2]}', {"b": None, "c": {"x": 1.5}})) == {
+        "a": [1, 2], "b": None, "c": {"x": 1.5}
+    }
+    assert extend_object("{}", {"b": 1}) == '{"b":1}'
+    assert extend_object("{ }", {}) == "{}"
+    with pytest.raises(ValueError):
+        extend_object("[1]", {"b": 1})
+
+
+def test_dumps_handles_numpy_scalars_and_int_keys():
+    assert loads(dumps({"x": np.float64(1.5), "n": np.int64(3), 7: "seven"})) == {"x": 1.5, "n": 3, "7": "seven"}
+
+
+def test_etag_matching():
+    etag = make_etag("menu:2099-01-01:abc")
+    assert etag.startswith('"') and etag != make_etag("menu:2099-01-01:abd")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag) and not etag_matches('"other"', etag)
+
+
+def test_menu_today_revalidates_with_etag(today_menu, client):
+    first = client.get("/api/menu/today")
+    assert first.status_code == 200 and first.json()["items"]
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    again = client.get("/api/menu/today", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+    assert client.get("/api/menu/today", headers={"If-None-Match": '"stale"'}).json() == first.json()
+
+
+def test_plan_body_and_etag_follow_the_requested_targets(today_menu, client):
+    first = client.post("/api/plan", json={"daily_calories": 2000})
+    assert first.status_code == 200 and first.headers["content-type"] == "application/json"
+    body = first.json()
+    assert PlanResponse.model_validate(body).model_dump() == body
+    assert body["deltas"]["calories"] == 2000 - body["totals"]["calories"]
+
+    # Same bucket, different targets: same plan, different deltas and ETag.
+    near = client.post("/api/plan", json={"daily_calories": 2001})
+    assert near.json()["plan_id"] == body["plan_id"]
+    assert near.headers["etag"] != first.headers["etag"]
+
+    etag = first.headers["etag"]
+    cached = client.post("/api/plan", json={"daily_calories": 2000}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    assert client.post("/api/plan", json={"daily_calories": 2001}, headers={"If-None-Match": etag}).status_code == 200
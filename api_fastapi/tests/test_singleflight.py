@@ -0,0 +1,131 @@
+"""Single-flight cache fills: in-process coalescing, Redis lock, stale-while-revalidate."""
+import asyncio
+
+import httpx
+
+import app.main as main
+from app.planner import build_plan_from_pools
+from app.executor import planner_executor
+from app.menu_index import compile_menu
+from app.singleflight import LOCK_PREFIX, STALE_PREFIX, SingleFlight, cached_json
+
+ROWS = [
+    (1, "Oatmeal", "breakfast", 150, 5, 27, 3),
+    (2, "Salad", "lunch", 300, 12, 20, 18),
+    (3, "Salmon", "dinner", 380, 34, 0, 24),
+]
+
+
+async def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    results = await asyncio.gather(*(flight.do("k", compute) for _ in range(20)))
+    assert results == [1] * 20
+    assert calls == 1
+    assert flight.in_flight() == 0
+    assert await flight.do("k", compute) == 2  # finished calls are not cached here
+
+
+async def test_errors_reach_every_waiter_and_are_not_cached():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError("nope")
+
+    results = await asyncio.gather(*(flight.do("k", boom) for _ in range(5)), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.in_flight() == 0
+
+
+async def test_concurrent_identical_plan_requests_run_planner_once(monkeypatch):
+    menu = compile_menu("2099-01-01", 1, None, ROWS)
+    calls = 0
+
+    async def load_menu(today):
+        return menu
+
+    async def run(menu, targets, **kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return build_plan_from_pools(menu.pools, targets, **kwargs)
+
+    monkeypatch.setattr(main, "_load_menu", load_menu)
+    monkeypatch.setattr(planner_executor, "run", run)
+    body = {"daily_calories": 1987.5, "daily_protein": 123}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.post("/api/plan", json=body) for _ in range(25)))
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.text for r in responses}) == 1
+    assert calls == 1
+
+
+async def test_redis_lock_lets_another_worker_compute(fake_redis, monkeypatch):
+    from app import singleflight
+
+    monkeypatch.setattr(singleflight, "POLL_INTERVAL_S", 0.01)
+    await fake_redis.set(LOCK_PREFIX + "plan:x", "other-worker", px=5000)
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.05)
+        await fake_redis.set("plan:x", '{"from": "other"}')
+        await fake_redis.delete(LOCK_PREFIX + "plan:x")
+
+    async def compute():
+        raise AssertionError("should wait for the lock holder instead")
+
+    asyncio.ensure_future(other_worker_finishes())
+    assert await cached_json("plan:x", 60, compute) == {"from": "other"}
+
+
+async def test_stale_while_revalidate_serves_stale_and_refreshes(fake_redis):
+    await fake_redis.set(STALE_PREFIX + "menu:x", '{"v": "old"}')
+    refreshed = asyncio.Event()
+
+    async def compute():
+        refreshed.set()
+        return {"v": "new"}
+
+    assert await cached_json("menu:x", 60, compute, stale_s=30) == {"v": "old"}
+    await asyncio.wait_for(refreshed.wait(), 1)
+    await asyncio.sleep(0.01)
+    assert await cached_json("menu:x", 60, compute, stale_s=30) == {"v": "new"}
+    assert await fake_redis.ttl(STALE_PREFIX + "menu:x") > 60
+    assert not await fake_redis.exists(LOCK_PREFIX + "menu:x")
+
+
+async def test_lock_held_only_while_computing(fake_redis):
+    async def compute():
+        assert await fake_redis.exists(LOCK_PREFIX + "plan:y")
+        return [1]
+
+    assert await cached_json("plan:y", 60, compute, stale_s=0) == [1]
+    assert not await fake_redis.exists(LOCK_PREFIX + "plan:y")
+
+
+async def test_redis_errors_on_the_lock_compute_locally(fake_redis, monkeypatch):
+    import redis.asyncio as redis
+
+    from app import cache
+
+    async def refused(*args, **kwargs):
+        raise redis.ConnectionError("connection refused")
+
+    monkeypatch.setattr(fake_redis, "set", refused)
+
+    async def compute():
+        return {"v": 1}
+
+    assert await cached_json("plan:dead-redis", 60, compute) == {"v": 1}
+    assert cache._redis is None
+    assert await cached_json("plan:dead-redis", 60, compute) == {"v": 1}  # served from L1
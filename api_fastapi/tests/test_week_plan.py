@@ -0,0 +1,91 @@
+"""Multi-day planning: one run over several compiled menus, name variety, bulk persistence."""
+import pytest
+
+from app.menu_index import get_compiled_menus, invalidate_compiled_menu
+from app.models import MealPlan
+from app.plan_store import plan_writer
+from app.planner import SLOTS, PlanItem, build_multi_day_plan, partition_pools
+
+from tests.test_planner import TARGETS, _menu
+
+DATES = ["2099-02-01", "2099-02-02", "2099-02-03"]
+
+
+@pytest.fixture(autouse=True)
+def _clear_compiled():
+    invalidate_compiled_menu()
+    yield
+    invalidate_compiled_menu()
+
+
+def _day_items(day: int) -> list[tuple]:
+    # Same dish names every day (ids differ), so only the variety rule keeps them apart.
+    return [(f"dish{i % 30}", it["meal_period"], it["calories"], it["protein"], it["carbs"], it["fat"])
+            for i, it in enumerate(_menu(60, seed=day))]
+
+
+def _names(plan: dict) -> set[str]:
+    return {it["name"] for slot in SLOTS for it in plan[slot]["items"]}
+
+
+def test_names_not_repeated_within_window():
+    days = []
+    for d in range(5):
+        items = [PlanItem(d * 100 + i, *row) for i, row in enumerate(_day_items(d))]
+        days.append((f"2099-02-0{d + 1}", partition_pools(items)))
+    week = build_multi_day_plan(days, TARGETS, no_repeat_days=3, seed=7)
+    names = [_names(day) for day in week["days"]]
+    for i in range(1, len(names)):
+        assert not names[i] & names[i - 1]
+        if i >= 2:
+            assert not names[i] & names[i - 2]
+    assert week["relaxed"] == []
+    assert week["totals"]["calories"] == sum(day["totals"]["calories"] for day in week["days"])
+    assert build_multi_day_plan(days, TARGETS, no_repeat_days=3, seed=7) == week
+
+
+def test_variety_relaxed_when_a_pool_runs_out():
+    days = [(d, partition_pools([PlanItem(i, "Only", "any", 600, 40, 60, 20)])) for i, d in enumerate(DATES)]
+    week = build_multi_day_plan(days, TARGETS, no_repeat_days=2, seed=1)
+    assert week["relaxed"] == DATES[1:]
+    assert all(_names(day) == {"Only"} for day in week["days"])
+
+
+async def test_compiled_menus_loaded_with_one_statement(adb, make_menu_day, sql_statements):
+    for i, d in enumerate(DATES):
+        make_menu_day(d, _day_items(i))
+    sql_statements.clear()
+    menus = await get_compiled_menus(adb, [*DATES, "2099-02-09"])
+    assert sorted(menus) == DATES
+    assert all(len(m.items) == 60 for m in menus.values())
+    assert len(sql_statements) == 1
+    sql_statements.clear()
+    assert (await get_compiled_menus(adb, DATES)).keys() == menus.keys()
+    assert sql_statements == []
+
+
+def test_week_endpoint_plans_and_saves(client, db, make_menu_day):
+    for i, d in enumerate(DATES):
+        make_menu_day(d, _day_items(i))
+    r = client.post(
+        "/api/plan/week?start=2099-02-01&days=4&no_repeat_days=2",
+        json={"daily_calories": 2200},
+        headers={"X-Session-Id": "week-test"},
+    )
+    try:
+        assert r.status_code == 200
+        data = r.json()
+        assert [d["date"] for d in data["days"]] == DATES
+        assert data["missing"] == ["2099-02-04"]
+        assert data["saved"] == 3
+        client.portal.call(plan_writer.flush)
+        rows = db.query(MealPlan).filter(MealPlan.session_id == "week-test").all()
+        assert sorted(r.totals_calories for r in rows) == sorted(d["totals"]["calories"] for d in data["days"])
+        assert set(rows[0].meals) == set(SLOTS)
+    finally:
+        db.query(MealPlan).filter(MealPlan.session_id == "week-test").delete()
+        db.commit()
+
+
+def test_week_endpoint_404_without_menus(client):
+    assert client.post("/api/plan/week?start=2098-01-01&days=2").status_code == 404